@@ -1,23 +1,20 @@
 import streamlit as st
 from google.cloud import bigquery
-from google.oauth2 import service_account
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, date
-import json
+from io import BytesIO
+from bq_client import get_bigquery_client, run_query, report_fetch_error
+from metrics_cube import load_metrics_cube, clear_metrics_cube, load_metrics_cube_preview, cube_preview_key, cluster_rollup, filter_clusters
+from perf import timed
+from chart_utils import resample_timeseries, timeseries_trace, time_axis_title, extrema_text
+from fast_preview import preview_or_exact, preview_active, render_approximate_notice
+from progressive import progressive_section, render_progressively
+from chip_sketches import load_chip_sketches, clear_chip_sketches, estimate_chip_counts, HLL_RELATIVE_ERROR
 
-# Fungsi untuk menginisialisasi BigQuery client
-@st.cache_resource
-def get_bigquery_client():
-    try:
-        credentials_json = st.secrets["bigquery"]["credentials"]
-        credentials = service_account.Credentials.from_service_account_info(json.loads(credentials_json))
-        client = bigquery.Client(credentials=credentials, project=credentials.project_id)
-        return client
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat menginisialisasi BigQuery Client: {e}")
-        return None
+# Daftar dimensi (ClusterID) jarang berubah, cukup diperbarui tiap jam
+DIMENSION_TTL = 3600
 
 # Fungsi untuk mengambil data dari BigQuery
 def fetch_bigquery_data(table_name, search_term, search_column):
@@ -31,7 +28,7 @@ def fetch_bigquery_data(table_name, search_term, search_column):
         FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
         WHERE CAST({search_column} AS STRING) LIKE '%{search_term}%'
         """
-        df = client.query(query).to_dataframe()
+        df = run_query(client, query)
         for col in df.columns:
             if df[col].dtype == 'int64':
                 df[col] = df[col].astype(str)
@@ -42,199 +39,617 @@ def fetch_bigquery_data(table_name, search_term, search_column):
         st.error(f"Terjadi kesalahan saat mengambil data dari BigQuery: {e}")
         return None
 
-# Fungsi untuk mengambil data Total Chip (dengan caching)
+# Fungsi untuk mengambil NoRS unik per ClusterID beserta status unverified (pjp_NoRS kosong) untuk
+# semua cluster. Jumlah distinct tidak bisa dijumlahkan antar cluster, jadi yang disimpan adalah
+# nomornya (kategori) dan penghitungan dilakukan lokal sesuai cluster yang dipilih.
+# Kegagalan dilempar (tidak ikut di-cache); halaman memakai fetch_chip_numbers.
 @st.cache_data
-def fetch_chip_data_cached(table_name, date_column, start_date, end_date, cluster_column, selected_clusters):
+def fetch_chip_numbers_cached(table_name, date_column, start_date, end_date, cluster_column):
     client = get_bigquery_client()
     if client is None:
-        return {"total_chip": 0, "total_chip_unverified": 0}
+        return pd.DataFrame()
 
+    query = f"""
+    SELECT DISTINCT
+        {cluster_column} AS ClusterID,
+        NoRS,
+        pjp_NoRS IS NULL AS unverified
+    FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
+    WHERE DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    AND NoRS IS NOT NULL
+    """
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+    df = run_query(client, query, job_config=job_config)
+    df["NoRS"] = df["NoRS"].astype("category")
+    return df
+
+# Fungsi untuk NoRS unik bagi halaman: kegagalan ditampilkan dan diganti frame kosong tanpa di-cache
+def fetch_chip_numbers(table_name, date_column, start_date, end_date, cluster_column):
     try:
-        query = f"""
-        SELECT 
-            COUNT(DISTINCT NoRS) AS total_chip,
-            COUNT(DISTINCT CASE WHEN pjp_NoRS IS NULL THEN NoRS END) AS total_chip_unverified
-        FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
-        WHERE DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
-        """
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        total_chip = int(df["total_chip"].iloc[0]) if not df.empty else 0
-        total_chip_unverified = int(df["total_chip_unverified"].iloc[0]) if not df.empty else 0
-        return {"total_chip": total_chip, "total_chip_unverified": total_chip_unverified}
+        return fetch_chip_numbers_cached(table_name, date_column, start_date, end_date, cluster_column)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data chip: {e}")
-        return {"total_chip": 0, "total_chip_unverified": 0}
+        report_fetch_error(f"Terjadi kesalahan saat mengambil data chip: {e}")
+        return pd.DataFrame()
+
+# Fungsi untuk menghitung Total Chip dan Total Chip Unverified untuk cluster yang dipilih (lokal).
+# exact=False menggabungkan sketch HLL harian (lihat chip_sketches, galat ~0,8%) alih-alih nomor unik;
+# pada mode pratinjau cepat sketch juga dipakai sementara hitungan exact berjalan di background.
+# Kunci "approximate" menandai apakah angka yang dikembalikan berasal dari sketch.
+def fetch_chip_data(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, exact=True):
+    if not exact:
+        return {**estimate_chip_counts(start_date, end_date, selected_clusters), "approximate": True}
+
+    def count_exact():
+        df = fetch_chip_numbers(
+            table_name=table_name, date_column=date_column, start_date=start_date, end_date=end_date,
+            cluster_column=cluster_column
+        )
+        df = filter_clusters(df, selected_clusters)
+        if df.empty:
+            return {"total_chip": 0, "total_chip_unverified": 0}
+        return {
+            "total_chip": int(df["NoRS"].nunique()),
+            "total_chip_unverified": int(df.loc[df["unverified"], "NoRS"].nunique()),
+        }
 
-# Fungsi untuk mengambil data transaksi TopUp dan NGRS per ClusterID (dengan caching)
+    key = ("chip_numbers", table_name, start_date, end_date)
+    chip_data = preview_or_exact(key, count_exact, lambda: estimate_chip_counts(start_date, end_date, selected_clusters))
+    return {**chip_data, "approximate": preview_active([key])}
+
+# Sumber kubus metrik untuk Transaction Summary: TopUp LinkAjaXPJP dan transaksi NGRS (tabel ALL)
+CUBE_SOURCES_CHIP = ["topup_pjp", "ngrs_all"]
+
+# Fungsi untuk ringkasan transaksi TopUp dan NGRS per ClusterID dari kubus metrik (filter cluster lokal)
+def build_transaction_summary(start_date, end_date, selected_clusters):
+    cube = load_metrics_cube_preview(CUBE_SOURCES_CHIP, start_date, end_date)
+    df_linkaja = cluster_rollup(cube, "topup_pjp", clusters=selected_clusters)
+    df_ngrs = cluster_rollup(cube, "ngrs_all", clusters=selected_clusters)
+    df_combined = df_linkaja.merge(df_ngrs, on="ClusterID", how="outer").fillna(0)
+    df_combined.columns = ["ClusterID", "Total Transaksi TopUp", "Nilai TopUp", "Total Trx NGRS", "Nilai Trx NGRS"]
+    if df_combined.empty:
+        return df_combined
+    df_combined["Nilai TopUp"] = df_combined["Nilai TopUp"].apply(lambda x: f"Rp {format_rupiah(x)}")
+    df_combined["Nilai Trx NGRS"] = df_combined["Nilai Trx NGRS"].apply(lambda x: f"Rp {format_rupiah(x)}")
+    return df_combined
+
+# Fungsi untuk mengambil aggregated data per NoRS dan ClusterID untuk semua cluster dalam satu query
+# (dengan caching). Kolom verified (pjp_NoRS IS NOT NULL) memisahkan tabel PJP dan Non PJP secara lokal;
+# agregat NGRS dibatasi semi-join ke NoRS yang muncul di LinkAjaXPJP pada jendela yang sama.
+# Kegagalan dilempar (tidak ikut di-cache); halaman memakai fetch_aggregated_data.
 @st.cache_data
-def fetch_transaction_summary_cached(linkaja_table, ngrs_table, date_column_linkaja, date_column_ngrs, start_date, end_date, cluster_column, selected_clusters):
+def fetch_aggregated_data_cached(start_date, end_date):
     client = get_bigquery_client()
     if client is None:
         return pd.DataFrame()
-
-    try:
-        linkaja_query = f"""
+    query = f"""
+    WITH la AS (
         SELECT 
-            {cluster_column} AS ClusterID,
-            COUNT(*) AS total_topup,
-            COALESCE(SUM(CAST(Debit AS FLOAT64)), 0) AS value_topup
-        FROM `alfred-analytics-406004.analytics_alfred.{linkaja_table}`
-        WHERE DATE({date_column_linkaja}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
-        GROUP BY {cluster_column}
-        """
-        ngrs_query = f"""
+            NoRS, 
+            ClusterID, 
+            OutletName, 
+            pjp_NoRS IS NOT NULL AS verified, 
+            CAST(Debit AS FLOAT64) AS Debit
+        FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP`
+        WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    ),
+    la_aggregated AS (
         SELECT 
-            ClusterID AS ClusterID,
-            COUNT(*) AS total_ngrs,
-            COALESCE(SUM(CAST(SpendAmount AS FLOAT64)), 0) AS value_ngrs
-        FROM `alfred-analytics-406004.analytics_alfred.{ngrs_table}`
-        WHERE DATE({date_column_ngrs}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND ClusterID IN ({', '.join([str(cluster) for cluster in selected_clusters])})
-        GROUP BY ClusterID
-        """
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df_linkaja = client.query(linkaja_query, job_config=job_config).to_dataframe()
-        df_ngrs = client.query(ngrs_query, job_config=job_config).to_dataframe()
-        df_combined = df_linkaja.merge(df_ngrs, on="ClusterID", how="outer").fillna(0)
-        df_combined.columns = ["ClusterID", "Total Transaksi TopUp", "Nilai TopUp", "Total Trx NGRS", "Nilai Trx NGRS"]
-        df_combined["Nilai TopUp"] = df_combined["Nilai TopUp"].apply(lambda x: f"Rp {format_rupiah(x)}")
-        df_combined["Nilai Trx NGRS"] = df_combined["Nilai Trx NGRS"].apply(lambda x: f"Rp {format_rupiah(x)}")
-        return df_combined
+            NoRS, 
+            ClusterID AS Cluster_ID,
+            verified,
+            SUM(Debit) AS Total_Debit, 
+            COUNT(Debit) AS Total_Transaksi_Debit
+        FROM la
+        GROUP BY NoRS, ClusterID, verified
+    ),
+    ngrs_aggregated AS (
+        SELECT 
+            NoChip, 
+            SUM(CAST(SpendAmount AS FLOAT64)) AS Total_Transaksi_NGRS, 
+            COUNT(SpendAmount) AS Total_SpendAmount
+        FROM `alfred-analytics-406004.analytics_alfred.ALL`
+        WHERE DATE(Completion) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+        AND NoChip IN (SELECT NoRS FROM la)
+        GROUP BY NoChip
+    ),
+    outlets AS (
+        SELECT DISTINCT NoRS, ClusterID, OutletName, verified
+        FROM la
+    )
+    SELECT 
+        outlets.NoRS,  
+        CAST(outlets.ClusterID AS STRING) AS ClusterID,
+        COALESCE(la_aggregated.Total_Debit, 0) AS Total_Debit, 
+        COALESCE(la_aggregated.Total_Transaksi_Debit, 0) AS Total_Transaksi_Debit, 
+        COALESCE(ngrs_aggregated.Total_Transaksi_NGRS, 0) AS Total_Transaksi_NGRS,
+        COALESCE(ngrs_aggregated.Total_SpendAmount, 0) AS Total_SpendAmount,
+        outlets.OutletName,
+        outlets.verified
+    FROM outlets
+    LEFT JOIN la_aggregated 
+        ON outlets.NoRS = la_aggregated.NoRS 
+        AND outlets.ClusterID = la_aggregated.Cluster_ID 
+        AND outlets.verified = la_aggregated.verified
+    LEFT JOIN ngrs_aggregated ON outlets.NoRS = ngrs_aggregated.NoChip
+    """
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+    df = run_query(client, query, job_config=job_config)
+    if not df.empty:
+        df["Total_Debit"] = df["Total_Debit"].apply(lambda x: f"Rp {format_rupiah(float(x))}" if pd.notna(x) else "Rp 0")
+        df["Total_Transaksi_NGRS"] = df["Total_Transaksi_NGRS"].apply(lambda x: f"Rp {format_rupiah(float(x))}" if pd.notna(x) else "Rp 0")
+    return df
+
+# Fungsi untuk aggregated data bagi halaman: kegagalan ditampilkan dan diganti frame kosong tanpa di-cache
+def fetch_aggregated_data(start_date, end_date):
+    try:
+        return fetch_aggregated_data_cached(start_date, end_date)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data transaksi: {e}")
-        return pd.DataFrame(columns=["ClusterID", "Total Transaksi TopUp", "Nilai TopUp", "Total Trx NGRS", "Nilai Trx NGRS"])
+        report_fetch_error(f"Terjadi kesalahan saat mengambil data agregat: {e}")
+        return pd.DataFrame()
 
-# Fungsi untuk mengambil aggregated data (dengan caching)
+# Fungsi untuk memilih aggregated data PJP (verified=True) atau Non PJP (verified=False) untuk cluster terpilih
+def split_aggregated_data(df, verified, selected_clusters):
+    if df.empty:
+        return df
+    df = df[df["verified"] == verified].drop(columns="verified").reset_index(drop=True)
+    return filter_clusters(df, selected_clusters)
+
+# Fungsi untuk menormalkan nomor (vektorisasi) ke bentuk 62xxx: buang non-digit, 0xxx/8xxx jadi 62xxx
+def normalize_number_series(values):
+    numbers = pd.Series(values, dtype="object").astype(str).str.replace(r"\D", "", regex=True)
+    numbers = numbers.where(~numbers.str.startswith("0"), "62" + numbers.str[1:])
+    numbers = numbers.where(~numbers.str.startswith("8"), "62" + numbers)
+    return numbers.where(numbers != "", None)
+
+# Fungsi untuk mengambil riwayat NGRS (ALL) banyak nomor sekaligus dalam satu query
 @st.cache_data
-def fetch_aggregated_data_cached(start_date, end_date, cluster_ids):
+def fetch_ngrs_history_batch(numbers, start_date, end_date):
     client = get_bigquery_client()
     if client is None:
         return pd.DataFrame()
     try:
-        query = f"""
-        WITH ngrs_aggregated AS (
-            SELECT 
-                NoChip, 
-                SUM(CAST(SpendAmount AS FLOAT64)) AS Total_Transaksi_NGRS, 
-                COUNT(SpendAmount) AS Total_SpendAmount
-            FROM `alfred-analytics-406004.analytics_alfred.ALL`
-            WHERE DATE(Completion) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            GROUP BY NoChip
-        ),
-        la_aggregated AS (
-            SELECT 
-                NoRS, 
-                ClusterID AS Cluster_ID,
-                SUM(CAST(Debit AS FLOAT64)) AS Total_Debit, 
-                COUNT(Debit) AS Total_Transaksi_Debit
-            FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP`
-            WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join([str(cluster) for cluster in cluster_ids])})
-            AND pjp_NoRS IS NULL
-            GROUP BY NoRS, ClusterID
-        )
-        SELECT 
-            LA.NoRS,  
-            CAST(LA.ClusterID AS STRING) AS ClusterID,
-            COALESCE(la_aggregated.Total_Debit, 0) AS Total_Debit, 
-            COALESCE(la_aggregated.Total_Transaksi_Debit, 0) AS Total_Transaksi_Debit, 
-            COALESCE(ngrs_aggregated.Total_Transaksi_NGRS, 0) AS Total_Transaksi_NGRS,
-            COALESCE(ngrs_aggregated.Total_SpendAmount, 0) AS Total_SpendAmount,
-            LA.OutletName
-        FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP` AS LA
-        LEFT JOIN la_aggregated ON LA.NoRS = la_aggregated.NoRS
-        LEFT JOIN ngrs_aggregated ON LA.NoRS = ngrs_aggregated.NoChip
-        WHERE DATE(LA.InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND LA.ClusterID IN ({', '.join([str(cluster) for cluster in cluster_ids])})
-        AND LA.pjp_NoRS IS NULL
-        GROUP BY 
-            LA.NoRS, 
-            LA.ClusterID,
-            la_aggregated.Total_Debit, 
-            la_aggregated.Total_Transaksi_Debit, 
-            ngrs_aggregated.Total_Transaksi_NGRS, 
-            ngrs_aggregated.Total_SpendAmount,
-            LA.OutletName
+        query = """
+        SELECT
+            CAST(NoChip AS STRING) AS NoChip,
+            DATE(Completion) AS date,
+            TransactionType,
+            CAST(SpendAmount AS FLOAT64) AS SpendAmount
+        FROM `alfred-analytics-406004.analytics_alfred.ALL`
+        WHERE CAST(NoChip AS STRING) IN UNNEST(@numbers)
+        AND DATE(Completion) BETWEEN @start_date AND @end_date
         """
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        if not df.empty:
-            df["Total_Debit"] = df["Total_Debit"].apply(lambda x: f"Rp {format_rupiah(float(x))}" if pd.notna(x) else "Rp 0")
-            df["Total_Transaksi_NGRS"] = df["Total_Transaksi_NGRS"].apply(lambda x: f"Rp {format_rupiah(float(x))}" if pd.notna(x) else "Rp 0")
-        return df
+        job_config = bigquery.QueryJobConfig(
+            use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE,
+            query_parameters=[
+                bigquery.ArrayQueryParameter("numbers", "STRING", list(numbers)),
+                bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
+                bigquery.ScalarQueryParameter("end_date", "DATE", end_date),
+            ]
+        )
+        return run_query(client, query, job_config=job_config)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data agregat: {e}")
+        st.error(f"Terjadi kesalahan saat mengambil riwayat NGRS massal: {e}")
         return pd.DataFrame()
 
-# Fungsi untuk mengambil aggregated data (b) (dengan caching)
+# Fungsi untuk mengambil riwayat TopUp LinkAja (LinkAjaXPJP) banyak nomor sekaligus dalam satu query
 @st.cache_data
-def fetch_aggregated_data_b_cached(start_date, end_date, cluster_ids):
+def fetch_linkaja_history_batch(numbers, start_date, end_date):
     client = get_bigquery_client()
     if client is None:
         return pd.DataFrame()
     try:
-        query = f"""
-        WITH ngrs_aggregated AS (
-            SELECT 
-                NoChip, 
-                SUM(CAST(SpendAmount AS FLOAT64)) AS Total_Transaksi_NGRS, 
-                COUNT(SpendAmount) AS Total_SpendAmount
-            FROM `alfred-analytics-406004.analytics_alfred.ALL`
-            WHERE DATE(Completion) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            GROUP BY NoChip
-        ),
-        la_aggregated AS (
-            SELECT 
-                NoRS, 
-                ClusterID AS Cluster_ID,
-                SUM(CAST(Debit AS FLOAT64)) AS Total_Debit, 
-                COUNT(Debit) AS Total_Transaksi_Debit
-            FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP`
-            WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join([str(cluster) for cluster in cluster_ids])})
-            AND pjp_NoRS IS NOT NULL
-            GROUP BY NoRS, ClusterID
-        )
-        SELECT 
-            LA.NoRS,  
-            CAST(LA.ClusterID AS STRING) AS ClusterID,
-            COALESCE(la_aggregated.Total_Debit, 0) AS Total_Debit, 
-            COALESCE(la_aggregated.Total_Transaksi_Debit, 0) AS Total_Transaksi_Debit, 
-            COALESCE(ngrs_aggregated.Total_Transaksi_NGRS, 0) AS Total_Transaksi_NGRS,
-            COALESCE(ngrs_aggregated.Total_SpendAmount, 0) AS Total_SpendAmount,
-            LA.OutletName
-        FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP` AS LA
-        LEFT JOIN la_aggregated ON LA.NoRS = la_aggregated.NoRS
-        LEFT JOIN ngrs_aggregated ON LA.NoRS = ngrs_aggregated.NoChip
-        WHERE DATE(LA.InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND LA.ClusterID IN ({', '.join([str(cluster) for cluster in cluster_ids])})
-        AND LA.pjp_NoRS IS NOT NULL
-        GROUP BY 
-            LA.NoRS, 
-            LA.ClusterID,
-            la_aggregated.Total_Debit, 
-            la_aggregated.Total_Transaksi_Debit, 
-            ngrs_aggregated.Total_Transaksi_NGRS, 
-            ngrs_aggregated.Total_SpendAmount,
-            LA.OutletName
+        query = """
+        SELECT
+            CAST(NoRS AS STRING) AS NoRS,
+            DATE(InitiateDate) AS date,
+            CAST(Debit AS FLOAT64) AS Debit,
+            pjp_NoRS IS NOT NULL AS is_pjp
+        FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP`
+        WHERE CAST(NoRS AS STRING) IN UNNEST(@numbers)
+        AND DATE(InitiateDate) BETWEEN @start_date AND @end_date
         """
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        if not df.empty:
-            df["Total_Debit"] = df["Total_Debit"].apply(lambda x: f"Rp {format_rupiah(float(x))}" if pd.notna(x) else "Rp 0")
-            df["Total_Transaksi_NGRS"] = df["Total_Transaksi_NGRS"].apply(lambda x: f"Rp {format_rupiah(float(x))}" if pd.notna(x) else "Rp 0")
-        return df
+        job_config = bigquery.QueryJobConfig(
+            use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE,
+            query_parameters=[
+                bigquery.ArrayQueryParameter("numbers", "STRING", list(numbers)),
+                bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
+                bigquery.ScalarQueryParameter("end_date", "DATE", end_date),
+            ]
+        )
+        return run_query(client, query, job_config=job_config)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data agregat: {e}")
+        st.error(f"Terjadi kesalahan saat mengambil riwayat LinkAja massal: {e}")
         return pd.DataFrame()
 
+# Fungsi untuk menyusun laporan gabungan per nomor dan per hari (semua agregasi vektorisasi)
+def build_batch_report(numbers, df_ngrs, df_linkaja):
+    daily_columns = ["Nomor", "Tanggal", "Jml Transaksi NGRS", "Total Spend NGRS", "Jml Transaksi LinkAja", "Total Debit LinkAja"]
+    if df_ngrs.empty:
+        ngrs_daily = pd.DataFrame(columns=["Nomor", "Tanggal", "Jml Transaksi NGRS", "Total Spend NGRS"])
+    else:
+        df_ngrs = df_ngrs.assign(Nomor=normalize_number_series(df_ngrs["NoChip"]).to_numpy(), Tanggal=df_ngrs["date"])
+        ngrs_daily = df_ngrs.groupby(["Nomor", "Tanggal"], as_index=False).agg(
+            **{"Jml Transaksi NGRS": ("SpendAmount", "size"), "Total Spend NGRS": ("SpendAmount", "sum")}
+        )
+    if df_linkaja.empty:
+        linkaja_daily = pd.DataFrame(columns=["Nomor", "Tanggal", "Jml Transaksi LinkAja", "Total Debit LinkAja"])
+    else:
+        df_linkaja = df_linkaja.assign(Nomor=normalize_number_series(df_linkaja["NoRS"]).to_numpy(), Tanggal=df_linkaja["date"])
+        linkaja_daily = df_linkaja.groupby(["Nomor", "Tanggal"], as_index=False).agg(
+            **{"Jml Transaksi LinkAja": ("Debit", "size"), "Total Debit LinkAja": ("Debit", "sum")}
+        )
+
+    daily = ngrs_daily.merge(linkaja_daily, on=["Nomor", "Tanggal"], how="outer")
+    daily = daily.reindex(columns=daily_columns)
+    daily[daily_columns[2:]] = daily[daily_columns[2:]].fillna(0)
+    daily[["Jml Transaksi NGRS", "Jml Transaksi LinkAja"]] = daily[["Jml Transaksi NGRS", "Jml Transaksi LinkAja"]].astype(int)
+    daily = daily.sort_values(["Nomor", "Tanggal"]).reset_index(drop=True)
+
+    active_days = daily.assign(
+        ngrs_active=(daily["Jml Transaksi NGRS"] > 0).astype(int),
+        linkaja_active=(daily["Jml Transaksi LinkAja"] > 0).astype(int),
+    )
+    summary = active_days.groupby("Nomor").agg(
+        **{
+            "Jml Transaksi NGRS": ("Jml Transaksi NGRS", "sum"),
+            "Total Spend NGRS": ("Total Spend NGRS", "sum"),
+            "Hari Aktif NGRS": ("ngrs_active", "sum"),
+            "Jml Transaksi LinkAja": ("Jml Transaksi LinkAja", "sum"),
+            "Total Debit LinkAja": ("Total Debit LinkAja", "sum"),
+            "Hari Aktif LinkAja": ("linkaja_active", "sum"),
+            "Tanggal Pertama": ("Tanggal", "min"),
+            "Tanggal Terakhir": ("Tanggal", "max"),
+        }
+    )
+    summary = summary.reindex(pd.Index(numbers, name="Nomor")).reset_index()
+    count_columns = ["Jml Transaksi NGRS", "Total Spend NGRS", "Hari Aktif NGRS", "Jml Transaksi LinkAja", "Total Debit LinkAja", "Hari Aktif LinkAja"]
+    summary[count_columns] = summary[count_columns].fillna(0)
+    int_columns = ["Jml Transaksi NGRS", "Hari Aktif NGRS", "Jml Transaksi LinkAja", "Hari Aktif LinkAja"]
+    summary[int_columns] = summary[int_columns].astype(int)
+    summary["Selisih Debit - Spend"] = summary["Total Debit LinkAja"] - summary["Total Spend NGRS"]
+    summary["Status"] = "Ada di NGRS & LinkAja"
+    summary.loc[summary["Jml Transaksi NGRS"] == 0, "Status"] = "Hanya LinkAja"
+    summary.loc[summary["Jml Transaksi LinkAja"] == 0, "Status"] = "Hanya NGRS"
+    summary.loc[(summary["Jml Transaksi NGRS"] == 0) & (summary["Jml Transaksi LinkAja"] == 0), "Status"] = "Tidak Ditemukan"
+    return summary, daily
+
+# Fungsi untuk membuat file Excel laporan investigasi massal
+def batch_report_to_excel(summary, daily):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        summary.to_excel(writer, sheet_name='Ringkasan', index=False)
+        daily.to_excel(writer, sheet_name='Harian', index=False)
+    return output.getvalue()
+
 # Fungsi untuk format Rupiah
 def format_rupiah(value):
     return f"{value:,.0f}".replace(",", ".")
 
+# Fragment investigasi massal banyak NoChip/NoRS sekaligus (form dan hasilnya tidak menjalankan ulang halaman)
+@st.fragment
+def render_batch_investigation(default_start, default_end):
+    with timed("Update investigasi massal"):
+        st.markdown('<div class="group-header">Investigasi Massal NoChip / NoRS</div>', unsafe_allow_html=True)
+        with st.form(key="batch_chip_form"):
+            numbers_text = st.text_area("Daftar nomor (satu per baris, atau pisahkan dengan koma)", key="batch_numbers_text")
+            uploaded_file = st.file_uploader("Atau unggah file CSV/XLSX (kolom pertama berisi nomor)", type=["csv", "xlsx"], key="batch_numbers_file")
+            batch_date_range = st.date_input("Rentang tanggal", [default_start, default_end], key="batch_date")
+            submit_batch = st.form_submit_button("Proses Investigasi Massal")
+
+        if submit_batch:
+            raw_numbers = pd.Series(numbers_text.replace(",", "\n").splitlines(), dtype="object")
+            if uploaded_file is not None:
+                try:
+                    if uploaded_file.name.lower().endswith(".xlsx"):
+                        df_upload = pd.read_excel(uploaded_file, dtype=str)
+                    else:
+                        df_upload = pd.read_csv(uploaded_file, dtype=str)
+                    raw_numbers = pd.concat([raw_numbers, df_upload.iloc[:, 0]], ignore_index=True)
+                except Exception as e:
+                    st.error(f"File tidak dapat dibaca: {e}")
+            numbers = normalize_number_series(raw_numbers.dropna()).dropna().drop_duplicates().tolist()
+            batch_start, batch_end = batch_date_range if len(batch_date_range) == 2 else (default_start, default_end)
+            st.session_state["batch_chip_request"] = (tuple(numbers), batch_start.strftime('%Y-%m-%d'), batch_end.strftime('%Y-%m-%d'))
+
+        if "batch_chip_request" not in st.session_state:
+            return
+        numbers, batch_start, batch_end = st.session_state["batch_chip_request"]
+        if not numbers:
+            st.warning("Tidak ada nomor valid untuk diinvestigasi.")
+            return
+
+        # Tabel menyimpan nomor dalam bentuk yang beragam; cari bentuk 62xxx sekaligus 0xxx dan 8xxx
+        local_numbers = [number[2:] for number in numbers if number.startswith("62")]
+        lookup_numbers = tuple(sorted(set(numbers) | {"0" + number for number in local_numbers} | set(local_numbers)))
+        with st.spinner(f"Mengambil riwayat {len(numbers):,} nomor...".replace(",", ".")):
+            df_ngrs = fetch_ngrs_history_batch(lookup_numbers, batch_start, batch_end)
+            df_linkaja = fetch_linkaja_history_batch(lookup_numbers, batch_start, batch_end)
+            summary, daily = build_batch_report(list(numbers), df_ngrs, df_linkaja)
+
+        status_counts = summary["Status"].value_counts()
+        col_b1, col_b2, col_b3, col_b4 = st.columns(4)
+        for col, label in zip((col_b1, col_b2, col_b3, col_b4), ("Ada di NGRS & LinkAja", "Hanya LinkAja", "Hanya NGRS", "Tidak Ditemukan")):
+            with col:
+                st.markdown(f'<div class="scorecard"><div class="metric-label">{label}</div><div class="metric-value">{int(status_counts.get(label, 0)):,}</div></div>', unsafe_allow_html=True)
+
+        summary_display = summary.copy()
+        for column in ["Total Spend NGRS", "Total Debit LinkAja", "Selisih Debit - Spend"]:
+            summary_display[column] = summary_display[column].apply(lambda x: f"Rp {format_rupiah(x)}")
+        st.dataframe(summary_display, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="Unduh Laporan Investigasi Massal (Excel)",
+            data=batch_report_to_excel(summary, daily),
+            file_name=f"Investigasi_Massal_{batch_start}_to_{batch_end}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+# Fragment pencarian NoChip/NoRS: kata kunci, tanggal, dan filter TransactionType hanya menjalankan ulang bagian ini
+@st.fragment
+def render_number_search(default_start, default_end):
+    with timed("Update pencarian nomor"):
+        # Filter Pencarian dan Tanggal dalam container
+        with st.container():
+            st.markdown('<div class="filter-section"><div class="filter-title">🔍 Filter Pencarian dan Tanggal</div>', unsafe_allow_html=True)
+            search_term = st.text_input("", placeholder="Cari NoChip atau NoRS...", label_visibility="collapsed")
+        
+            col_date1, col_date2 = st.columns(2)
+            with col_date1:
+                st.markdown('<p style="color: #34495e; font-weight: bold;">Tanggal TopUp LinkAja</p>', unsafe_allow_html=True)
+                linkaja_date_range = st.date_input("", [default_start, default_end], key="linkaja_date", label_visibility="collapsed")
+                linkaja_start_date, linkaja_end_date = linkaja_date_range if len(linkaja_date_range) == 2 else (default_start, default_end)
+            with col_date2:
+                st.markdown('<p style="color: #34495e; font-weight: bold;">Tanggal NGRS</p>', unsafe_allow_html=True)
+                ngrs_date_range = st.date_input("", [default_start, default_end], key="ngrs_date", label_visibility="collapsed")
+                ngrs_start_date, ngrs_end_date = ngrs_date_range if len(ngrs_date_range) == 2 else (default_start, default_end)
+
+            # Filter TransactionType
+            if search_term:
+                df_all_temp = fetch_bigquery_data("ALL", search_term, "NoChip")
+                if df_all_temp is not None and not df_all_temp.empty and "TransactionType" in df_all_temp.columns:
+                    transaction_types = df_all_temp["TransactionType"].unique().tolist()
+                    selected_transaction_types = st.multiselect(
+                        "Pilih Jenis Transaksi", transaction_types, default=transaction_types, 
+                        key="transaction_type_filter", help="Filter transaksi berdasarkan jenis."
+                    )
+                else:
+                    selected_transaction_types = []
+            else:
+                selected_transaction_types = []
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        # Scorecard NGRS dan LinkAja
+        if search_term:
+            with st.spinner("Mengambil data untuk Scorecard..."):
+                df_all = fetch_bigquery_data("ALL", search_term, "NoChip")
+                if df_all is not None and not df_all.empty and "Completion" in df_all.columns:
+                    df_all["Completion"] = pd.to_datetime(df_all["Completion"])
+                    df_all_filtered = df_all[
+                        (df_all["Completion"].dt.date >= ngrs_start_date) & 
+                        (df_all["Completion"].dt.date <= ngrs_end_date)
+                    ]
+                    if not df_all_filtered.empty:
+                        if "TransactionType" in df_all_filtered.columns and selected_transaction_types:
+                            df_all_filtered = df_all_filtered[df_all_filtered["TransactionType"].isin(selected_transaction_types)]
+                        if not df_all_filtered.empty:
+                            st.markdown('<div class="group-header">Ringkasan Data NGRS</div>', unsafe_allow_html=True)
+                            col_score1, col_score2, col_score3 = st.columns(3)
+                            with col_score1:
+                                outlet_ids = df_all_filtered["OutletID"].dropna().unique().tolist() if "OutletID" in df_all_filtered.columns else []
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Outlet ID</div><div class="metric-value">{", ".join(map(str, outlet_ids)) if len(outlet_ids) <= 2 else f"{len(outlet_ids)} (Multiple)" or "N/A"}</div></div>', unsafe_allow_html=True)
+                            with col_score2:
+                                outlet_names = df_all_filtered["OutletName"].dropna().unique().tolist() if "OutletName" in df_all_filtered.columns else []
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Outlet Name</div><div class="metric-value">{", ".join(map(str, outlet_names)) if len(outlet_names) <= 2 else f"{len(outlet_names)} (Multiple)" or "N/A"}</div></div>', unsafe_allow_html=True)
+                            with col_score3:
+                                clusters = df_all_filtered["Cluster"].dropna().unique().tolist() if "Cluster" in df_all_filtered.columns else []
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Cluster</div><div class="metric-value">{", ".join(map(str, clusters)) if len(clusters) <= 2 else f"{len(clusters)} (Multiple)" or "N/A"}</div></div>', unsafe_allow_html=True)
+
+                            col_score4, col_score5, col_score6, col_score7 = st.columns(4)
+                            df_linkaja = fetch_bigquery_data("LinkAjaXPJP", search_term, "NoRS")
+                            total_debit = linkaja_transaction_count = 0
+                            if df_linkaja is not None and not df_linkaja.empty and "InitiateDate" in df_linkaja.columns and "Debit" in df_linkaja.columns:
+                                df_linkaja["InitiateDate"] = pd.to_datetime(df_linkaja["InitiateDate"])
+                                df_linkaja_filtered = df_linkaja[
+                                    (df_linkaja["InitiateDate"].dt.date >= linkaja_start_date) & 
+                                    (df_linkaja["InitiateDate"].dt.date <= linkaja_end_date)
+                                ]
+                                if not df_linkaja_filtered.empty:
+                                    df_linkaja_filtered["Debit"] = pd.to_numeric(df_linkaja_filtered["Debit"], errors='coerce').fillna(0)
+                                    total_debit = df_linkaja_filtered["Debit"].sum()
+                                    linkaja_transaction_count = len(df_linkaja_filtered)
+                            with col_score4:
+                                transaction_count = len(df_all_filtered["TransactionAmount"]) if "TransactionAmount" in df_all_filtered.columns else 0
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Jml Transaksi NGRS</div><div class="metric-value">{transaction_count:,}</div></div>', unsafe_allow_html=True)
+                            with col_score5:
+                                total_spend = df_all_filtered["SpendAmount"].sum() if "SpendAmount" in df_all_filtered.columns else 0
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Total Spend</div><div class="metric-value">Rp {format_rupiah(total_spend)}</div></div>', unsafe_allow_html=True)
+                            with col_score6:
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Total Debit LinkAja</div><div class="metric-value">Rp {format_rupiah(total_debit)}</div></div>', unsafe_allow_html=True)
+                            with col_score7:
+                                st.markdown(f'<div class="scorecard"><div class="metric-label">Jml Transaksi LinkAja</div><div class="metric-value">{linkaja_transaction_count:,}</div></div>', unsafe_allow_html=True)
+                        else:
+                            st.warning("Tidak ada data setelah menerapkan filter untuk scorecard.")
+                    else:
+                        st.warning("Tidak ada data dalam rentang tanggal yang dipilih untuk scorecard.")
+                else:
+                    st.warning("Tidak ada data yang cocok untuk scorecard.")
+
+        # Layout dua kolom untuk grafik dan tabel
+        col1, col2 = st.columns(2)
+
+        # Kolom Kiri: Transaksi TopUp LinkAja
+        with col1:
+            st.markdown('<div class="group-header">Transaksi TopUp LinkAja</div>', unsafe_allow_html=True)
+            if search_term:
+                with st.spinner("Mengambil data LinkAjaXPJP..."):
+                    df_linkaja = fetch_bigquery_data("LinkAjaXPJP", search_term, "NoRS")
+                    if df_linkaja is not None and not df_linkaja.empty and "InitiateDate" in df_linkaja.columns and "Debit" in df_linkaja.columns:
+                        df_linkaja["InitiateDate"] = pd.to_datetime(df_linkaja["InitiateDate"])
+                        df_linkaja_filtered = df_linkaja[
+                            (df_linkaja["InitiateDate"].dt.date >= linkaja_start_date) & 
+                            (df_linkaja["InitiateDate"].dt.date <= linkaja_end_date)
+                        ]
+                        if not df_linkaja_filtered.empty:
+                            df_linkaja_filtered["Debit"] = pd.to_numeric(df_linkaja_filtered["Debit"], errors='coerce').fillna(0)
+                            df_linkaja_agg = df_linkaja_filtered.groupby(df_linkaja_filtered["InitiateDate"].dt.date).agg(
+                                Count=('InitiateDate', 'size'), Total_Debit=('Debit', 'sum')
+                            ).reset_index().sort_values("InitiateDate")
+                            df_linkaja_agg, granularity = resample_timeseries(df_linkaja_agg, "InitiateDate", ["Count", "Total_Debit"])
+                            fig_linkaja = make_subplots(specs=[[{"secondary_y": True}]])
+                            fig_linkaja.add_trace(timeseries_trace(
+                                df_linkaja_agg["InitiateDate"], df_linkaja_agg["Count"], "Jumlah Data", "#2980b9"
+                            ), secondary_y=False)
+                            fig_linkaja.add_trace(go.Bar(
+                                x=df_linkaja_agg["InitiateDate"], y=df_linkaja_agg["Total_Debit"], name="Total Debit (Rp)", 
+                                opacity=0.6, text=extrema_text(df_linkaja_agg["Total_Debit"], format_rupiah), textposition="auto", marker_color="#3498db"
+                            ), secondary_y=True)
+                            fig_linkaja.update_layout(
+                                xaxis_title=time_axis_title(granularity), yaxis_title="Jumlah Data", yaxis2_title="Total Debit (Rp)", 
+                                legend=dict(x=0, y=1.1, orientation="h"), template="plotly_white"
+                            )
+                            st.plotly_chart(fig_linkaja, use_container_width=True)
+                            df_linkaja_display = df_linkaja_filtered.copy()
+                            if "Debit" in df_linkaja_display.columns:
+                                df_linkaja_display["Debit"] = df_linkaja_display["Debit"].apply(format_rupiah)
+                            st.dataframe(df_linkaja_display, use_container_width=True)
+                            st.write(f"**Total Data:** {len(df_linkaja_filtered)}", unsafe_allow_html=True)
+                        else:
+                            st.warning("Tidak ada data dalam rentang tanggal yang dipilih untuk LinkAjaXPJP.")
+                    else:
+                        st.warning("Tidak ada data yang cocok untuk LinkAjaXPJP.")
+            else:
+                st.info("Masukkan NoChip atau NoRS untuk melihat data LinkAjaXPJP.")
+
+        # Kolom Kanan: Transaksi NGRS
+        with col2:
+            st.markdown('<div class="group-header">Transaksi NGRS</div>', unsafe_allow_html=True)
+            if search_term:
+                with st.spinner("Mengambil data ALL..."):
+                    df_all = fetch_bigquery_data("ALL", search_term, "NoChip")
+                    if df_all is not None and not df_all.empty and "Completion" in df_all.columns:
+                        df_all["Completion"] = pd.to_datetime(df_all["Completion"])
+                        df_all_filtered = df_all[
+                            (df_all["Completion"].dt.date >= ngrs_start_date) & 
+                            (df_all["Completion"].dt.date <= ngrs_end_date)
+                        ]
+                        if not df_all_filtered.empty:
+                            if "TransactionType" in df_all_filtered.columns and selected_transaction_types:
+                                df_all_filtered = df_all_filtered[df_all_filtered["TransactionType"].isin(selected_transaction_types)]
+                            if not df_all_filtered.empty:
+                                df_completion = df_all_filtered.groupby(df_all_filtered["Completion"].dt.date).size().reset_index(name="Count").sort_values("Completion")
+                                df_completion, granularity = resample_timeseries(df_completion, "Completion", ["Count"])
+                                fig_completion = go.Figure()
+                                fig_completion.add_trace(timeseries_trace(
+                                    df_completion["Completion"], df_completion["Count"], "Jumlah Data", "#e74c3c"
+                                ))
+                                fig_completion.update_layout(
+                                    xaxis_title=time_axis_title(granularity), yaxis_title="Jumlah Data", template="plotly_white"
+                                )
+                                st.plotly_chart(fig_completion, use_container_width=True)
+                                df_display = df_all_filtered.copy()
+                                if "SpendAmount" in df_display.columns:
+                                    df_display["SpendAmount"] = df_display["SpendAmount"].apply(format_rupiah)
+                                st.dataframe(df_display, use_container_width=True)
+                                st.write(f"**Total Data:** {len(df_all_filtered)}", unsafe_allow_html=True)
+                            else:
+                                st.warning("Tidak ada data setelah menerapkan filter TransactionType.")
+                        else:
+                            st.warning("Tidak ada data dalam rentang tanggal yang dipilih untuk ALL.")
+                    else:
+                        st.warning("Tidak ada data yang cocok untuk ALL.")
+            else:
+                st.info("Masukkan NoChip atau NoRS untuk melihat data ALL.")
+
+# Fungsi untuk scorecard Total Chip Overview
+def render_chip_overview(chip_data):
+    total_chip = chip_data["total_chip"]
+    total_chip_unverified = chip_data["total_chip_unverified"]
+    chip_approximate = chip_data["approximate"]
+    chip_prefix = "≈ " if chip_approximate else ""
+    chip_label = " (perkiraan)" if chip_approximate else ""
+
+    st.markdown('<div class="group-header">Total Chip Overview</div>', unsafe_allow_html=True)
+    col_chip1, col_chip2 = st.columns(2)
+    with col_chip1:
+        st.markdown(
+            f"""
+            <div class="scorecard">
+                <div class="metric-label">Total Chip{chip_label}</div>
+                <div class="metric-value">{chip_prefix}{total_chip:,}</div>
+            </div>
+            """, unsafe_allow_html=True
+        )
+    with col_chip2:
+        st.markdown(
+            f"""
+            <div class="scorecard">
+                <div class="metric-label">Total Chip PJP Unverified{chip_label}</div>
+                <div class="metric-value">{chip_prefix}{total_chip_unverified:,}</div>
+            </div>
+            """, unsafe_allow_html=True
+        )
+
+# Fungsi untuk tabel Transaction Summary (label perkiraan hanya jika kubusnya sendiri masih perkiraan)
+def render_transaction_summary(transaction_df, start_date, end_date):
+    st.markdown('<div class="group-header">Transaction Summary</div>', unsafe_allow_html=True)
+    render_approximate_notice([cube_preview_key(CUBE_SOURCES_CHIP, start_date, end_date)])
+    if not transaction_df.empty:
+        st.dataframe(transaction_df, use_container_width=True)
+    else:
+        st.warning("Tidak ada data transaksi yang tersedia untuk ditampilkan.")
+
+# Fungsi untuk tabel agregat TopUp dan NGRS: satu hasil query, dipisah lokal menurut verified (pjp_NoRS IS NOT NULL)
+def render_aggregated_tables(aggregated_all_df, selected_cluster_ids):
+    aggregated_df = split_aggregated_data(aggregated_all_df, False, selected_cluster_ids)
+    aggregated_df_b = split_aggregated_data(aggregated_all_df, True, selected_cluster_ids)
+
+    st.markdown('<div class="group-header">Transasksi TopUp dan NGRS No Chip NoN PJP</div>', unsafe_allow_html=True)
+    if not aggregated_df.empty:
+        st.dataframe(aggregated_df, use_container_width=True)
+    else:
+        st.warning("Tidak ada data agregat yang tersedia untuk ditampilkan.")
+
+    st.markdown('<div class="group-header">Transasksi TopUp dan NGRS No Chip PJP</div>', unsafe_allow_html=True)
+    if not aggregated_df_b.empty:
+        st.dataframe(aggregated_df_b, use_container_width=True)
+    else:
+        st.warning("Tidak ada data agregat yang tersedia untuk ditampilkan.")
+
+# Fungsi untuk mengambil daftar ClusterID untuk filter
+@st.cache_data(ttl=DIMENSION_TTL)
+def fetch_clusters():
+    client = get_bigquery_client()
+    if client is None:
+        return []
+    query = "SELECT DISTINCT ClusterID FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP` "
+    df = run_query(client, query)
+    return [int(x) for x in df["ClusterID"].tolist()]
+
+# Fungsi untuk rentang tanggal tampilan default (awal bulan sampai hari ini)
+def default_views():
+    today = datetime.now().date()
+    return [(date(today.year, today.month, 1), today)]
+
+# Fungsi untuk memanaskan cache tampilan default (dipanggil oleh warmup.py).
+# Argumen harus sama persis dengan pemanggilan di main() agar kunci cache cocok.
+# Semua data diambil untuk seluruh cluster, jadi cukup dihangatkan per rentang tanggal. Entri lama
+# tampilan default dibuang dulu (fetcher tanpa TTL), agar tiap jadwal benar-benar memuat data terbaru.
+def warm_cache():
+    fetch_clusters()
+    for view_start, view_end in default_views():
+        start_date = view_start.strftime('%Y-%m-%d')
+        end_date = view_end.strftime('%Y-%m-%d')
+        fetch_chip_numbers_cached.clear("LinkAjaXPJP", "InitiateDate", start_date, end_date, "ClusterID")
+        clear_chip_sketches(start_date, end_date)
+        clear_metrics_cube(CUBE_SOURCES_CHIP, start_date, end_date)
+        fetch_aggregated_data_cached.clear(start_date, end_date)
+        fetch_chip_numbers(
+            table_name="LinkAjaXPJP", date_column="InitiateDate",
+            start_date=start_date, end_date=end_date, cluster_column="ClusterID"
+        )
+        load_chip_sketches(start_date, end_date)
+        load_metrics_cube(CUBE_SOURCES_CHIP, start_date, end_date)
+        fetch_aggregated_data(start_date=start_date, end_date=end_date)
+
 # Fungsi utama
 def main():
     # Custom CSS untuk tampilan yang lebih menarik
@@ -336,269 +751,41 @@ def main():
         chip_date_range = st.date_input("", [default_start, default_end], key="chip_date", label_visibility="collapsed")
         chip_start_date, chip_end_date = chip_date_range if len(chip_date_range) == 2 else (default_start, default_end)
 
-        def fetch_clusters():
-            client = get_bigquery_client()
-            if client is None:
-                return []
-            query = "SELECT DISTINCT ClusterID FROM `alfred-analytics-406004.analytics_alfred.LinkAjaXPJP` "
-            df = client.query(query).to_dataframe()
-            return [int(x) for x in df["ClusterID"].tolist()]
-
         cluster_ids = fetch_clusters()
         selected_cluster_ids = st.multiselect("Pilih ClusterID", cluster_ids, default=cluster_ids, key="cluster_id_filter", 
                                              help="Pilih satu atau lebih ClusterID untuk analisis.")
+        chip_exact = st.checkbox("Hitung Total Chip exact", value=True, key="chip_exact",
+                                 help=f"Tanpa centang, Total Chip diperkirakan dari sketch HLL harian (galat ~±{2 * HLL_RELATIVE_ERROR:.1%}).")
 
-    # Total Chip Overview
-    with st.spinner("Mengambil data Total Chip..."):
-        chip_data = fetch_chip_data_cached(
+    # Total Chip, Transaction Summary, dan tabel agregat diambil bersamaan dan ditampilkan bertahap
+    start_date = chip_start_date.strftime('%Y-%m-%d')
+    end_date = chip_end_date.strftime('%Y-%m-%d')
+    loaders = {
+        "chip": lambda: fetch_chip_data(
             table_name="LinkAjaXPJP", date_column="InitiateDate",
-            start_date=chip_start_date.strftime('%Y-%m-%d'), 
-            end_date=chip_end_date.strftime('%Y-%m-%d'), 
-            cluster_column="ClusterID", 
-            selected_clusters=tuple(selected_cluster_ids)
-        )
-        total_chip = chip_data["total_chip"]
-        total_chip_unverified = chip_data["total_chip_unverified"]
-
-    st.markdown('<div class="group-header">Total Chip Overview</div>', unsafe_allow_html=True)
-    col_chip1, col_chip2 = st.columns(2)
-    with col_chip1:
-        st.markdown(
-            f"""
-            <div class="scorecard">
-                <div class="metric-label">Total Chip</div>
-                <div class="metric-value">{total_chip:,}</div>
-            </div>
-            """, unsafe_allow_html=True
-        )
-    with col_chip2:
-        st.markdown(
-            f"""
-            <div class="scorecard">
-                <div class="metric-label">Total Chip PJP Unverified</div>
-                <div class="metric-value">{total_chip_unverified:,}</div>
-            </div>
-            """, unsafe_allow_html=True
-        )
-
-    # Transaction Summary
-    with st.spinner("Mengambil data transaksi untuk tabel..."):
-        transaction_df = fetch_transaction_summary_cached(
-            linkaja_table="LinkAjaXPJP", 
-            ngrs_table="ALL", 
-            date_column_linkaja="InitiateDate", 
-            date_column_ngrs="Completion", 
-            start_date=chip_start_date.strftime('%Y-%m-%d'), 
-            end_date=chip_end_date.strftime('%Y-%m-%d'), 
-            cluster_column="ClusterID", 
-            selected_clusters=tuple(selected_cluster_ids)
-        )
-
-    st.markdown('<div class="group-header">Transaction Summary</div>', unsafe_allow_html=True)
-    if not transaction_df.empty:
-        st.dataframe(transaction_df, use_container_width=True)
-    else:
-        st.warning("Tidak ada data transaksi yang tersedia untuk ditampilkan.")
-
-    # Aggregated Transaction Summary (pjp_NoRS IS NULL)
-    with st.spinner("Mengambil data agregat LinkAja dan NGRS..."):
-        aggregated_df = fetch_aggregated_data_cached(
-            start_date=chip_start_date.strftime('%Y-%m-%d'),
-            end_date=chip_end_date.strftime('%Y-%m-%d'),
-            cluster_ids=tuple(selected_cluster_ids)
-        )
-
-    st.markdown('<div class="group-header">Transasksi TopUp dan NGRS No Chip NoN PJP</div>', unsafe_allow_html=True)
-    if not aggregated_df.empty:
-        st.dataframe(aggregated_df, use_container_width=True)
-    else:
-        st.warning("Tidak ada data agregat yang tersedia untuk ditampilkan.")
-
-    # Aggregated Transaction Summary (pjp_NoRS IS NOT NULL)
-    with st.spinner("Mengambil data agregat LinkAja dan NGRS..."):
-        aggregated_df_b = fetch_aggregated_data_b_cached(
-            start_date=chip_start_date.strftime('%Y-%m-%d'),
-            end_date=chip_end_date.strftime('%Y-%m-%d'),
-            cluster_ids=tuple(selected_cluster_ids)
-        )
-
-    st.markdown('<div class="group-header">Transasksi TopUp dan NGRS No Chip PJP</div>', unsafe_allow_html=True)
-    if not aggregated_df_b.empty:
-        st.dataframe(aggregated_df_b, use_container_width=True)
-    else:
-        st.warning("Tidak ada data agregat yang tersedia untuk ditampilkan.")
-
-    # Filter Pencarian dan Tanggal dalam container
-    with st.container():
-        st.markdown('<div class="filter-section"><div class="filter-title">🔍 Filter Pencarian dan Tanggal</div>', unsafe_allow_html=True)
-        search_term = st.text_input("", placeholder="Cari NoChip atau NoRS...", label_visibility="collapsed")
-        
-        col_date1, col_date2 = st.columns(2)
-        with col_date1:
-            st.markdown('<p style="color: #34495e; font-weight: bold;">Tanggal TopUp LinkAja</p>', unsafe_allow_html=True)
-            linkaja_date_range = st.date_input("", [default_start, default_end], key="linkaja_date", label_visibility="collapsed")
-            linkaja_start_date, linkaja_end_date = linkaja_date_range if len(linkaja_date_range) == 2 else (default_start, default_end)
-        with col_date2:
-            st.markdown('<p style="color: #34495e; font-weight: bold;">Tanggal NGRS</p>', unsafe_allow_html=True)
-            ngrs_date_range = st.date_input("", [default_start, default_end], key="ngrs_date", label_visibility="collapsed")
-            ngrs_start_date, ngrs_end_date = ngrs_date_range if len(ngrs_date_range) == 2 else (default_start, default_end)
-
-        # Filter TransactionType
-        if search_term:
-            df_all_temp = fetch_bigquery_data("ALL", search_term, "NoChip")
-            if df_all_temp is not None and not df_all_temp.empty and "TransactionType" in df_all_temp.columns:
-                transaction_types = df_all_temp["TransactionType"].unique().tolist()
-                selected_transaction_types = st.multiselect(
-                    "Pilih Jenis Transaksi", transaction_types, default=transaction_types, 
-                    key="transaction_type_filter", help="Filter transaksi berdasarkan jenis."
-                )
-            else:
-                selected_transaction_types = []
-        else:
-            selected_transaction_types = []
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Scorecard NGRS dan LinkAja
-    if search_term:
-        with st.spinner("Mengambil data untuk Scorecard..."):
-            df_all = fetch_bigquery_data("ALL", search_term, "NoChip")
-            if df_all is not None and not df_all.empty and "Completion" in df_all.columns:
-                df_all["Completion"] = pd.to_datetime(df_all["Completion"])
-                df_all_filtered = df_all[
-                    (df_all["Completion"].dt.date >= ngrs_start_date) & 
-                    (df_all["Completion"].dt.date <= ngrs_end_date)
-                ]
-                if not df_all_filtered.empty:
-                    if "TransactionType" in df_all_filtered.columns and selected_transaction_types:
-                        df_all_filtered = df_all_filtered[df_all_filtered["TransactionType"].isin(selected_transaction_types)]
-                    if not df_all_filtered.empty:
-                        st.markdown('<div class="group-header">Ringkasan Data NGRS</div>', unsafe_allow_html=True)
-                        col_score1, col_score2, col_score3 = st.columns(3)
-                        with col_score1:
-                            outlet_ids = df_all_filtered["OutletID"].dropna().unique().tolist() if "OutletID" in df_all_filtered.columns else []
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Outlet ID</div><div class="metric-value">{", ".join(map(str, outlet_ids)) if len(outlet_ids) <= 2 else f"{len(outlet_ids)} (Multiple)" or "N/A"}</div></div>', unsafe_allow_html=True)
-                        with col_score2:
-                            outlet_names = df_all_filtered["OutletName"].dropna().unique().tolist() if "OutletName" in df_all_filtered.columns else []
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Outlet Name</div><div class="metric-value">{", ".join(map(str, outlet_names)) if len(outlet_names) <= 2 else f"{len(outlet_names)} (Multiple)" or "N/A"}</div></div>', unsafe_allow_html=True)
-                        with col_score3:
-                            clusters = df_all_filtered["Cluster"].dropna().unique().tolist() if "Cluster" in df_all_filtered.columns else []
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Cluster</div><div class="metric-value">{", ".join(map(str, clusters)) if len(clusters) <= 2 else f"{len(clusters)} (Multiple)" or "N/A"}</div></div>', unsafe_allow_html=True)
-
-                        col_score4, col_score5, col_score6, col_score7 = st.columns(4)
-                        df_linkaja = fetch_bigquery_data("LinkAjaXPJP", search_term, "NoRS")
-                        total_debit = linkaja_transaction_count = 0
-                        if df_linkaja is not None and not df_linkaja.empty and "InitiateDate" in df_linkaja.columns and "Debit" in df_linkaja.columns:
-                            df_linkaja["InitiateDate"] = pd.to_datetime(df_linkaja["InitiateDate"])
-                            df_linkaja_filtered = df_linkaja[
-                                (df_linkaja["InitiateDate"].dt.date >= linkaja_start_date) & 
-                                (df_linkaja["InitiateDate"].dt.date <= linkaja_end_date)
-                            ]
-                            if not df_linkaja_filtered.empty:
-                                df_linkaja_filtered["Debit"] = pd.to_numeric(df_linkaja_filtered["Debit"], errors='coerce').fillna(0)
-                                total_debit = df_linkaja_filtered["Debit"].sum()
-                                linkaja_transaction_count = len(df_linkaja_filtered)
-                        with col_score4:
-                            transaction_count = len(df_all_filtered["TransactionAmount"]) if "TransactionAmount" in df_all_filtered.columns else 0
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Jml Transaksi NGRS</div><div class="metric-value">{transaction_count:,}</div></div>', unsafe_allow_html=True)
-                        with col_score5:
-                            total_spend = df_all_filtered["SpendAmount"].sum() if "SpendAmount" in df_all_filtered.columns else 0
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Total Spend</div><div class="metric-value">Rp {format_rupiah(total_spend)}</div></div>', unsafe_allow_html=True)
-                        with col_score6:
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Total Debit LinkAja</div><div class="metric-value">Rp {format_rupiah(total_debit)}</div></div>', unsafe_allow_html=True)
-                        with col_score7:
-                            st.markdown(f'<div class="scorecard"><div class="metric-label">Jml Transaksi LinkAja</div><div class="metric-value">{linkaja_transaction_count:,}</div></div>', unsafe_allow_html=True)
-                    else:
-                        st.warning("Tidak ada data setelah menerapkan filter untuk scorecard.")
-                else:
-                    st.warning("Tidak ada data dalam rentang tanggal yang dipilih untuk scorecard.")
-            else:
-                st.warning("Tidak ada data yang cocok untuk scorecard.")
+            start_date=start_date, end_date=end_date,
+            cluster_column="ClusterID",
+            selected_clusters=selected_cluster_ids,
+            exact=chip_exact
+        ),
+        "transactions": lambda: build_transaction_summary(
+            start_date=start_date, end_date=end_date, selected_clusters=selected_cluster_ids
+        ),
+        "aggregated": lambda: fetch_aggregated_data(start_date=start_date, end_date=end_date),
+    }
+    sections = [
+        progressive_section("Total Chip", ["chip"], lambda results: render_chip_overview(results["chip"])),
+        progressive_section("Transaction Summary", ["transactions"], lambda results: render_transaction_summary(results["transactions"], start_date, end_date)),
+        progressive_section("data agregat LinkAja dan NGRS", ["aggregated"],
+                            lambda results: render_aggregated_tables(results["aggregated"], selected_cluster_ids)),
+    ]
+    render_progressively("Chip Tracking", loaders, sections)
 
-    # Layout dua kolom untuk grafik dan tabel
-    col1, col2 = st.columns(2)
+    render_number_search(default_start, default_end)
 
-    # Kolom Kiri: Transaksi TopUp LinkAja
-    with col1:
-        st.markdown('<div class="group-header">Transaksi TopUp LinkAja</div>', unsafe_allow_html=True)
-        if search_term:
-            with st.spinner("Mengambil data LinkAjaXPJP..."):
-                df_linkaja = fetch_bigquery_data("LinkAjaXPJP", search_term, "NoRS")
-                if df_linkaja is not None and not df_linkaja.empty and "InitiateDate" in df_linkaja.columns and "Debit" in df_linkaja.columns:
-                    df_linkaja["InitiateDate"] = pd.to_datetime(df_linkaja["InitiateDate"])
-                    df_linkaja_filtered = df_linkaja[
-                        (df_linkaja["InitiateDate"].dt.date >= linkaja_start_date) & 
-                        (df_linkaja["InitiateDate"].dt.date <= linkaja_end_date)
-                    ]
-                    if not df_linkaja_filtered.empty:
-                        df_linkaja_filtered["Debit"] = pd.to_numeric(df_linkaja_filtered["Debit"], errors='coerce').fillna(0)
-                        df_linkaja_agg = df_linkaja_filtered.groupby(df_linkaja_filtered["InitiateDate"].dt.date).agg(
-                            Count=('InitiateDate', 'size'), Total_Debit=('Debit', 'sum')
-                        ).reset_index().sort_values("InitiateDate")
-                        fig_linkaja = make_subplots(specs=[[{"secondary_y": True}]])
-                        fig_linkaja.add_trace(go.Scatter(
-                            x=df_linkaja_agg["InitiateDate"], y=df_linkaja_agg["Count"], mode="lines+markers+text", 
-                            name="Jumlah Data", text=df_linkaja_agg["Count"], textposition="top center", line=dict(color="#2980b9")
-                        ), secondary_y=False)
-                        fig_linkaja.add_trace(go.Bar(
-                            x=df_linkaja_agg["InitiateDate"], y=df_linkaja_agg["Total_Debit"], name="Total Debit (Rp)", 
-                            opacity=0.6, text=df_linkaja_agg["Total_Debit"].apply(format_rupiah), textposition="auto", marker_color="#3498db"
-                        ), secondary_y=True)
-                        fig_linkaja.update_layout(
-                            xaxis_title="Tanggal", yaxis_title="Jumlah Data", yaxis2_title="Total Debit (Rp)", 
-                            legend=dict(x=0, y=1.1, orientation="h"), template="plotly_white"
-                        )
-                        st.plotly_chart(fig_linkaja, use_container_width=True)
-                        df_linkaja_display = df_linkaja_filtered.copy()
-                        if "Debit" in df_linkaja_display.columns:
-                            df_linkaja_display["Debit"] = df_linkaja_display["Debit"].apply(format_rupiah)
-                        st.dataframe(df_linkaja_display, use_container_width=True)
-                        st.write(f"**Total Data:** {len(df_linkaja_filtered)}", unsafe_allow_html=True)
-                    else:
-                        st.warning("Tidak ada data dalam rentang tanggal yang dipilih untuk LinkAjaXPJP.")
-                else:
-                    st.warning("Tidak ada data yang cocok untuk LinkAjaXPJP.")
-        else:
-            st.info("Masukkan NoChip atau NoRS untuk melihat data LinkAjaXPJP.")
-
-    # Kolom Kanan: Transaksi NGRS
-    with col2:
-        st.markdown('<div class="group-header">Transaksi NGRS</div>', unsafe_allow_html=True)
-        if search_term:
-            with st.spinner("Mengambil data ALL..."):
-                df_all = fetch_bigquery_data("ALL", search_term, "NoChip")
-                if df_all is not None and not df_all.empty and "Completion" in df_all.columns:
-                    df_all["Completion"] = pd.to_datetime(df_all["Completion"])
-                    df_all_filtered = df_all[
-                        (df_all["Completion"].dt.date >= ngrs_start_date) & 
-                        (df_all["Completion"].dt.date <= ngrs_end_date)
-                    ]
-                    if not df_all_filtered.empty:
-                        if "TransactionType" in df_all_filtered.columns and selected_transaction_types:
-                            df_all_filtered = df_all_filtered[df_all_filtered["TransactionType"].isin(selected_transaction_types)]
-                        if not df_all_filtered.empty:
-                            df_completion = df_all_filtered.groupby(df_all_filtered["Completion"].dt.date).size().reset_index(name="Count").sort_values("Completion")
-                            fig_completion = go.Figure()
-                            fig_completion.add_trace(go.Scatter(
-                                x=df_completion["Completion"], y=df_completion["Count"], mode="lines+markers+text", 
-                                name="Jumlah Data", text=df_completion["Count"], textposition="top center", line=dict(color="#e74c3c")
-                            ))
-                            fig_completion.update_layout(
-                                xaxis_title="Tanggal", yaxis_title="Jumlah Data", template="plotly_white"
-                            )
-                            st.plotly_chart(fig_completion, use_container_width=True)
-                            df_display = df_all_filtered.copy()
-                            if "SpendAmount" in df_display.columns:
-                                df_display["SpendAmount"] = df_display["SpendAmount"].apply(format_rupiah)
-                            st.dataframe(df_display, use_container_width=True)
-                            st.write(f"**Total Data:** {len(df_all_filtered)}", unsafe_allow_html=True)
-                        else:
-                            st.warning("Tidak ada data setelah menerapkan filter TransactionType.")
-                    else:
-                        st.warning("Tidak ada data dalam rentang tanggal yang dipilih untuk ALL.")
-                else:
-                    st.warning("Tidak ada data yang cocok untuk ALL.")
-        else:
-            st.info("Masukkan NoChip atau NoRS untuk melihat data ALL.")
+    # Investigasi massal banyak nomor sekaligus
+    st.markdown("---")
+    render_batch_investigation(default_start, default_end)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+# benchmark_phone_sets.py
+# Benchmark rekonsiliasi nomor: cara pandas lama (Series string + drop_duplicates/isin) dibandingkan
+# himpunan kode uint64 dari phone_codec. Data sintetis 10 juta baris (LinkAja + Alfred + NGRS).
+#
+# Jalankan: python benchmark_phone_sets.py [--rows 10000000]
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from phone_codec import encode_phone_numbers, decode_phone_numbers, unique_codes, union_codes, difference_codes, contains_codes
+
+# Pembagian baris per sumber dan rasio nomor unik terhadap jumlah baris
+SOURCE_SHARES = {"linkaja": 0.3, "alfred": 0.2, "ngrs": 0.5}
+DISTINCT_RATIO = 0.25
+
+
+# Fungsi untuk data sintetis: NoRS sudah berbentuk 62..., NoChip campuran 62.../08.../8...
+def make_frames(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pool = 81200000000 + rng.choice(10 ** 9, size=int(rows * DISTINCT_RATIO), replace=False)
+    frames = {}
+    for source, share in SOURCE_SHARES.items():
+        size = int(rows * share)
+        # Sebagian nomor hanya ada di satu sisi agar selisih himpunan tidak kosong
+        numbers = pool[rng.integers(0, len(pool) * 9 // 10, size)] if source != "ngrs" else pool[rng.integers(len(pool) // 10, len(pool), size)]
+        if source == "ngrs":
+            prefixes = np.array(["62", "0", ""], dtype=object)[rng.integers(0, 3, size)]
+            column = "NoChip"
+        else:
+            prefixes = np.full(size, "62", dtype=object)
+            column = "NoRS"
+        values = prefixes + numbers.astype(str).astype(object)
+        frames[source] = pd.DataFrame({column: values, "Amount": rng.integers(1, 10 ** 6, size)})
+    return frames
+
+
+# Cara lama (linkajaall sebelum phone_codec): NoChip dinormalisasi per nilai lalu isin antar Series string
+def pandas_reconciliation(frames):
+    linkaja_df, alfred_df, ngrs_df = frames["linkaja"], frames["alfred"], frames["ngrs"].copy()
+    ngrs_df["NoChip"] = ngrs_df["NoChip"].str.replace(r"^0", "62", regex=True)
+    ngrs_df["NoChip"] = ngrs_df["NoChip"].where(~ngrs_df["NoChip"].str.startswith("8"), "62" + ngrs_df["NoChip"])
+    combined_nors = pd.concat([linkaja_df["NoRS"], alfred_df["NoRS"]]).drop_duplicates().dropna()
+    ngrs_nochip = ngrs_df["NoChip"].drop_duplicates().dropna()
+    missing_in_ngrs = combined_nors[~combined_nors.isin(ngrs_nochip)]
+    missing_in_linkaja = ngrs_nochip[~ngrs_nochip.isin(combined_nors)]
+    combined_df = pd.concat([linkaja_df, alfred_df])
+    full_missing_in_ngrs = combined_df[combined_df["NoRS"].isin(missing_in_ngrs)]
+    full_missing_in_linkaja = ngrs_df[ngrs_df["NoChip"].isin(missing_in_linkaja)]
+    return set(missing_in_ngrs), set(missing_in_linkaja), len(full_missing_in_ngrs), len(full_missing_in_linkaja)
+
+
+# Cara baru: enkode sekali per sumber, selisih dan keanggotaan di array uint64 terurut
+def codec_reconciliation(frames):
+    linkaja_codes = encode_phone_numbers(frames["linkaja"]["NoRS"])
+    alfred_codes = encode_phone_numbers(frames["alfred"]["NoRS"])
+    ngrs_codes = encode_phone_numbers(frames["ngrs"]["NoChip"])
+    return codes_reconciliation(linkaja_codes, alfred_codes, ngrs_codes)
+
+
+# Bagian set operasi saja (kode sudah tersedia, mis. disimpan di ekstrak)
+def codes_reconciliation(linkaja_codes, alfred_codes, ngrs_codes):
+    rs_codes = union_codes(unique_codes(linkaja_codes), unique_codes(alfred_codes))
+    chip_codes = unique_codes(ngrs_codes)
+    missing_in_ngrs = difference_codes(rs_codes, chip_codes)
+    missing_in_linkaja = difference_codes(chip_codes, rs_codes)
+    full_missing_in_ngrs = int(contains_codes(missing_in_ngrs, linkaja_codes).sum() + contains_codes(missing_in_ngrs, alfred_codes).sum())
+    full_missing_in_linkaja = int(contains_codes(missing_in_linkaja, ngrs_codes).sum())
+    return set(decode_phone_numbers(missing_in_ngrs)), set(decode_phone_numbers(missing_in_linkaja)), full_missing_in_ngrs, full_missing_in_linkaja
+
+
+# Fungsi untuk mengukur waktu (tanpa tracemalloc) lalu memori puncak (run terpisah)
+def measure(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    frames = make_frames(args.rows)
+    codes = [encode_phone_numbers(frames[source].iloc[:, 0]) for source in ("linkaja", "alfred", "ngrs")]
+    string_bytes = sum(frame.iloc[:, 0].memory_usage(deep=True) for frame in frames.values())
+    code_bytes = sum(code.nbytes for code in codes)
+    print(f"{args.rows:,} baris, kolom nomor: string {string_bytes / 2 ** 20:,.0f} MB vs uint64 {code_bytes / 2 ** 20:,.0f} MB")
+
+    expected, pandas_seconds, pandas_peak = measure(pandas_reconciliation, frames)
+    for label, fn, fn_args in (
+        ("pandas (string + isin)", None, None),
+        ("phone_codec (enkode + set)", codec_reconciliation, (frames,)),
+        ("phone_codec (set saja)", codes_reconciliation, codes),
+    ):
+        if fn is None:
+            seconds, peak = pandas_seconds, pandas_peak
+        else:
+            result, seconds, peak = measure(fn, *fn_args)
+            assert result == expected, f"Hasil {label} berbeda dengan pandas"
+        print(f"{label:<28} {seconds:7.2f} s   puncak {peak / 2 ** 20:8,.0f} MB")
+    print(f"hilang di NGRS: {len(expected[0]):,} nomor / {expected[2]:,} baris, hilang di LinkAja: {len(expected[1]):,} nomor / {expected[3]:,} baris")
@@ -0,0 +1,116 @@
+# bq_client.py
+# Pengelola koneksi BigQuery bersama untuk semua halaman dan worker background:
+# satu objek credentials, satu client, satu pool koneksi HTTP per proses.
+import streamlit as st
+from google.cloud import bigquery
+from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+import json
+import threading
+import time
+from singleflight import SingleFlight
+
+BIGQUERY_SCOPES = [
+    "https://www.googleapis.com/auth/bigquery",
+    "https://www.googleapis.com/auth/cloud-platform",
+]
+
+# Ukuran pool HTTP: cukup untuk semua sesi + thread query paralel tanpa membuka koneksi baru
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 32
+HTTP_MAX_RETRIES = 3
+
+HEALTH_CHECK_TIMEOUT = 10
+
+# Satu registry in-flight per proses: query identik dari banyak sesi berbagi satu job BigQuery
+QUERY_FLIGHTS = SingleFlight()
+
+# Pesan kegagalan fetch per thread (lihat collect_fetch_errors): st.error di thread tanpa
+# ScriptRunContext (warm-up, job background) tidak tampil di mana pun
+FETCH_ERRORS = threading.local()
+
+
+# Fungsi untuk memuat credentials service account dari secrets (sekali per proses)
+@st.cache_resource
+def get_credentials():
+    credentials_json = st.secrets["bigquery"]["credentials"]
+    return service_account.Credentials.from_service_account_info(json.loads(credentials_json), scopes=BIGQUERY_SCOPES)
+
+
+# Fungsi untuk membuat sesi HTTP ber-keep-alive dengan pool koneksi yang disetel.
+# Pool urllib3 di dalam HTTPAdapter aman dipakai bersama oleh banyak thread.
+def build_http_session(credentials):
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=HTTP_MAX_RETRIES,
+    )
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+# Fungsi untuk menginisialisasi BigQuery client bersama dari secrets
+@st.cache_resource
+def get_bigquery_client():
+    try:
+        credentials = get_credentials()
+        client = bigquery.Client(
+            credentials=credentials,
+            project=credentials.project_id,
+            _http=build_http_session(credentials),
+        )
+        return client
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat menginisialisasi BigQuery Client: {e}")
+        return None
+
+
+# Fungsi untuk health check koneksi BigQuery (SELECT 1), hasil di-cache sebentar
+@st.cache_data(ttl=60, show_spinner=False)
+def check_bigquery_health():
+    client = get_bigquery_client()
+    if client is None:
+        return {"ok": False, "latency_ms": None, "error": "Client tidak tersedia"}
+    started = time.perf_counter()
+    try:
+        client.query("SELECT 1").result(timeout=HEALTH_CHECK_TIMEOUT)
+        return {"ok": True, "latency_ms": (time.perf_counter() - started) * 1000, "error": None}
+    except Exception as e:
+        return {"ok": False, "latency_ms": None, "error": str(e)}
+
+
+# Fungsi untuk menampilkan kegagalan fetch di halaman dan mencatatnya bagi pengumpul di thread ini.
+# Fungsi ber-cache melempar exception (kegagalan tidak ikut di-cache); pembungkusnya memanggil ini.
+def report_fetch_error(message):
+    st.error(message)
+    messages = getattr(FETCH_ERRORS, "messages", None)
+    if messages is not None:
+        messages.append(message)
+
+
+# Fungsi untuk menjalankan fn sambil mengumpulkan kegagalan fetch di thread ini: (hasil, daftar pesan)
+def collect_fetch_errors(fn):
+    previous = getattr(FETCH_ERRORS, "messages", None)
+    FETCH_ERRORS.messages = []
+    try:
+        return fn(), FETCH_ERRORS.messages
+    finally:
+        FETCH_ERRORS.messages = previous
+
+
+# Fungsi untuk membuat kunci query: teks SQL + parameter/konfigurasi job
+def query_flight_key(query, job_config=None):
+    config = json.dumps(job_config.to_api_repr(), sort_keys=True, default=str) if job_config is not None else ""
+    return (query, config)
+
+
+# Fungsi untuk menjalankan query ke DataFrame; query identik yang sedang berjalan di
+# sesi/thread lain tidak dikirim ulang, melainkan menunggu job yang sama selesai
+def run_query(client, query, job_config=None):
+    return QUERY_FLIGHTS.do(
+        query_flight_key(query, job_config),
+        lambda: client.query(query, job_config=job_config).to_dataframe(),
+    )
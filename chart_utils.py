@@ -0,0 +1,67 @@
+# chart_utils.py
+# Lapisan penyiapan grafik timeseries: granularitas harian/mingguan/bulanan dipilih dari rentang
+# tanggal dan label teks hanya dipasang di titik minimum/maksimum. Dengan batas granularitas di bawah,
+# satu deret paling banyak ~120 titik harian atau ~105 titik mingguan berapa pun panjang rentangnya,
+# sehingga tidak perlu downsampling atau WebGL.
+import pandas as pd
+import plotly.graph_objects as go
+
+# Rentang (hari) maksimum untuk tiap granularitas; di atasnya dipakai bulanan
+DAILY_MAX_DAYS = 120
+WEEKLY_MAX_DAYS = 730
+
+GRANULARITY_LABELS = {"D": "harian", "W": "mingguan", "M": "bulanan"}
+
+
+# Fungsi untuk memilih granularitas dari rentang tanggal data
+def choose_granularity(dates):
+    dates = pd.to_datetime(pd.Series(dates))
+    if dates.empty:
+        return "D"
+    span_days = (dates.max() - dates.min()).days + 1
+    if span_days <= DAILY_MAX_DAYS:
+        return "D"
+    if span_days <= WEEKLY_MAX_DAYS:
+        return "W"
+    return "M"
+
+
+# Fungsi untuk menjumlahkan deret harian ke granularitas tertentu; tanggal menjadi awal periode
+# (minggu Senin-Minggu, bulan kalender). Kolom yang dijumlahkan harus aditif (jumlah/nilai).
+def resample_timeseries(df, date_column, value_columns, granularity=None):
+    dates = pd.to_datetime(df[date_column])
+    granularity = granularity or choose_granularity(dates)
+    if granularity == "D":
+        periods = dates.dt.normalize()
+    else:
+        periods = dates.dt.to_period(granularity).dt.start_time
+    resampled = df[value_columns].groupby(periods.rename(date_column)).sum().reset_index()
+    return resampled.sort_values(date_column).reset_index(drop=True), granularity
+
+
+# Fungsi untuk judul sumbu x sesuai granularitas
+def time_axis_title(granularity):
+    if granularity == "D":
+        return "Tanggal"
+    return f"Tanggal (awal periode {GRANULARITY_LABELS[granularity]})"
+
+
+# Fungsi untuk teks label hanya di titik minimum dan maksimum (titik lain kosong)
+def extrema_text(values, formatter=None):
+    values = pd.Series(values).reset_index(drop=True)
+    text = [""] * len(values)
+    if values.notna().any():
+        for position in {int(values.idxmin()), int(values.idxmax())}:
+            text[position] = formatter(values[position]) if formatter else f"{values[position]:,}"
+    return text
+
+
+# Fungsi untuk trace garis timeseries (deret hasil resample_timeseries), label hanya di titik ekstrem
+def timeseries_trace(x, y, name, color, formatter=None, label_extrema=True, **kwargs):
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    options = dict(x=x, y=y, name=name, line=dict(color=color), mode="lines+markers")
+    if label_extrema:
+        options.update(mode="lines+markers+text", text=extrema_text(y, formatter), textposition="top center")
+    options.update(kwargs)
+    return go.Scatter(**options)
@@ -0,0 +1,152 @@
+# chunked_extract.py
+# Ekstraksi data besar per potongan tanggal (harian/mingguan): diambil paralel dengan batas
+# jumlah worker dan retry, lalu tiap potongan langsung ditulis ke disk. Potongan yang sudah
+# selesai dipakai ulang, sehingga ekstraksi yang terputus cukup dilanjutkan, bukan diulang.
+# Pembagian rentang diputuskan oleh query_guard (hanya jika dry run menunjukkan tabel terpangkas
+# per tanggal); di sini tiap rentang yang diterima dijalankan sebagai satu job.
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+import pandas as pd
+from bq_client import get_bigquery_client, run_query
+
+EXTRACT_DIR = os.path.join(os.environ.get("MMPP_CACHE_DIR", ".cache"), "extracts")
+
+EXTRACT_MAX_WORKERS = 4
+EXTRACT_MAX_RETRIES = 3
+EXTRACT_RETRY_BACKOFF = 2.0
+
+# Rentang sampai 2 minggu dipotong harian, lebih panjang dipotong per minggu (Senin-Minggu)
+DAILY_CHUNK_MAX_DAYS = 14
+
+# Potongan yang mencakup hari ini masih bisa bertambah datanya, jadi cepat kedaluwarsa;
+# potongan historis disimpan sampai masa retensi
+LIVE_CHUNK_TTL = timedelta(minutes=30)
+EXTRACT_RETENTION = timedelta(days=7)
+
+
+# Fungsi untuk membagi rentang tanggal (YYYY-MM-DD) menjadi potongan harian/mingguan.
+# Batas minggu mengikuti kalender agar rentang yang tumpang tindih berbagi potongan yang sama.
+def plan_date_chunks(start_date, end_date):
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    weekly = (end - start).days + 1 > DAILY_CHUNK_MAX_DAYS
+    chunks = []
+    chunk_start = start
+    while chunk_start <= end:
+        if weekly:
+            chunk_end = min(chunk_start + timedelta(days=6 - chunk_start.weekday()), end)
+        else:
+            chunk_end = chunk_start
+        chunks.append((chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+# Fungsi untuk lokasi file potongan: nama ekstrak + hash SQL (filter dan tanggal ikut menentukan)
+def chunk_path(name, query):
+    digest = hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()
+    return os.path.join(EXTRACT_DIR, name, f"{digest}.pkl")
+
+
+# Fungsi untuk mengecek apakah file potongan masih boleh dipakai ulang
+def is_chunk_fresh(path, chunk_end):
+    if not os.path.exists(path):
+        return False
+    age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(path))
+    is_live = chunk_end >= datetime.now().strftime('%Y-%m-%d')
+    return age <= (LIVE_CHUNK_TTL if is_live else EXTRACT_RETENTION)
+
+
+# Fungsi untuk menghapus file potongan yang melewati masa retensi
+def purge_expired_chunks(name):
+    directory = os.path.join(EXTRACT_DIR, name)
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - EXTRACT_RETENTION.total_seconds()
+    for file_name in os.listdir(directory):
+        path = os.path.join(directory, file_name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# Fungsi untuk mengambil satu potongan dengan retry (backoff eksponensial) lalu menulisnya atomik
+def fetch_chunk(client, query, path):
+    for attempt in range(EXTRACT_MAX_RETRIES):
+        try:
+            df = run_query(client, query)
+            break
+        except Exception:
+            if attempt == EXTRACT_MAX_RETRIES - 1:
+                raise
+            time.sleep(EXTRACT_RETRY_BACKOFF * 2 ** attempt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # File sementara unik per penulis: thread dalam satu proses berbagi pid
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+# Fungsi untuk mengekstrak daftar rentang tanggal ke disk, satu job dan satu file per rentang
+# (rentang tidak dipotong lagi agar jumlah job sama dengan yang disetujui di gerbang biaya).
+# build_query(start_date, end_date) menyusun SQL per rentang; progress(selesai, total) dipanggil
+# di thread pemanggil. Mengembalikan daftar file potongan sesuai urutan date_ranges.
+def extract_to_disk(name, build_query, date_ranges, progress=None, max_workers=EXTRACT_MAX_WORKERS):
+    chunks = list(date_ranges)
+    queries = [build_query(chunk_start, chunk_end) for chunk_start, chunk_end in chunks]
+    paths = [chunk_path(name, query) for query in queries]
+    pending = [i for i, (chunk, path) in enumerate(zip(chunks, paths)) if not is_chunk_fresh(path, chunk[1])]
+
+    done = len(chunks) - len(pending)
+    if progress is not None:
+        progress(done, len(chunks))
+    if pending:
+        purge_expired_chunks(name)
+        client = get_bigquery_client()
+        if client is None:
+            raise RuntimeError("BigQuery client tidak tersedia")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch_chunk, client, queries[i], paths[i]) for i in pending]
+            for future in as_completed(futures):
+                future.result()
+                done += 1
+                if progress is not None:
+                    progress(done, len(chunks))
+    return paths
+
+
+# Fungsi generator untuk membaca potongan satu per satu (memori sebesar satu potongan)
+def iter_extract(paths, postprocess=None):
+    for path in paths:
+        with open(path, "rb") as f:
+            df = pickle.load(f)
+        yield postprocess(df) if postprocess is not None else df
+
+
+# Fungsi untuk membaca seluruh potongan menjadi satu DataFrame
+def read_extract(paths, postprocess=None):
+    frames = list(iter_extract(paths, postprocess))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+# Fungsi untuk kunci cache dari daftar file potongan (path + waktu tulis)
+def extract_signature(paths):
+    return tuple((path, os.path.getmtime(path)) for path in paths)
@@ -0,0 +1,172 @@
+# fast_preview.py
+# Mode pratinjau cepat untuk seluruh dashboard. Saat aktif, fetch ringkasan menjalankan versi exact
+# di thread background dan, bila belum selesai dalam PREVIEW_EXACT_WAIT detik, halaman memakai versi
+# perkiraan (TABLESAMPLE SYSTEM, sketch HLL) yang diberi label perkiraan. Begitu versi exact selesai
+# (dan sudah masuk st.cache_data), halaman dijalankan ulang otomatis dan menampilkan nilai exact.
+# Job yang gagal tidak mengisi cache; run berikutnya mengambil versi exact langsung di halaman
+# (pesan error tampil di sana) dan kegagalan job dilaporkan di status pratinjau.
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import threading
+import time
+from perf import record_timing
+
+PREVIEW_STATE_KEY = "fast_preview"
+PENDING_STATE_KEY = "fast_preview_pending"
+FAILED_STATE_KEY = "fast_preview_failed"
+
+# Persentase blok tabel yang dibaca saat pratinjau; ukuran dikalikan 100 / persen
+PREVIEW_SAMPLE_PERCENT = 10
+
+# Versi exact yang selesai dalam waktu ini (mis. cache hit) langsung dipakai tanpa pratinjau
+PREVIEW_EXACT_WAIT = 1.0
+
+REFINE_MAX_WORKERS = 2
+REFINE_POLL_SECONDS = 2
+
+# Job exact yang sedang berjalan per proses: {kunci: Future}. Job yang selesai dihapus sendiri
+# (hasilnya sudah ada di st.cache_data), sehingga dict ini tidak tumbuh terus.
+REFINE_JOBS = {}
+REFINE_LOCK = threading.Lock()
+
+
+# Fungsi untuk klausa TABLESAMPLE (kosong jika tanpa sampel)
+def table_sample(sample_percent):
+    return f"TABLESAMPLE SYSTEM ({sample_percent} PERCENT)" if sample_percent else ""
+
+
+# Fungsi untuk menskalakan ukuran hasil sampel ke perkiraan populasi (jumlah dibulatkan)
+def scale_sampled(df, columns, sample_percent):
+    if not sample_percent or df.empty:
+        return df
+    # Di-import di sini: mainAppdash meng-import modul ini saat start, sebelum halaman mana pun
+    import pandas as pd
+    factor = 100 / sample_percent
+    for column in columns:
+        scaled = df[column] * factor
+        df[column] = scaled.round().astype(df[column].dtype) if pd.api.types.is_integer_dtype(df[column]) else scaled
+    return df
+
+
+# Fungsi untuk toggle pratinjau cepat di sidebar (satu nilai untuk semua halaman dalam sesi)
+def render_preview_toggle():
+    st.sidebar.toggle(
+        "Pratinjau cepat (perkiraan)", key=PREVIEW_STATE_KEY,
+        help=f"Ringkasan dihitung dari sampel ~{PREVIEW_SAMPLE_PERCENT}% data lalu diperbarui ke nilai exact di background."
+    )
+
+
+def preview_enabled():
+    return bool(st.session_state.get(PREVIEW_STATE_KEY, False))
+
+
+# Fungsi untuk executor job exact bersama (dibuat sekali per proses saat pertama dibutuhkan)
+@st.cache_resource(show_spinner=False)
+def get_refine_executor():
+    return ThreadPoolExecutor(max_workers=REFINE_MAX_WORKERS, thread_name_prefix="refine")
+
+
+# Fungsi untuk menghapus job yang sudah selesai dari REFINE_JOBS (jika belum diganti job baru)
+def forget_job(key, future):
+    with REFINE_LOCK:
+        if REFINE_JOBS.get(key) is future:
+            del REFINE_JOBS[key]
+
+
+# Fungsi job exact di background. Thread ini tanpa ScriptRunContext, jadi st.error dari fetcher tidak
+# tampil; kegagalan fetch dikumpulkan dan dilempar agar Future ditandai gagal.
+def run_refine_job(exact_fn):
+    # Di-import di sini agar aplikasi tidak memuat google.cloud.bigquery saat start
+    from bq_client import collect_fetch_errors
+    _, errors = collect_fetch_errors(exact_fn)
+    if errors:
+        raise RuntimeError("; ".join(errors))
+
+
+# Fungsi untuk memulai job exact di background (sekali per kunci selama masih berjalan; job yang
+# selesai atau gagal dihapus, jadi pemanggilan berikutnya mendapat cache hit atau mencoba ulang).
+# Hasilnya tidak disimpan di Future: job hanya mengisi st.cache_data yang dipakai exact_fn.
+def refine_in_background(key, exact_fn):
+    with REFINE_LOCK:
+        future = REFINE_JOBS.get(key)
+        submitted = future is None
+        if submitted:
+            future = get_refine_executor().submit(run_refine_job, exact_fn)
+            REFINE_JOBS[key] = future
+    if submitted:
+        # Di luar lock: callback langsung dijalankan di thread ini bila job sudah selesai
+        future.add_done_callback(lambda done: forget_job(key, done))
+    return future
+
+
+# Fungsi untuk hasil exact bila mode pratinjau mati, job exact sudah selesai, atau job exact untuk
+# kunci ini baru saja gagal (diambil langsung agar error tampil di halaman); selain itu hasil
+# perkiraan, dan job-nya dicatat sebagai menunggu agar halaman diberi label dan di-refresh nanti
+def preview_or_exact(key, exact_fn, preview_fn):
+    if not preview_enabled() or key in st.session_state.get(FAILED_STATE_KEY, {}):
+        return exact_fn()
+
+    future = refine_in_background(key, exact_fn)
+    try:
+        future.result(timeout=PREVIEW_EXACT_WAIT)
+        return exact_fn()
+    except TimeoutError:
+        pass
+    except Exception:
+        return exact_fn()
+
+    started = time.perf_counter()
+    result = preview_fn()
+    record_timing(f"Pratinjau {key[0]}", time.perf_counter() - started)
+    st.session_state.setdefault(PENDING_STATE_KEY, {})[key] = future
+    return result
+
+
+# Fungsi untuk mengecek apakah hasil perkiraan ditampilkan pada run ini: untuk kunci tertentu
+# (bagian halaman yang memakai hasil itu) atau, tanpa keys, untuk kunci mana pun di halaman
+def preview_active(keys=None):
+    pending = st.session_state.get(PENDING_STATE_KEY) or {}
+    if keys is None:
+        return bool(pending)
+    return any(key in pending for key in keys)
+
+
+# Fungsi untuk label metrik saat hasil dari kunci-kunci tersebut masih perkiraan
+def approximate_label(text, keys=None):
+    return f"≈ {text}" if preview_active(keys) else text
+
+
+# Fungsi untuk keterangan di atas scorecard/grafik saat hasil dari kunci-kunci tersebut masih perkiraan
+def render_approximate_notice(keys=None):
+    if preview_active(keys):
+        st.info(f"≈ Pratinjau cepat: nilai di bawah ini perkiraan dari sampel ~{PREVIEW_SAMPLE_PERCENT}% data "
+                "dan akan diperbarui otomatis ke nilai exact.")
+
+
+# Fungsi untuk mengosongkan daftar hasil perkiraan sebelum halaman dijalankan
+def reset_preview_state():
+    st.session_state[PENDING_STATE_KEY] = {}
+
+
+# Fragment yang memantau job exact ({kunci: Future}); setelah semuanya selesai job yang gagal
+# dicatat (run berikutnya mengambil versi exact langsung) dan halaman dijalankan ulang
+@st.fragment(run_every=REFINE_POLL_SECONDS)
+def refine_watcher(jobs):
+    if all(job.done() for job in jobs.values()):
+        failed = {key: str(job.exception()) for key, job in jobs.items() if job.exception() is not None}
+        if failed:
+            st.session_state.setdefault(FAILED_STATE_KEY, {}).update(failed)
+        st.rerun()
+    st.caption("⏳ Menampilkan nilai perkiraan; nilai exact sedang dihitung di background...")
+
+
+# Fungsi untuk status pratinjau di akhir halaman: kegagalan job exact dilaporkan sekali, lalu
+# pemantau untuk job yang masih menunggu
+def render_preview_status():
+    failed = st.session_state.pop(FAILED_STATE_KEY, None)
+    if failed:
+        st.warning("Nilai exact gagal dihitung di background dan diambil ulang langsung: "
+                   + "; ".join(f"{key[0]}: {message}" for key, message in failed.items()))
+    pending = st.session_state.get(PENDING_STATE_KEY)
+    if pending:
+        refine_watcher(dict(sorted(pending.items(), key=lambda item: repr(item[0]))))
@@ -1,177 +1,429 @@
 import streamlit as st
 from google.cloud import bigquery
-from google.oauth2 import service_account
 import pandas as pd
 from datetime import datetime, date
-import json
 import plotly.express as px
 import plotly.graph_objects as go
 from io import BytesIO
+from bq_client import get_bigquery_client, run_query, report_fetch_error
+from query_guard import cost_gate, unattended_date_ranges, POLICY_DOWNGRADE
+from chunked_extract import extract_to_disk, read_extract, iter_extract, extract_signature
+from metrics_cube import filter_clusters
+from perf import timed
+from chart_utils import resample_timeseries, timeseries_trace, time_axis_title
+from fast_preview import preview_or_exact, table_sample, scale_sampled, render_approximate_notice, PREVIEW_SAMPLE_PERCENT
+
+DEFAULT_START = date(2025, 1, 1)
+# Daftar dimensi (ClusterID) jarang berubah, cukup diperbarui tiap jam
+DIMENSION_TTL = 3600
+
+INFILTRASI_SCENARIO = "Digipos B2B Transfer"
+FLOW_COLUMNS = ["total_out_cluster", "value_out_cluster", "total_in_cluster", "value_in_cluster"]
+
+# Grafik CounterParty: N teratas per level + satu kotak "Lainnya"; N dibatasi agar payload figure kecil
+COUNTERPARTY_TOP_N = 30
+COUNTERPARTY_MAX_POINTS = 200
+OTHERS_LABEL = "Lainnya"
 
-# Fungsi untuk menginisialisasi BigQuery client dari secrets
-@st.cache_resource
-def get_bigquery_client():
-    try:
-        credentials_json = st.secrets["bigquery"]["credentials"]
-        credentials = service_account.Credentials.from_service_account_info(json.loads(credentials_json))
-        client = bigquery.Client(credentials=credentials, project=credentials.project_id)
-        return client
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat menginisialisasi BigQuery Client: {e}")
-        return None
+# Fungsi untuk format Rupiah
+def format_rupiah(value):
+    return f"{value:,.0f}".replace(",", ".")
 
-# Fungsi untuk mengambil data agregat dari BigQuery (untuk scorecard dan tabel)
+# Fungsi mesin ringkasan infiltrasi: satu kali scan alfred_linkaja untuk semua cluster menghasilkan
+# jumlah/nilai keluar (Credit) dan masuk (Debit) per (tanggal, ClusterID). Scorecard, tabel per cluster,
+# dan timeseries diturunkan lokal dari hasil ini; grafik CounterParty diambil per level (lihat di bawah).
+# sample_percent: perkiraan dari sampel blok tabel (mode pratinjau), ukuran diskalakan ke populasi.
+# Kegagalan dilempar (tidak ikut di-cache); halaman memakai fetch_infiltrasi_summary.
 @st.cache_data
-def fetch_aggregate_data(table_name, count_column, sum_column, date_column, start_date, end_date, 
-                        cluster_column, selected_clusters, transaction_scenario, filter_column, filter_not_zero):
+def fetch_infiltrasi_summary_cached(start_date, end_date, sample_percent=None):
     client = get_bigquery_client()
     if client is None:
         return pd.DataFrame()
 
+    query = f"""
+    SELECT 
+        DATE(InitiateDate) AS date,
+        ClusterID,
+        COUNTIF(CAST(Credit AS FLOAT64) != 0) AS total_out_cluster,
+        COALESCE(SUM(CAST(Credit AS FLOAT64)), 0) AS value_out_cluster,
+        COUNTIF(CAST(Debit AS FLOAT64) != 0) AS total_in_cluster,
+        COALESCE(SUM(CAST(Debit AS FLOAT64)), 0) AS value_in_cluster
+    FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja` {table_sample(sample_percent)}
+    WHERE TransactionScenario = '{INFILTRASI_SCENARIO}'
+    AND DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    AND (CAST(Credit AS FLOAT64) != 0 OR CAST(Debit AS FLOAT64) != 0)
+    GROUP BY date, ClusterID
+    """
+
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+    df = run_query(client, query, job_config=job_config)
+    df["date"] = pd.to_datetime(df["date"])
+    return scale_sampled(df, FLOW_COLUMNS, sample_percent)
+
+# Fungsi untuk ringkasan infiltrasi bagi halaman: kegagalan ditampilkan dan diganti frame kosong
+# tanpa di-cache, jadi run berikutnya mencoba ulang
+def fetch_infiltrasi_summary(start_date, end_date, sample_percent=None):
     try:
-        query = f"""
-        SELECT 
-            {cluster_column},
-            COUNT({count_column}) AS row_count,
-            COALESCE(SUM(CAST({sum_column} AS FLOAT64)), 0) AS total_sum
-        FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
-        WHERE TransactionScenario = '{transaction_scenario}'
-        AND DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
-        AND CAST({filter_column} AS FLOAT64) != 0
-        GROUP BY {cluster_column}
-        """
-        
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        return df
+        return fetch_infiltrasi_summary_cached(start_date, end_date, sample_percent)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data: {e}")
+        report_fetch_error(f"Terjadi kesalahan saat mengambil ringkasan infiltrasi: {e}")
         return pd.DataFrame()
 
-# Fungsi untuk format Rupiah
-def format_rupiah(value):
-    return f"{value:,.0f}".replace(",", ".")
-
-# Fungsi untuk mengambil data CounterParty (untuk grafik treemap/bubble)
-@st.cache_data
-def fetch_counterparty_data(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, transaction_scenario):
+# Fungsi untuk tabel per cluster (keluar/masuk) dari ringkasan
+def cluster_flows(summary, selected_clusters):
+    rows = filter_clusters(summary, selected_clusters)
+    if rows.empty:
+        return pd.DataFrame(columns=["ClusterID"] + FLOW_COLUMNS)
+    return rows.groupby("ClusterID", as_index=False)[FLOW_COLUMNS].sum()
+
+# Fungsi untuk data harian keluar/masuk cluster (jumlah dan nilai) dari ringkasan
+def daily_flows(summary, selected_clusters):
+    rows = filter_clusters(summary, selected_clusters)
+    if rows.empty:
+        return pd.DataFrame()
+    return rows.groupby("date", as_index=False)[FLOW_COLUMNS].sum().sort_values("date")
+
+# Fungsi untuk satu level drill-down CounterParty (grafik treemap/bubble): transaksi masuk (Debit) per
+# CounterParty untuk cluster terpilih, diperingkat di BigQuery. Hanya peringkat offset+1..offset+N yang
+# dikirim, ditambah satu baris sisa (CounterParty NULL) berisi total dan jumlah CounterParty setelahnya,
+# sehingga hasil query tetap kecil berapa pun jumlah CounterParty.
+# Kegagalan dilempar (tidak ikut di-cache); halaman memakai fetch_counterparty_level.
+@st.cache_data(show_spinner=False)
+def fetch_counterparty_level_cached(start_date, end_date, selected_clusters, top_n, offset):
     client = get_bigquery_client()
     if client is None:
         return pd.DataFrame()
 
-    try:
-        query = f"""
-        SELECT 
+    query = f"""
+    WITH per_counterparty AS (
+        SELECT
             CounterParty,
             COUNT(*) AS transaction_count,
-            COALESCE(SUM(CAST(Debit AS FLOAT64)), 0) AS total_debit
-        FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
-        WHERE TransactionScenario = '{transaction_scenario}'
-        AND DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
+            SUM(CAST(Debit AS FLOAT64)) AS total_debit
+        FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja`
+        WHERE TransactionScenario = '{INFILTRASI_SCENARIO}'
+        AND DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
         AND CAST(Debit AS FLOAT64) != 0
+        AND ClusterID IN ({', '.join([str(cluster) for cluster in selected_clusters])})
         GROUP BY CounterParty
         HAVING total_debit > 0
-        """
-        
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        return df
+    ),
+    ranked AS (
+        SELECT *, ROW_NUMBER() OVER (ORDER BY total_debit DESC, CounterParty) AS rn
+        FROM per_counterparty
+    )
+    SELECT CounterParty, rn, transaction_count, total_debit, 1 AS counterparty_count
+    FROM ranked
+    WHERE rn BETWEEN {offset + 1} AND {offset + top_n}
+    UNION ALL
+    SELECT NULL, NULL, SUM(transaction_count), SUM(total_debit), COUNT(*)
+    FROM ranked
+    WHERE rn > {offset + top_n}
+    HAVING COUNT(*) > 0
+    """
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+    return run_query(client, query, job_config=job_config)
+
+# Fungsi untuk satu level drill-down bagi grafik: baris sisa diberi label "Lainnya".
+# Mengembalikan (DataFrame grafik, jumlah CounterParty di Lainnya); kegagalan ditampilkan tanpa di-cache.
+def fetch_counterparty_level(start_date, end_date, selected_clusters, top_n, offset=0):
+    if not selected_clusters:
+        return pd.DataFrame(), 0
+    try:
+        df = fetch_counterparty_level_cached(start_date, end_date, tuple(selected_clusters), top_n, offset)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data CounterParty: {e}")
-        return pd.DataFrame()
+        report_fetch_error(f"Terjadi kesalahan saat mengambil data CounterParty: {e}")
+        return pd.DataFrame(), 0
+    if df.empty:
+        return df, 0
+    df = df.sort_values("rn", na_position="last")
+    others = df["rn"].isna()
+    others_count = int(df.loc[others, "counterparty_count"].sum())
+    df = df.astype({"transaction_count": "int64", "total_debit": "float64"})
+    df.loc[others, "CounterParty"] = f"{OTHERS_LABEL} ({others_count:,} CounterParty)"
+    return df[["CounterParty", "transaction_count", "total_debit"]].reset_index(drop=True), others_count
 
 # Fungsi untuk mengambil data mentah dari tabel BigQuery (untuk download)
-@st.cache_data
-def fetch_raw_data(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, transaction_scenario):
-    client = get_bigquery_client()
-    if client is None:
-        return pd.DataFrame()
-
-    try:
-        query = f"""
+def build_raw_data_query(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, transaction_scenario):
+    return f"""
         SELECT *
         FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
         WHERE TransactionScenario = '{transaction_scenario}'
         AND DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
         AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
         """
-        
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        return df
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data mentah: {e}")
-        return pd.DataFrame()
 
-# Fungsi untuk mengambil data timeseries (jumlah transaksi)
-@st.cache_data
-def fetch_timeseries_data(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, transaction_scenario):
-    client = get_bigquery_client()
-    if client is None:
-        return pd.DataFrame()
-
-    try:
-        query = f"""
-        SELECT 
-            DATE({date_column}) AS date,
-            COUNT(CASE WHEN CAST(Credit AS FLOAT64) != 0 THEN 1 END) AS total_out_cluster,
-            COUNT(CASE WHEN CAST(Debit AS FLOAT64) != 0 THEN 1 END) AS total_in_cluster
-        FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
-        WHERE TransactionScenario = '{transaction_scenario}'
-        AND DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
-        GROUP BY DATE({date_column})
-        ORDER BY DATE({date_column})
-        """
-        
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        return df
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data timeseries: {e}")
-        return pd.DataFrame()
-
-# Fungsi baru untuk mengambil data timeseries (nilai transaksi)
-@st.cache_data
-def fetch_timeseries_value_data(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, transaction_scenario):
-    client = get_bigquery_client()
-    if client is None:
-        return pd.DataFrame()
+# Fungsi untuk mengekstrak data mentah per potongan tanggal ke disk (dilanjutkan jika terputus)
+def extract_raw_data(table_name, date_column, date_ranges, cluster_column, selected_clusters, transaction_scenario, progress=None):
+    return extract_to_disk(
+        f"raw_{table_name}",
+        lambda chunk_start, chunk_end: build_raw_data_query(
+            table_name, date_column, chunk_start, chunk_end, cluster_column, selected_clusters, transaction_scenario
+        ),
+        date_ranges,
+        progress=progress
+    )
 
+def fetch_raw_data(table_name, date_column, start_date, end_date, cluster_column, selected_clusters, transaction_scenario):
     try:
-        query = f"""
-        SELECT 
-            DATE({date_column}) AS date,
-            COALESCE(SUM(CASE WHEN CAST(Credit AS FLOAT64) != 0 THEN CAST(Credit AS FLOAT64) ELSE 0 END), 0) AS value_out_cluster,
-            COALESCE(SUM(CASE WHEN CAST(Debit AS FLOAT64) != 0 THEN CAST(Debit AS FLOAT64) ELSE 0 END), 0) AS value_in_cluster
-        FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
-        WHERE TransactionScenario = '{transaction_scenario}'
-        AND DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-        AND {cluster_column} IN ({', '.join([str(cluster) for cluster in selected_clusters])})
-        GROUP BY DATE({date_column})
-        ORDER BY DATE({date_column})
-        """
-        
-        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
-        df = client.query(query, job_config=job_config).to_dataframe()
-        return df
+        paths = extract_raw_data(table_name, date_column, ((start_date, end_date),), cluster_column, selected_clusters, transaction_scenario)
+        return read_extract(paths)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data timeseries nilai: {e}")
+        st.error(f"Terjadi kesalahan saat mengambil data mentah: {e}")
         return pd.DataFrame()
 
 # Fungsi untuk mengonversi DataFrame ke Excel dengan penanganan timezone
-def to_excel(df):
+def strip_timezones(df):
     df_copy = df.copy()
     for column in df_copy.columns:
         if pd.api.types.is_datetime64_any_dtype(df_copy[column]):
             df_copy[column] = df_copy[column].dt.tz_localize(None)
+    return df_copy
+
+def to_excel(df):
     output = BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_copy.to_excel(writer, sheet_name='Raw_Data', index=False)
+        strip_timezones(df).to_excel(writer, sheet_name='Raw_Data', index=False)
     return output.getvalue()
 
+# Fungsi untuk menulis potongan ekstrak ke satu sheet Excel satu per satu (tanpa menggabung semua
+# potongan di memori). Mengembalikan (bytes Excel, jumlah baris); di-cache per file potongan.
+@st.cache_data(max_entries=4, show_spinner=False)
+def extract_to_excel(signature):
+    output = BytesIO()
+    total_rows = 0
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for df in iter_extract([path for path, _ in signature], strip_timezones):
+            if df.empty:
+                continue
+            startrow = total_rows + 1 if total_rows else 0
+            df.to_excel(writer, sheet_name='Raw_Data', index=False, header=not total_rows, startrow=startrow)
+            total_rows += len(df)
+    return output.getvalue(), total_rows
+
+# Fungsi untuk mengambil daftar ClusterID untuk filter
+@st.cache_data(ttl=DIMENSION_TTL)
+def fetch_clusters():
+    client = get_bigquery_client()
+    if client is None:
+        return []
+    query = "SELECT DISTINCT ClusterID FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja` WHERE ClusterID IS NOT NULL"
+    df = run_query(client, query)
+    return [int(x) for x in df["ClusterID"].tolist()]
+
+# Fungsi untuk rentang tanggal tampilan default: "Per Hari" (hari ini) dan "Rentang Hari"
+def default_views():
+    today = datetime.now().date()
+    return [(today, today), (DEFAULT_START, today)]
+
+# Fungsi untuk memanaskan cache tampilan default (dipanggil oleh warmup.py).
+# Argumen harus sama persis dengan pemanggilan di main() agar kunci cache cocok. Entri lama tampilan
+# default dibuang dulu (fetcher tanpa TTL), agar tiap jadwal benar-benar memuat data terbaru.
+def warm_cache():
+    cluster_ids = fetch_clusters()
+    for view_start, view_end in default_views():
+        start_date = view_start.strftime('%Y-%m-%d')
+        end_date = view_end.strftime('%Y-%m-%d')
+        fetch_infiltrasi_summary_cached.clear(start_date, end_date, None)
+        fetch_infiltrasi_summary(start_date, end_date)
+        # Level teratas grafik CounterParty untuk pilihan default (semua cluster, N default)
+        fetch_counterparty_level_cached.clear(start_date, end_date, tuple(cluster_ids), COUNTERPARTY_TOP_N, 0)
+        fetch_counterparty_level(start_date, end_date, cluster_ids, COUNTERPARTY_TOP_N)
+        # Data mentah hanya diekstrak ke disk jika masih dalam anggaran biaya halaman, dengan
+        # potongan yang sama seperti gerbang biaya di halaman agar file potongannya dipakai ulang
+        date_ranges = unattended_date_ranges(
+            "infiltrasi",
+            lambda chunk_start, chunk_end: [build_raw_data_query(
+                "alfred_linkaja", "InitiateDate", chunk_start, chunk_end,
+                "ClusterID", cluster_ids, "Digipos B2B Transfer"
+            )],
+            start_date, end_date
+        )
+        if date_ranges is not None:
+            extract_raw_data("alfred_linkaja", "InitiateDate", date_ranges, "ClusterID", cluster_ids, "Digipos B2B Transfer")
+
+# Fungsi untuk pindah level drill-down CounterParty (callback tombol, tanpa rerun tambahan)
+def set_counterparty_level(level):
+    st.session_state["counterparty_level"] = level
+
+# Fragment grafik CounterParty: jenis grafik, N teratas, dan drill-down hanya menjalankan ulang bagian ini;
+# tiap level diambil dari BigQuery saat dibuka (di-cache per filter, N, dan level)
+@st.fragment
+def render_counterparty_section(start_date, end_date, selected_cluster_ids):
+    with timed("Update grafik CounterParty"):
+        st.markdown("---")
+        st.markdown('<div class="title-box">Treemap Plot by CounterParty</div>', unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        col_type, col_top_n = st.columns(2)
+        with col_type:
+            chart_type = st.selectbox("Pilih Jenis Grafik", ["Treemap", "Bubble Chart"], key="chart_type")
+        with col_top_n:
+            counterparty_top_n = st.number_input(
+                "Jumlah CounterParty teratas", min_value=5, max_value=COUNTERPARTY_MAX_POINTS,
+                value=COUNTERPARTY_TOP_N, step=5, key="counterparty_top_n"
+            )
+
+        # Level drill-down kembali ke atas setiap kali filter atau N berubah
+        drill_key = (start_date, end_date, tuple(selected_cluster_ids), counterparty_top_n)
+        if st.session_state.get("counterparty_drill_key") != drill_key:
+            st.session_state["counterparty_drill_key"] = drill_key
+            st.session_state["counterparty_level"] = 0
+        level = st.session_state["counterparty_level"]
+        with st.spinner("Mengambil data CounterParty..."):
+            df_chart, others_count = fetch_counterparty_level(
+                start_date, end_date, selected_cluster_ids, counterparty_top_n, level * counterparty_top_n
+            )
+        if df_chart.empty:
+            st.warning("Tidak ada data CounterParty yang tersedia untuk ditampilkan dalam grafik.")
+            return
+
+        first_rank = level * counterparty_top_n + 1
+        shown = len(df_chart) - (1 if others_count else 0)
+        st.caption(
+            f"Peringkat {first_rank:,}-{first_rank + shown - 1:,} "
+            f"dari {first_rank - 1 + shown + others_count:,} CounterParty"
+            + (f"; {others_count:,} sisanya diringkas sebagai \"{OTHERS_LABEL}\"." if others_count else ".")
+        )
+        col_up, col_down = st.columns(2)
+        with col_up:
+            if level > 0:
+                st.button("⬆ Kembali ke peringkat teratas", key="counterparty_top", on_click=set_counterparty_level, args=(0,))
+        with col_down:
+            if others_count:
+                st.button(f"⬇ Buka {OTHERS_LABEL}", key="counterparty_next", on_click=set_counterparty_level, args=(level + 1,))
+
+        if chart_type == "Bubble Chart":
+            fig = px.scatter(
+                df_chart, x="CounterParty", y="total_debit", size="total_debit",
+                hover_data=["CounterParty", "transaction_count", "total_debit"],
+                labels={"CounterParty": "Counter Party", "total_debit": "Total Debit (Rp)", "transaction_count": "Jumlah Transaksi"},
+                title="Infiltrasi In Cluster", height=600
+            )
+            fig.update_traces(marker=dict(color="blue", opacity=0.8, line=dict(width=2, color="white")))
+            fig.update_layout(yaxis_title="Total Debit (Rp)", xaxis_title="Counter Party", showlegend=False)
+        else:
+            fig = px.treemap(
+                df_chart, path=["CounterParty"], values="total_debit", color="total_debit",
+                hover_data=["CounterParty", "transaction_count", "total_debit"],
+                labels={"CounterParty": "Counter Party", "total_debit": "Total Debit (Rp)", "transaction_count": "Jumlah Transaksi"},
+                height=600
+            )
+        st.plotly_chart(fig, use_container_width=True)
+
+# Fungsi untuk bagian timeseries jumlah dan nilai transaksi infiltrasi (tanpa widget)
+def render_timeseries_section(summary, selected_cluster_ids):
+    with timed("Render timeseries infiltrasi"):
+        # Timeseries Plot untuk Total Transaksi Infiltrasi
+        st.markdown("---")
+        st.markdown('<div class="title-box">Timeseries Plot - Total Transaksi Infiltrasi</div>', unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        with st.spinner("Mengambil data untuk timeseries plot..."):
+            df_timeseries = daily_flows(summary, selected_cluster_ids)
+
+            if not df_timeseries.empty:
+                # Granularitas (harian/mingguan/bulanan) mengikuti rentang tanggal
+                df_timeseries, granularity = resample_timeseries(df_timeseries, "date", FLOW_COLUMNS)
+                fig_timeseries = go.Figure()
+                fig_timeseries.add_trace(timeseries_trace(
+                    df_timeseries["date"], df_timeseries["total_out_cluster"], "Total Transaksi Rech In", "blue",
+                    marker=dict(size=8), textfont=dict(size=10)
+                ))
+                fig_timeseries.add_trace(timeseries_trace(
+                    df_timeseries["date"], df_timeseries["total_in_cluster"], "Total Transaksi Rech Out Cluster", "orange",
+                    marker=dict(size=8), textfont=dict(size=10)
+                ))
+                fig_timeseries.update_layout(
+                    title="Total Transaksi Infiltrasi Out dan In Cluster",
+                    xaxis_title=time_axis_title(granularity),
+                    yaxis_title="Jumlah Transaksi",
+                    height=600,
+                    legend=dict(x=0, y=1.1, orientation="h"),
+                    hovermode="x unified"
+                )
+                st.plotly_chart(fig_timeseries, use_container_width=True)
+            else:
+                st.warning("Tidak ada data timeseries yang tersedia untuk ditampilkan.")
+
+        # Timeseries Plot untuk Nilai Transaksi Infiltrasi
+        st.markdown("---")
+        st.markdown('<div class="title-box">Timeseries Plot - Nilai Transaksi Infiltrasi</div>', unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        with st.spinner("Mengambil data untuk timeseries nilai plot..."):
+            # Jumlah dan nilai berasal dari deret yang sama (sudah di-resample)
+            df_timeseries_value = df_timeseries
+
+            if not df_timeseries_value.empty:
+                fig_timeseries_value = go.Figure()
+                fig_timeseries_value.add_trace(timeseries_trace(
+                    df_timeseries_value["date"], df_timeseries_value["value_out_cluster"], "Nilai Transaksi Rech In", "blue",
+                    formatter=lambda x: f"Rp {format_rupiah(x)}", marker=dict(size=8), textfont=dict(size=10)
+                ))
+                fig_timeseries_value.add_trace(timeseries_trace(
+                    df_timeseries_value["date"], df_timeseries_value["value_in_cluster"], "Nilai Transaksi Rech Out", "orange",
+                    formatter=lambda x: f"Rp {format_rupiah(x)}", marker=dict(size=8), textfont=dict(size=10)
+                ))
+                fig_timeseries_value.update_layout(
+                    title="Nilai Transaksi Infiltrasi Out dan In Cluster",
+                    xaxis_title=time_axis_title(granularity),
+                    yaxis_title="Nilai Transaksi (Rp)",
+                    height=600,
+                    legend=dict(x=0, y=1.1, orientation="h"),
+                    hovermode="x unified"
+                )
+                st.plotly_chart(fig_timeseries_value, use_container_width=True)
+            else:
+                st.warning("Tidak ada data timeseries nilai yang tersedia untuk ditampilkan.")
+
+# Fragment download data mentah: pilihan cost gate dan konfirmasi hanya menjalankan ulang bagian ini
+@st.fragment
+def render_raw_download_section(summary, start_date, end_date, selected_cluster_ids):
+    with timed("Update download data mentah"):
+        # Mengambil data mentah untuk download (dicek dulu terhadap anggaran biaya halaman)
+        policy, date_ranges = cost_gate(
+            "infiltrasi", "raw_data",
+            lambda chunk_start, chunk_end: [build_raw_data_query(
+                "alfred_linkaja", "InitiateDate", chunk_start, chunk_end,
+                "ClusterID", selected_cluster_ids, "Digipos B2B Transfer"
+            )],
+            start_date, end_date, allow_downgrade=True
+        )
+        excel_data, raw_rows = None, 0
+        if policy == POLICY_DOWNGRADE:
+            df_rollup = daily_flows(summary, selected_cluster_ids)
+            if not df_rollup.empty:
+                excel_data, raw_rows = to_excel(df_rollup), len(df_rollup)
+            raw_label, raw_prefix = "Download Ringkasan Harian sebagai Excel", "Rollup_Infiltrasi_Data"
+        elif policy is None:
+            st.info("Data mentah belum diambil. Pilih cara menjalankan dan konfirmasi di atas.")
+        else:
+            # Ekstraksi per potongan tanggal; potongan yang sudah ada di disk dipakai ulang
+            progress_bar = st.progress(0.0, text="Mengambil data mentah untuk download...")
+            try:
+                raw_paths = extract_raw_data(
+                    "alfred_linkaja", "InitiateDate", date_ranges, "ClusterID", selected_cluster_ids, "Digipos B2B Transfer",
+                    progress=lambda done, total: progress_bar.progress(done / total, text=f"Mengambil data mentah: {done}/{total} potongan")
+                )
+                excel_data, raw_rows = extract_to_excel(extract_signature(raw_paths))
+            except Exception as e:
+                st.error(f"Terjadi kesalahan saat mengambil data mentah: {e}")
+            progress_bar.empty()
+            raw_label, raw_prefix = "Download Data Mentah sebagai Excel", "Raw_Infiltrasi_Data"
+
+        if policy is not None:
+            if raw_rows:
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.download_button(
+                    label=raw_label,
+                    data=excel_data,
+                    file_name=f"{raw_prefix}_{start_date}_to_{end_date}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            else:
+                st.warning("Tidak ada data mentah yang tersedia untuk diunduh.")
+
 # Fungsi utama aplikasi
 def main():
     st.markdown("<h1 style='text-align: center;'>Inflitrasi Analysis</h1>", unsafe_allow_html=True)
@@ -209,7 +461,7 @@ def main():
         unsafe_allow_html=True
     )
 
-    default_start = date(2025, 1, 1)
+    default_start = DEFAULT_START
     default_end = datetime.now().date()
     start_date = default_start.strftime('%Y-%m-%d')
     end_date = default_end.strftime('%Y-%m-%d')
@@ -231,61 +483,25 @@ def main():
                 start_date = default_start.strftime('%Y-%m-%d')
                 end_date = default_end.strftime('%Y-%m-%d')
 
-        def fetch_clusters():
-            client = get_bigquery_client()
-            if client is None:
-                return []
-            query = "SELECT DISTINCT ClusterID FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja` WHERE ClusterID IS NOT NULL"
-            df = client.query(query).to_dataframe()
-            return [int(x) for x in df["ClusterID"].tolist()]
-
         cluster_ids = fetch_clusters()
         selected_cluster_ids = st.sidebar.multiselect("Pilih ClusterID", cluster_ids, default=cluster_ids, key="cluster_id_filter")
 
     with st.spinner("Mengambil data..."):
-        df_out = fetch_aggregate_data(
-            table_name="alfred_linkaja", count_column="*", sum_column="Credit", date_column="InitiateDate",
-            start_date=start_date, end_date=end_date, cluster_column="ClusterID", selected_clusters=selected_cluster_ids,
-            transaction_scenario="Digipos B2B Transfer", filter_column="Credit", filter_not_zero=True
-        )
-        if not df_out.empty:
-            df_out.columns = ["ClusterID", "total_out_cluster", "value_out_cluster"]
-
-        df_in = fetch_aggregate_data(
-            table_name="alfred_linkaja", count_column="*", sum_column="Debit", date_column="InitiateDate",
-            start_date=start_date, end_date=end_date, cluster_column="ClusterID", selected_clusters=selected_cluster_ids,
-            transaction_scenario="Digipos B2B Transfer", filter_column="Debit", filter_not_zero=True
+        # Satu scan untuk semua cluster; pilihan cluster diterapkan lokal
+        summary_key = ("infiltrasi_summary", start_date, end_date)
+        summary = preview_or_exact(
+            summary_key,
+            lambda: fetch_infiltrasi_summary(start_date, end_date),
+            lambda: fetch_infiltrasi_summary(start_date, end_date, PREVIEW_SAMPLE_PERCENT),
         )
-        if not df_in.empty:
-            df_in.columns = ["ClusterID", "total_in_cluster", "value_in_cluster"]
-
-        if not df_out.empty and not df_in.empty:
-            df_combined = df_out.merge(df_in, on="ClusterID", how="outer").fillna(0)
-        elif not df_out.empty:
-            df_combined = df_out
-            df_combined["total_in_cluster"] = 0
-            df_combined["value_in_cluster"] = 0
-        elif not df_in.empty:
-            df_combined = df_in
-            df_combined["total_out_cluster"] = 0
-            df_combined["value_out_cluster"] = 0
-        else:
-            df_combined = pd.DataFrame(columns=["ClusterID", "total_out_cluster", "total_in_cluster", "value_out_cluster", "value_in_cluster"])
-
-        if "scorecard_data" not in st.session_state or st.session_state["last_filters"] != (start_date, end_date, tuple(selected_cluster_ids)):
-            st.session_state["scorecard_data"] = {
-                "total_out_cluster": int(df_combined["total_out_cluster"].sum()),
-                "total_in_cluster": int(df_combined["total_in_cluster"].sum()),
-                "value_out_cluster": float(df_combined["value_out_cluster"].sum()),
-                "value_in_cluster": float(df_combined["value_in_cluster"].sum()),
-            }
-            st.session_state["last_filters"] = (start_date, end_date, tuple(selected_cluster_ids))
+        df_combined = cluster_flows(summary, selected_cluster_ids)
 
         total_out_cluster = int(df_combined["total_out_cluster"].sum())
         total_in_cluster = int(df_combined["total_in_cluster"].sum())
         value_out_cluster = float(df_combined["value_out_cluster"].sum())
         value_in_cluster = float(df_combined["value_in_cluster"].sum())
 
+        render_approximate_notice([summary_key])
         st.markdown("""<div class="scorecard-container">""", unsafe_allow_html=True)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -309,158 +525,11 @@ def main():
             df_display.columns = ["Cluster ID", "Total Transaksi Rech In", "Nilai Transaksi Rech In", "Total Transaksi Rech Out", "Nilai Transaksi Rech Out"]
             st.dataframe(df_display, use_container_width=True)
 
-            chart_type = st.sidebar.selectbox("Pilih Jenis Grafik", ["Treemap", "Bubble Chart"], key="chart_type")
-            st.markdown("---")
-            st.markdown('<div class="title-box">Treemap Plot by CounterParty</div>', unsafe_allow_html=True)
-            st.markdown("<br>", unsafe_allow_html=True)
-
-            with st.spinner("Mengambil data untuk visualisasi..."):
-                df_counterparty = fetch_counterparty_data(
-                    table_name="alfred_linkaja", date_column="InitiateDate", start_date=start_date, end_date=end_date,
-                    cluster_column="ClusterID", selected_clusters=selected_cluster_ids, transaction_scenario="Digipos B2B Transfer"
-                )
-
-                if not df_counterparty.empty:
-                    if chart_type == "Bubble Chart":
-                        fig = px.scatter(
-                            df_counterparty, x="CounterParty", y="total_debit", size="total_debit",
-                            hover_data=["CounterParty", "transaction_count", "total_debit"],
-                            labels={"CounterParty": "Counter Party", "total_debit": "Total Debit (Rp)", "transaction_count": "Jumlah Transaksi"},
-                            title="Infiltrasi In Cluster", height=600
-                        )
-                        fig.update_traces(marker=dict(color="blue", opacity=0.8, line=dict(width=2, color="white")))
-                        fig.update_layout(yaxis_title="Total Debit (Rp)", xaxis_title="Counter Party", showlegend=False)
-                    else:
-                        fig = px.treemap(
-                            df_counterparty, path=["CounterParty"], values="total_debit", color="total_debit",
-                            hover_data=["CounterParty", "transaction_count", "total_debit"],
-                            labels={"CounterParty": "Counter Party", "total_debit": "Total Debit (Rp)", "transaction_count": "Jumlah Transaksi"},
-                            height=600
-                        )
-                    st.plotly_chart(fig, use_container_width=True)
-
-                    # Timeseries Plot untuk Total Transaksi Infiltrasi
-                    st.markdown("---")
-                    st.markdown('<div class="title-box">Timeseries Plot - Total Transaksi Infiltrasi</div>', unsafe_allow_html=True)
-                    st.markdown("<br>", unsafe_allow_html=True)
-
-                    with st.spinner("Mengambil data untuk timeseries plot..."):
-                        df_timeseries = fetch_timeseries_data(
-                            table_name="alfred_linkaja", date_column="InitiateDate", start_date=start_date, end_date=end_date,
-                            cluster_column="ClusterID", selected_clusters=selected_cluster_ids, transaction_scenario="Digipos B2B Transfer"
-                        )
-
-                        if not df_timeseries.empty:
-                            fig_timeseries = go.Figure()
-                            fig_timeseries.add_trace(
-                                go.Scatter(
-                                    x=df_timeseries["date"],
-                                    y=df_timeseries["total_out_cluster"],
-                                    mode="lines+markers+text",
-                                    name="Total Transaksi Rech In",
-                                    line=dict(color="blue"),
-                                    marker=dict(size=8),
-                                    text=df_timeseries["total_out_cluster"],
-                                    textposition="top center",
-                                    textfont=dict(size=10)
-                                )
-                            )
-                            fig_timeseries.add_trace(
-                                go.Scatter(
-                                    x=df_timeseries["date"],
-                                    y=df_timeseries["total_in_cluster"],
-                                    mode="lines+markers+text",
-                                    name="Total Transaksi Rech Out Cluster",
-                                    line=dict(color="orange"),
-                                    marker=dict(size=8),
-                                    text=df_timeseries["total_in_cluster"],
-                                    textposition="top center",
-                                    textfont=dict(size=10)
-                                )
-                            )
-                            fig_timeseries.update_layout(
-                                title="Total Transaksi Infiltrasi Out dan In Cluster",
-                                xaxis_title="Tanggal",
-                                yaxis_title="Jumlah Transaksi",
-                                height=600,
-                                legend=dict(x=0, y=1.1, orientation="h"),
-                                hovermode="x unified"
-                            )
-                            st.plotly_chart(fig_timeseries, use_container_width=True)
-                        else:
-                            st.warning("Tidak ada data timeseries yang tersedia untuk ditampilkan.")
-
-                    # Timeseries Plot untuk Nilai Transaksi Infiltrasi
-                    st.markdown("---")
-                    st.markdown('<div class="title-box">Timeseries Plot - Nilai Transaksi Infiltrasi</div>', unsafe_allow_html=True)
-                    st.markdown("<br>", unsafe_allow_html=True)
-
-                    with st.spinner("Mengambil data untuk timeseries nilai plot..."):
-                        df_timeseries_value = fetch_timeseries_value_data(
-                            table_name="alfred_linkaja", date_column="InitiateDate", start_date=start_date, end_date=end_date,
-                            cluster_column="ClusterID", selected_clusters=selected_cluster_ids, transaction_scenario="Digipos B2B Transfer"
-                        )
-
-                        if not df_timeseries_value.empty:
-                            fig_timeseries_value = go.Figure()
-                            fig_timeseries_value.add_trace(
-                                go.Scatter(
-                                    x=df_timeseries_value["date"],
-                                    y=df_timeseries_value["value_out_cluster"],
-                                    mode="lines+markers+text",
-                                    name="Nilai Transaksi Rech In",
-                                    line=dict(color="blue"),
-                                    marker=dict(size=8),
-                                    text=df_timeseries_value["value_out_cluster"].apply(lambda x: f"Rp {format_rupiah(x)}"),
-                                    textposition="top center",
-                                    textfont=dict(size=10)
-                                )
-                            )
-                            fig_timeseries_value.add_trace(
-                                go.Scatter(
-                                    x=df_timeseries_value["date"],
-                                    y=df_timeseries_value["value_in_cluster"],
-                                    mode="lines+markers+text",
-                                    name="Nilai Transaksi Rech Out",
-                                    line=dict(color="orange"),
-                                    marker=dict(size=8),
-                                    text=df_timeseries_value["value_in_cluster"].apply(lambda x: f"Rp {format_rupiah(x)}"),
-                                    textposition="top center",
-                                    textfont=dict(size=10)
-                                )
-                            )
-                            fig_timeseries_value.update_layout(
-                                title="Nilai Transaksi Infiltrasi Out dan In Cluster",
-                                xaxis_title="Tanggal",
-                                yaxis_title="Nilai Transaksi (Rp)",
-                                height=600,
-                                legend=dict(x=0, y=1.1, orientation="h"),
-                                hovermode="x unified"
-                            )
-                            st.plotly_chart(fig_timeseries_value, use_container_width=True)
-                        else:
-                            st.warning("Tidak ada data timeseries nilai yang tersedia untuk ditampilkan.")
-
-                    # Mengambil data mentah untuk download
-                    with st.spinner("Mengambil data mentah untuk download..."):
-                        df_raw = fetch_raw_data(
-                            table_name="alfred_linkaja", date_column="InitiateDate", start_date=start_date, end_date=end_date,
-                            cluster_column="ClusterID", selected_clusters=selected_cluster_ids, transaction_scenario="Digipos B2B Transfer"
-                        )
-
-                        if not df_raw.empty:
-                            st.markdown("<br>", unsafe_allow_html=True)
-                            excel_data = to_excel(df_raw)
-                            st.download_button(
-                                label="Download Data Mentah sebagai Excel",
-                                data=excel_data,
-                                file_name=f"Raw_Infiltrasi_Data_{start_date}_to_{end_date}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                        else:
-                            st.warning("Tidak ada data mentah yang tersedia untuk diunduh.")
-                else:
-                    st.warning("Tidak ada data CounterParty yang tersedia untuk ditampilkan dalam grafik.")
+            # Grafik CounterParty, timeseries, dan download berjalan sebagai bagian terpisah;
+            # widget di dalam fragment hanya menjalankan ulang bagiannya sendiri
+            render_counterparty_section(start_date, end_date, selected_cluster_ids)
+            render_timeseries_section(summary, selected_cluster_ids)
+            render_raw_download_section(summary, start_date, end_date, selected_cluster_ids)
 
 if __name__ == "__main__":
     main()
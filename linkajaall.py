@@ -1,27 +1,27 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 import pandas as pd
 import os
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, date
-import json
 import re
+from collections import Counter
 from io import BytesIO
 import io
-
-# Fungsi untuk menginisialisasi BigQuery client dari secrets
-@st.cache_resource
-def get_bigquery_client():
-    try:
-        credentials_json = st.secrets["bigquery"]["credentials"]
-        credentials = service_account.Credentials.from_service_account_info(json.loads(credentials_json))
-        client = bigquery.Client(credentials=credentials, project=credentials.project_id)
-        return client
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat menginisialisasi BigQuery Client: {e}")
-        return None
+from bq_client import get_bigquery_client, run_query
+from query_guard import cost_gate
+from perf import timed
+from chunked_extract import extract_to_disk, read_extract, iter_extract
+from metrics_cube import load_metrics_cube, clear_metrics_cube, load_cube_source_preview, cube_preview_key, combine_cube, slice_cube, cluster_totals, daily_totals, date_spine
+from fast_preview import render_approximate_notice
+from progressive import progressive_section, render_progressively
+from chart_utils import resample_timeseries, timeseries_trace, time_axis_title
+from reconciliation import extract_leading_number, collect_numbers, iter_matching_rows, collect_rows
+from phone_codec import encode_phone_numbers, decode_phone_numbers, unique_codes, union_codes, difference_codes, contains_codes
+
+DEFAULT_START = date(2025, 1, 1)
+# Daftar dimensi (TransactionType, ClusterID) jarang berubah, cukup diperbarui tiap jam
+DIMENSION_TTL = 3600
 
 # Fungsi untuk mengambil data dari BigQuery berdasarkan pencarian
 def fetch_bigquery_data(table_name, search_term, search_column):
@@ -35,7 +35,7 @@ def fetch_bigquery_data(table_name, search_term, search_column):
         FROM `alfred-analytics-406004.analytics_alfred.{table_name}`
         WHERE CAST({search_column} AS STRING) LIKE '%{search_term}%'
         """
-        df = client.query(query).to_dataframe()
+        df = run_query(client, query)
         for col in df.columns:
             if df[col].dtype == 'int64':
                 df[col] = df[col].astype(str)
@@ -46,55 +46,6 @@ def fetch_bigquery_data(table_name, search_term, search_column):
         st.error(f"Terjadi kesalahan saat mengambil data dari BigQuery: {e}")
         return None
 
-@st.cache_data
-def fetch_aggregate_data(table_name, count_column=None, sum_column=None, date_column=None, start_date=None, end_date=None, cluster_column=None, selected_clusters=None, is_cluster_string=False, filter_column=None, filter_not_zero=False, transaction_type_column=None, selected_transaction_types=None, transaction_scenario=None, credit_condition=False):
-    client = get_bigquery_client()
-    if client is None:
-        return 0, 0
-    
-    try:
-        query_parts = ["SELECT"]
-        if count_column:
-            query_parts.append(f"COUNT({count_column}) AS row_count")
-        if sum_column:
-            if count_column:
-                query_parts.append(",")
-            query_parts.append(f"COALESCE(SUM(CAST({sum_column} AS FLOAT64)), 0) AS total_sum")
-        query_parts.append(f"FROM `alfred-analytics-406004.analytics_alfred.{table_name}`")
-        
-        # Tambahkan kondisi WHERE
-        where_conditions = []
-        if date_column and start_date and end_date:
-            where_conditions.append(f"DATE({date_column}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')")
-        if cluster_column and selected_clusters:
-            if is_cluster_string:
-                clusters_str = ", ".join([f"'{str(cluster)}'" for cluster in selected_clusters])
-            else:
-                clusters_str = ", ".join([str(cluster) for cluster in selected_clusters])
-            where_conditions.append(f"{cluster_column} IN ({clusters_str})")
-        if filter_column and filter_not_zero:
-            where_conditions.append(f"CAST({filter_column} AS FLOAT64) != 0")
-        if transaction_type_column and selected_transaction_types:
-            transaction_types_str = ", ".join([f"'{str(ttype)}'" for ttype in selected_transaction_types])
-            where_conditions.append(f"{transaction_type_column} IN ({transaction_types_str})")
-        if transaction_scenario:
-            where_conditions.append(f"TransactionScenario = '{transaction_scenario}'")
-        if credit_condition:
-            where_conditions.append("CAST(Credit AS FLOAT64) != 0")
-        
-        if where_conditions:
-            query_parts.append("WHERE " + " AND ".join(where_conditions))
-        
-        query = " ".join(query_parts)
-        result = client.query(query).to_dataframe()
-        
-        row_count = int(result["row_count"].iloc[0]) if "row_count" in result.columns else 0
-        total_sum = float(result["total_sum"].iloc[0]) if "total_sum" in result.columns else 0
-        return row_count, total_sum
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil agregasi dari {table_name}: {e}")
-        return 0, 0
-
 # Fungsi untuk format Rupiah
 def format_rupiah(value):
     return f"{value:,.0f}".replace(",", ".")
@@ -124,1545 +75,1431 @@ def to_excel(df):
     excel_data = output.getvalue()
     return excel_data
 
-@st.cache_data
-def fetch_finpay_data(start_date, end_date, selected_cluster_ids):
-    client = get_bigquery_client()
-    if client is None:
-        return 0, 0
-    
-    try:
-        query = f"""
-        SELECT 
-            COUNT(*) AS total_trx_finpay,
-            COALESCE(SUM(CAST(Credit AS FLOAT64)), 0) AS nilai_trx_finpay
-        FROM 
-            `alfred-analytics-406004.analytics_alfred.alfred_finpay`
-        WHERE 
-            Transaction = 'RECHARGE'
-            AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-            AND DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND Remarks LIKE 'Biaya%'
-        """
-        result = client.query(query).to_dataframe()
-        total_trx = int(result["total_trx_finpay"].iloc[0])
-        total_nilai = float(result["nilai_trx_finpay"].iloc[0])
-        return total_trx, total_nilai
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data Finpay: {e}")
-        return 0, 0
+# TransactionType Akuisisi (alfred_ngrs_akui) dan Roaming (ngrs_roaming) yang dihitung di scorecard
+ACQUISITION_TRANSACTION_TYPES = [
+    'Organization eMoneyPackage Voucher Injection with Bulk Account via API with TP',
+    'Organization eMoney Buy Airtime with Bulk AKUISISI Account via API with TP',
+    'Organization eMoney Voucher Injection with Bulk Account via API with TP',
+    'Organization eMoney Buy Airtime with Bulk Account via API with TP',
+    'Organization eMoneyPackage Voucher Injection with Bulk AKUISISI Account via API with TP'
+]
+ROAMING_TRANSACTION_TYPES = [
+    'Organization eMoneyPackage Voucher Injection with Bulk Roaming Account via API with TP',
+    'Organization eMoneyPackage Voucher Injection with Bulk Account via API with TP',
+    'Organization eMoney Voucher Injection with Bulk Account via API with TP',
+    'Organization eMoney Buy Airtime with Bulk Account via API with TP'
+]
+
+# Sumber kubus metrik yang dipakai scorecard halaman ini
+CUBE_SOURCES_LINKAJAALL = [
+    "linkaja_debit", "linkaja_credit", "ngrs", "ngrs_tp", "alfred_credit",
+    "alfred_reversal", "finpay", "acquisition", "roaming"
+]
+
+# Sumber yang dibutuhkan grup scorecard LinkAja dan NGRS (untuk render bertahap)
+LINKAJA_SOURCES = ["linkaja_debit", "linkaja_credit", "alfred_credit", "alfred_reversal"]
+NGRS_SOURCES = ["ngrs", "ngrs_tp"]
+
+# Fungsi untuk ringkasan harian dari kubus metrik. Tiap sumber diambil dan di-cache sendiri untuk semua
+# cluster; filter cluster dan TransactionType NGRS diterapkan lokal, lalu semua sumber disejajarkan
+# di date spine rentang laporan (hari tanpa transaksi tetap tampil dengan nilai 0).
+def daily_summary_from_cube(cube, start_date, end_date, selected_transaction_types_ngrs, selected_cluster_ids):
+    if not selected_cluster_ids:
+        return pd.DataFrame()
+    if slice_cube(cube, clusters=selected_cluster_ids).empty:
+        return pd.DataFrame()
+    spine = date_spine(start_date, end_date)
+
+    def daily(source, scenarios=None):
+        return daily_totals(cube, source, spine, scenarios, selected_cluster_ids)
+
+    ngrs = daily("ngrs", selected_transaction_types_ngrs)
+    ngrs_tp = daily("ngrs_tp", selected_transaction_types_ngrs)
+    linkaja = daily("linkaja_debit")
+    alfred = daily("alfred_credit", ["Digipos B2B Transfer"])
+    reversal = daily("alfred_reversal")
+    finpay = daily("finpay", ["RECHARGE"])
+    acquisition = daily("acquisition", ACQUISITION_TRANSACTION_TYPES)
+    roaming = daily("roaming", ROAMING_TRANSACTION_TYPES)
+
+    # Total LinkAja = LinkAja Debit + Alfred - Reversal
+    def linkaja_total(measure):
+        return linkaja[measure] + alfred[measure] - reversal[measure]
+
+    df = pd.DataFrame({
+        'Total_Transaksi_NGRS': ngrs['row_count'],
+        'Total_Nilai_Denom_NGRS': ngrs['total_sum'],
+        'Total_TP_NGRS': ngrs_tp['total_sum'],
+        'Total_Transaksi_LinkAja': linkaja_total('row_count'),
+        'Total_Nilai_Transaksi_LinkAja': linkaja_total('total_sum'),
+        'Total_Transaksi_Finpay': finpay['row_count'],
+        'Total_Nilai_Finpay': finpay['total_sum'],
+        'Total_Transaksi_Akuisisi': acquisition['row_count'],
+        'Total_Nilai_Akuisisi': acquisition['total_sum'],
+        'Total_Transaksi_Roaming': roaming['row_count'],
+        'Total_Nilai_Roaming': roaming['total_sum'],
+    }, index=spine)
+
+    count_columns = [col for col in df.columns if col.startswith('Total_Transaksi_')]
+    df[count_columns] = df[count_columns].astype('int64')
+    df = df.rename_axis('Date').reset_index()
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    return df
 
-@st.cache_data
-def fetch_total_tp(start_date, end_date, selected_transaction_types, selected_cluster_ids):
+# Fungsi untuk mengambil daftar TransactionType untuk filter NGRS
+@st.cache_data(ttl=DIMENSION_TTL)
+def fetch_transaction_types(table_name):
     client = get_bigquery_client()
     if client is None:
-        return 0
-    
-    try:
-        # Buat query dinamis berdasarkan filter
-        query = f"""
-        SELECT 
-            COALESCE(SUM(
-                CASE 
-                    WHEN a.SpendAmount BETWEEN r.StartDenom AND r.EndDenom 
-                    THEN (a.SpendAmount * (r.TP / 100))
-                    ELSE 0 
-                END
-            ), 0) AS Total_TP
-        FROM 
-            `alfred-analytics-406004.analytics_alfred.All_pjpnonpjp` a
-        LEFT JOIN 
-            `alfred-analytics-406004.analytics_alfred.rate_ngrs_reguler` r
-        ON 
-            a.SpendAmount BETWEEN r.StartDenom AND r.EndDenom
-            AND a.dt BETWEEN r.Start_Date AND r.End_Date
-            AND a.ClusterID = r.ClusterID  
-        WHERE 
-            DATE(a.dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND a.TransactionType IN ({', '.join([f"'{ttype}'" for ttype in selected_transaction_types])})
-            AND a.ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-        """
-        result = client.query(query).to_dataframe()
-        total_tp = float(result["Total_TP"].iloc[0])
-        return total_tp
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil Total_TP: {e}")
-        return 0
-
-@st.cache_data
-def fetch_acquisition_data(start_date, end_date, selected_cluster_ids):
+        return []
+    query = f"SELECT DISTINCT TransactionType FROM `alfred-analytics-406004.analytics_alfred.{table_name}` WHERE TransactionType IS NOT NULL"
+    df = run_query(client, query)
+    return df["TransactionType"].tolist()
+
+# Fungsi untuk mengambil daftar ClusterID untuk filter (berlaku untuk semua tabel)
+@st.cache_data(ttl=DIMENSION_TTL)
+def fetch_clusters(table_name, cluster_column):
     client = get_bigquery_client()
     if client is None:
-        return 0, 0
-    
+        return []
+    query = f"SELECT DISTINCT {cluster_column} FROM `alfred-analytics-406004.analytics_alfred.{table_name}` WHERE {cluster_column} IS NOT NULL"
+    df = run_query(client, query)
+    return [int(x) for x in df[cluster_column].tolist()]
+
+# Fungsi untuk menghitung semua metrik per cluster dari kubus metrik (semua cluster diambil sekali
+# per rentang tanggal; pilihan cluster dan TransactionType diterapkan lokal). Sumber yang belum ada
+# di kubus bernilai 0, sehingga kubus sebagian cukup untuk grup yang sumbernya sudah lengkap.
+def metrics_per_cluster(cube, cluster_list, selected_transaction_types_ngrs):
+    if not cluster_list:
+        return {}
+    linkaja_debit = cluster_totals(cube, "linkaja_debit", cluster_list)
+    linkaja_credit = cluster_totals(cube, "linkaja_credit", cluster_list)
+    ngrs = cluster_totals(cube, "ngrs", cluster_list, selected_transaction_types_ngrs)
+    ngrs_tp = cluster_totals(cube, "ngrs_tp", cluster_list, selected_transaction_types_ngrs)
+    alfred = cluster_totals(cube, "alfred_credit", cluster_list, ["Digipos B2B Transfer"])
+    alfred_reversal = cluster_totals(cube, "alfred_reversal", cluster_list)
+    finpay = cluster_totals(cube, "finpay", cluster_list, ["RECHARGE"])
+    acquisition = cluster_totals(cube, "acquisition", cluster_list, ACQUISITION_TRANSACTION_TYPES)
+    roaming = cluster_totals(cube, "roaming", cluster_list, ROAMING_TRANSACTION_TYPES)
+
+    metrics = {}
+    for cluster in cluster_list:
+        cluster_metrics = {
+            'linkaja_row_count_debit': int(linkaja_debit.at[cluster, 'row_count']),
+            'linkaja_row_count_credit': int(linkaja_credit.at[cluster, 'row_count']),
+            'linkaja_total_debit': float(linkaja_debit.at[cluster, 'total_sum']),
+            'linkaja_total_credit': float(linkaja_credit.at[cluster, 'total_sum']),
+            'all_row_count': int(ngrs.at[cluster, 'row_count']),
+            'all_total_spend': float(ngrs.at[cluster, 'total_sum']),
+            'alfred_row_count': int(alfred.at[cluster, 'row_count']),
+            'alfred_total_amount': float(alfred.at[cluster, 'total_sum']),
+            'alfred_reversal_row_count': int(alfred_reversal.at[cluster, 'row_count']),
+            'alfred_reversal_total_amount': float(alfred_reversal.at[cluster, 'total_sum']),
+            'total_tp': float(ngrs_tp.at[cluster, 'total_sum']),
+            'total_trx_finpay': int(finpay.at[cluster, 'row_count']),
+            'nilai_trx_finpay': float(finpay.at[cluster, 'total_sum']),
+            'total_trx_acquisition': int(acquisition.at[cluster, 'row_count']),
+            'total_amount_acquisition': float(acquisition.at[cluster, 'total_sum']),
+            'total_trx_roaming': int(roaming.at[cluster, 'row_count']),
+            'total_amount_roaming': float(roaming.at[cluster, 'total_sum']),
+        }
+        # Perhitungan tambahan (termasuk Finpay)
+        cluster_metrics['total_transaksi_linkaja'] = (cluster_metrics['linkaja_row_count_debit'] + 
+                                                    cluster_metrics['alfred_row_count'] - 
+                                                    cluster_metrics['alfred_reversal_row_count'] + 
+                                                    cluster_metrics['total_trx_finpay'])
+        cluster_metrics['total_nilai_transaksi_ngrs'] = (cluster_metrics['linkaja_total_debit'] + 
+                                                        cluster_metrics['alfred_total_amount'] - 
+                                                        cluster_metrics['alfred_reversal_total_amount'] + 
+                                                        cluster_metrics['nilai_trx_finpay'])
+        cluster_metrics['fee'] = cluster_metrics['total_nilai_transaksi_ngrs'] - cluster_metrics['all_total_spend']
+
+        metrics[cluster] = cluster_metrics
+    return metrics
+
+# Fungsi untuk total overview semua cluster terpilih (metrik yang tidak ada bernilai 0)
+def overview_totals(all_metrics):
+    totals = Counter()
+    for metrics in all_metrics.values():
+        totals.update(metrics)
+    return totals
+
+# Fungsi untuk normalisasi nomor telepon (awalan 8 menjadi 628)
+def normalize_phone_number(number):
+    if pd.isna(number):  # Handle NaN
+        return None
+    number = str(number).strip()  # Konversi ke string dan hapus spasi
+    if number.startswith('8'):  # Jika dimulai dengan 8 atau 6, tambahkan 62
+        return '62' + number
+    else:  # Jika tidak dimulai dengan 8 atau 6, kembalikan nomor asli tanpa perubahan
+        return number
+
+# Fungsi untuk mengambil angka pertama dari CounterParty sebagai NoRS
+def extract_first_number(text):
+    if pd.isna(text):
+        return None
+    match = re.match(r'(\d+)', str(text))
+    return match.group(1) if match else None
+
+# Fungsi untuk merapikan tipe kolom data detail (tanggal tanpa timezone, nilai kosong)
+def clean_detail_frame(df):
+    for col in df.columns:
+        dtype_str = str(df[col].dtype).lower()
+        if 'date' in dtype_str or dtype_str.startswith('db_dtypes'):
+            df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
+            df[col] = df[col].where(df[col].notna(), None)
+        elif dtype_str in ['int64', 'int32', 'uint64', 'uint32', 'float64', 'float32']:
+            df[col] = df[col].where(df[col].notna(), None)
+        elif dtype_str == 'bool':
+            df[col] = df[col].where(df[col].notna(), False)
+        else:
+            df[col] = df[col].fillna('')
+    return df
+
+# Fungsi untuk menyusun query data detail (dipakai juga untuk estimasi biaya)
+def build_linkaja_detail_query(start_date, end_date, selected_cluster_ids):
+    return f"""
+    SELECT *
+    FROM `alfred-analytics-406004.analytics_alfred.linkaja_Digipos_B2B_tf_Cluster`
+    WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
+    AND (CAST(Credit AS FLOAT64) != 0)
+    """
+
+def build_ngrs_detail_query(start_date, end_date, selected_cluster_ids, selected_transaction_types_ngrs):
+    return f"""
+    SELECT *
+    FROM `alfred-analytics-406004.analytics_alfred.All_pjpnonpjp`
+    WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
+    AND TransactionType IN ({', '.join([f"'{ttype}'" for ttype in selected_transaction_types_ngrs])})
+    """
+
+def build_alfred_detail_query(start_date, end_date, selected_cluster_ids):
+    return f"""
+    SELECT *
+    FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja`
+    WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
+    AND (
+        (TransactionScenario = 'Digipos B2B Transfer' AND CAST(Credit AS FLOAT64) != 0)
+        OR TransactionScenario = 'Buy Goods Reversal for General Merchant'
+    )
+    """
+
+def build_detail_queries(start_date, end_date, selected_cluster_ids, selected_transaction_types_ngrs):
+    return [
+        build_linkaja_detail_query(start_date, end_date, selected_cluster_ids),
+        build_ngrs_detail_query(start_date, end_date, selected_cluster_ids, selected_transaction_types_ngrs),
+        build_alfred_detail_query(start_date, end_date, selected_cluster_ids),
+    ]
+
+# Fungsi untuk menyiapkan potongan data LinkAja/Alfred: NoRS dari CounterParty lalu dinormalisasi
+def prepare_counterparty_detail(df):
+    if 'CounterParty' in df.columns:
+        df['NoRS'] = df['CounterParty'].apply(extract_first_number)
+    if 'NoRS' in df.columns:
+        df['NoRS'] = df['NoRS'].apply(normalize_phone_number)
+    return clean_detail_frame(df)
+
+# Fungsi untuk menyiapkan potongan data NGRS: NoChip dinormalisasi
+def prepare_ngrs_detail(df):
+    if 'NoChip' in df.columns:
+        df['NoChip'] = df['NoChip'].apply(normalize_phone_number)
+    return clean_detail_frame(df)
+
+# Fungsi untuk mengekstrak data detail per potongan tanggal ke disk (potongan yang ada dipakai ulang)
+def extract_linkaja_detail(date_ranges, selected_cluster_ids):
+    return extract_to_disk(
+        "linkaja_detail",
+        lambda chunk_start, chunk_end: build_linkaja_detail_query(chunk_start, chunk_end, selected_cluster_ids),
+        date_ranges
+    )
+
+def extract_ngrs_detail(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    return extract_to_disk(
+        "ngrs_detail",
+        lambda chunk_start, chunk_end: build_ngrs_detail_query(chunk_start, chunk_end, selected_cluster_ids, selected_transaction_types_ngrs),
+        date_ranges
+    )
+
+def extract_alfred_detail(date_ranges, selected_cluster_ids):
+    return extract_to_disk(
+        "alfred_detail",
+        lambda chunk_start, chunk_end: build_alfred_detail_query(chunk_start, chunk_end, selected_cluster_ids),
+        date_ranges
+    )
+
+# Fungsi untuk mengambil data detail dari masing-masing tabel dengan filter
+def fetch_linkaja_data(date_ranges, selected_cluster_ids):
+    if get_bigquery_client() is None:
+        return pd.DataFrame()
     try:
-        transaction_types = [
-            'Organization eMoneyPackage Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Buy Airtime with Bulk AKUISISI Account via API with TP',
-            'Organization eMoney Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Buy Airtime with Bulk Account via API with TP',
-            'Organization eMoneyPackage Voucher Injection with Bulk AKUISISI Account via API with TP'
-        ]
-        transaction_types_str = ', '.join([f"'{ttype}'" for ttype in transaction_types])
-        
-        query = f"""
-        SELECT 
-            COUNT(*) AS total_trx_acquisition,
-            COALESCE(SUM(ABS(CAST(TransactionAmount AS FLOAT64))), 0) AS total_amount_acquisition
-        FROM 
-            `alfred-analytics-406004.analytics_alfred.alfred_ngrs_akui`
-        WHERE 
-            DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-            AND TransactionType IN ({transaction_types_str})
-        """
-        result = client.query(query).to_dataframe()
-        total_trx = int(result["total_trx_acquisition"].iloc[0])
-        total_amount = float(result["total_amount_acquisition"].iloc[0])
-        return total_trx, total_amount
+        return read_extract(extract_linkaja_detail(date_ranges, selected_cluster_ids), prepare_counterparty_detail)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data Akuisisi dari alfred_ngrs_akui: {e}")
-        return 0, 0
+        st.error(f"Terjadi kesalahan saat mengambil data detail LinkAja: {e}")
+        return pd.DataFrame()
 
-@st.cache_data
-def fetch_roaming_data(start_date, end_date, selected_cluster_ids):
-    client = get_bigquery_client()
-    if client is None:
-        return 0, 0
-    
+def fetch_ngrs_data(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    if get_bigquery_client() is None:
+        return pd.DataFrame()
     try:
-        transaction_types = [
-            'Organization eMoneyPackage Voucher Injection with Bulk Roaming Account via API with TP',
-            'Organization eMoneyPackage Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Buy Airtime with Bulk Account via API with TP'
-        ]
-        transaction_types_str = ', '.join([f"'{ttype}'" for ttype in transaction_types])
-        
-        query = f"""
-        SELECT 
-            COUNT(*) AS total_trx_roaming,
-            COALESCE(SUM(ABS(CAST(TransactionAmount AS FLOAT64))), 0) AS total_amount_roaming
-        FROM 
-            `alfred-analytics-406004.analytics_alfred.ngrs_roaming`
-        WHERE 
-            DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-            AND TransactionType IN ({transaction_types_str})
-        """
-        result = client.query(query).to_dataframe()
-        total_trx = int(result["total_trx_roaming"].iloc[0])
-        total_amount = float(result["total_amount_roaming"].iloc[0])
-        return total_trx, total_amount
+        return read_extract(extract_ngrs_detail(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs), prepare_ngrs_detail)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data Roaming dari ngrs_roaming: {e}")
-        return 0, 0
-
+        st.error(f"Terjadi kesalahan saat mengambil data detail NGRS: {e}")
+        return pd.DataFrame()
 
-@st.cache_data
-def fetch_daily_summary(start_date, end_date, selected_transaction_types_ngrs, selected_cluster_ids):
-    client = get_bigquery_client()
-    if client is None:
+def fetch_alfred_data(date_ranges, selected_cluster_ids):
+    if get_bigquery_client() is None:
         return pd.DataFrame()
-    
     try:
-        acquisition_transaction_types = [
-            'Organization eMoneyPackage Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Buy Airtime with Bulk AKUISISI Account via API with TP',
-            'Organization eMoney Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Buy Airtime with Bulk Account via API with TP',
-            'Organization eMoneyPackage Voucher Injection with Bulk AKUISISI Account via API with TP'
-        ]
-        roaming_transaction_types = [
-            'Organization eMoneyPackage Voucher Injection with Bulk Roaming Account via API with TP',
-            'Organization eMoneyPackage Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Voucher Injection with Bulk Account via API with TP',
-            'Organization eMoney Buy Airtime with Bulk Account via API with TP'
-        ]
-        acquisition_types_str = ', '.join([f"'{ttype}'" for ttype in acquisition_transaction_types])
-        roaming_types_str = ', '.join([f"'{ttype}'" for ttype in roaming_transaction_types])
-        
-        query = f"""
-        WITH LinkAjaDebit AS (
-            SELECT 
-                DATE(InitiateDate) AS date,
-                COUNT(*) AS linkaja_debit_count,
-                COALESCE(SUM(CAST(Debit AS FLOAT64)), 0) AS linkaja_debit_amount
-            FROM `alfred-analytics-406004.analytics_alfred.linkaja_Digipos_B2B_tf_Cluster`
-            WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND CAST(Debit AS FLOAT64) != 0
-            GROUP BY DATE(InitiateDate)
-        ),
-        AlfredLinkAja AS (
-            SELECT 
-                DATE(InitiateDate) AS date,
-                COUNT(*) AS alfred_count,
-                COALESCE(SUM(SAFE_CAST(Credit AS FLOAT64)), 0) AS alfred_amount
-            FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja`
-            WHERE 
-                InitiateDate IS NOT NULL
-                AND DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND TransactionScenario IN ('Digipos B2B Transfer')
-                AND SAFE_CAST(Credit AS FLOAT64) IS NOT NULL
-                AND SAFE_CAST(Credit AS FLOAT64) != 0
-            GROUP BY DATE(InitiateDate)
-        ),
-        AlfredReversal AS (
-            SELECT 
-                DATE(InitiateDate) AS date,
-                COUNT(*) AS reversal_count,
-                COALESCE(SUM(CAST(Debit AS FLOAT64)), 0) AS reversal_amount
-            FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja`
-            WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND TransactionScenario = 'Buy Goods Reversal for General Merchant'
-            GROUP BY DATE(InitiateDate)
-        ),
-        Finpay AS (
-            SELECT 
-                DATE(dt) AS date,
-                COUNT(*) AS finpay_count,
-                COALESCE(SUM(CAST(Credit AS FLOAT64)), 0) AS finpay_amount
-            FROM `alfred-analytics-406004.analytics_alfred.alfred_finpay`
-            WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND Transaction = 'RECHARGE'
-                AND Remarks LIKE 'Biaya%'
-            GROUP BY DATE(dt)
-        ),
-        NGRS AS (
-            SELECT 
-                DATE(dt) AS date,
-                COUNT(*) AS ngrs_count,
-                COALESCE(SUM(CAST(SpendAmount AS FLOAT64)), 0) AS ngrs_amount
-            FROM `alfred-analytics-406004.analytics_alfred.All_pjpnonpjp` a
-            WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND a.ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND a.TransactionType IN ({', '.join([f"'{ttype}'" for ttype in selected_transaction_types_ngrs])})
-            GROUP BY DATE(dt)
-        ),
-        NGRS_TP AS (
-            SELECT 
-                DATE(a.dt) AS date,
-                COALESCE(SUM(
-                    CASE 
-                        WHEN a.SpendAmount BETWEEN r.StartDenom AND r.EndDenom 
-                        THEN (a.SpendAmount * (r.TP / 100)) 
-                        ELSE 0 
-                    END
-                ), 0) AS total_tp
-            FROM `alfred-analytics-406004.analytics_alfred.All_pjpnonpjp` a
-            LEFT JOIN `alfred-analytics-406004.analytics_alfred.rate_ngrs_reguler` r
-            ON a.SpendAmount BETWEEN r.StartDenom AND r.EndDenom
-                AND a.dt BETWEEN r.Start_Date AND r.End_Date
-                AND a.ClusterID = r.ClusterID
-            WHERE DATE(a.dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND a.ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND a.TransactionType IN ({', '.join([f"'{ttype}'" for ttype in selected_transaction_types_ngrs])})
-            GROUP BY DATE(a.dt)
-        ),
-        Acquisition AS (
-            SELECT 
-                DATE(dt) AS date,
-                COUNT(*) AS acquisition_count,
-                COALESCE(SUM(ABS(CAST(TransactionAmount AS FLOAT64))), 0) AS acquisition_amount
-            FROM `alfred-analytics-406004.analytics_alfred.alfred_ngrs_akui`
-            WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND TransactionType IN ({acquisition_types_str})
-            GROUP BY DATE(dt)
-        ),
-        Roaming AS (
-            SELECT 
-                DATE(dt) AS date,
-                COUNT(*) AS roaming_count,
-                COALESCE(SUM(ABS(CAST(TransactionAmount AS FLOAT64))), 0) AS roaming_amount
-            FROM `alfred-analytics-406004.analytics_alfred.ngrs_roaming`
-            WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-                AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-                AND TransactionType IN ({roaming_types_str})
-            GROUP BY DATE(dt)
-        )
-        SELECT 
-            COALESCE(n.date, l.date, a.date, r.date, f.date, acq.date, roam.date, nt.date) AS Date,
-            COALESCE(n.ngrs_count, 0) AS Total_Transaksi_NGRS,
-            COALESCE(n.ngrs_amount, 0) AS Total_Nilai_Denom_NGRS,
-            COALESCE(nt.total_tp, 0) AS Total_TP_NGRS,
-            COALESCE(l.linkaja_debit_count, 0) + COALESCE(a.alfred_count, 0) - COALESCE(r.reversal_count, 0) AS Total_Transaksi_LinkAja,
-            COALESCE(l.linkaja_debit_amount, 0) + COALESCE(a.alfred_amount, 0) - COALESCE(r.reversal_amount, 0) AS Total_Nilai_Transaksi_LinkAja,
-            COALESCE(f.finpay_count, 0) AS Total_Transaksi_Finpay,
-            COALESCE(f.finpay_amount, 0) AS Total_Nilai_Finpay,
-            COALESCE(acq.acquisition_count, 0) AS Total_Transaksi_Akuisisi,
-            COALESCE(acq.acquisition_amount, 0) AS Total_Nilai_Akuisisi,
-            COALESCE(roam.roaming_count, 0) AS Total_Transaksi_Roaming,
-            COALESCE(roam.roaming_amount, 0) AS Total_Nilai_Roaming
-        FROM NGRS n
-        FULL OUTER JOIN LinkAjaDebit l ON n.date = l.date
-        FULL OUTER JOIN AlfredLinkAja a ON n.date = a.date
-        FULL OUTER JOIN AlfredReversal r ON n.date = r.date
-        FULL OUTER JOIN Finpay f ON n.date = f.date
-        FULL OUTER JOIN Acquisition acq ON n.date = acq.date
-        FULL OUTER JOIN Roaming roam ON n.date = roam.date
-        FULL OUTER JOIN NGRS_TP nt ON n.date = nt.date
-        ORDER BY Date
-        """
-        df = client.query(query).to_dataframe()
-        
-        df['Date'] = pd.to_datetime(df['Date']).dt.date
-        numeric_columns = ['Total_Transaksi_NGRS', 'Total_Nilai_Denom_NGRS', 'Total_TP_NGRS', 
-                          'Total_Transaksi_LinkAja', 'Total_Nilai_Transaksi_LinkAja',
-                          'Total_Transaksi_Finpay', 'Total_Nilai_Finpay',
-                          'Total_Transaksi_Akuisisi', 'Total_Nilai_Akuisisi',
-                          'Total_Transaksi_Roaming', 'Total_Nilai_Roaming']
-        for col in numeric_columns:
-            df[col] = df[col].fillna(0)
-        
-        return df
+        return read_extract(extract_alfred_detail(date_ranges, selected_cluster_ids), prepare_counterparty_detail)
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat mengambil data harian: {e}")
+        st.error(f"Terjadi kesalahan saat mengambil data detail Alfred: {e}")
         return pd.DataFrame()
 
-def main():
-    st.markdown(
-        """
-        <h1 style='text-align: center;'>LinkAja x NGRS Validator</h1>
-        """,
-        unsafe_allow_html=True
+# Fungsi untuk memuat ketiga data detail untuk rekonsiliasi
+def load_detail_frames(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    return (
+        fetch_linkaja_data(date_ranges, selected_cluster_ids),
+        fetch_ngrs_data(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs),
+        fetch_alfred_data(date_ranges, selected_cluster_ids),
     )
-    st.markdown("---")
-    st.markdown('<div class="summary-title-box">', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown(
-        """
-        <style>
-            .title-box {
-                text-align: center;
-                padding: 15px;
-                background-color: white;
-                border-radius: 10px;
-                box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
-                margin-bottom: 20px;
-                font-size: 20px;
-                font-weight: bold;
-                color: #333;
-            }
-        </style>
 
-        <div class="title-box">
-            Data Overview Summary
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
-    st.markdown("<br>", unsafe_allow_html=True)
-    st.markdown(
-        """
-        <style>
-        .scorecard-container {
-            display: flex;
-            justify-content: space-between;
-            gap: 20px;
-            margin-bottom: 20px;
-        }
-        .scorecard {
-            background-color: #f0f8ff;
-            border-radius: 8px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            padding: 15px;
-            flex: 1;
-            text-align: center;
-            min-width: 0;
-        }
-        .metric-label {
-            color: #666;
-            font-size: 14px;
-            margin-bottom: 5px;
-        }
-        .metric-value {
-            color: #333;
-            font-size: 18px;
-            font-weight: bold;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True
+# Fungsi untuk himpunan kode NoRS gabungan LinkAja/Alfred dan kode NoChip NGRS (lihat phone_codec)
+def detail_number_codes(linkaja_df, ngrs_df, alfred_df):
+    rs_codes = union_codes(
+        unique_codes(encode_phone_numbers(linkaja_df['NoRS'])),
+        unique_codes(encode_phone_numbers(alfred_df['NoRS']))
     )
+    return rs_codes, unique_codes(encode_phone_numbers(ngrs_df['NoChip']))
 
-    # Filter tanggal dan Cluster untuk scorecard
-    default_start = date(2025, 1, 1)
-    default_end = datetime.now().date()
+@st.cache_data
+def get_missing_numbers_in_ngrs(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    linkaja_df, ngrs_df, alfred_df = load_detail_frames(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
 
-    # Deklarasi variabel di scope fungsi
-    start_date = default_start.strftime('%Y-%m-%d')
-    end_date = default_end.strftime('%Y-%m-%d')
+    if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
+        st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
+        return pd.DataFrame()
 
-    with st.sidebar:
-        st.sidebar.markdown("**Filter untuk Scorecard Keseluruhan**")
-        st.sidebar.markdown("---")
+    try:
+        rs_codes, chip_codes = detail_number_codes(linkaja_df, ngrs_df, alfred_df)
+    except KeyError as e:
+        st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
+        return pd.DataFrame()
 
-        st.sidebar.markdown("**Filter Tanggal Keseluruhan**")
-        filter_type = st.sidebar.selectbox(
-            "Tipe Filter Tanggal",
-            ["Per Hari", "Rentang Hari"],
-            key="filter_type_overall"
-        )
-        if filter_type == "Per Hari":
-            selected_date = st.sidebar.date_input("Pilih Tanggal", default_end, key="overall_date_single")
-            start_date = selected_date.strftime('%Y-%m-%d')
-            end_date = selected_date.strftime('%Y-%m-%d')
-        else:
-            date_range = st.sidebar.date_input("Pilih Rentang Tanggal", [default_start, default_end], key="overall_date_range")
-            if len(date_range) == 2:
-                start_date = date_range[0].strftime('%Y-%m-%d')
-                end_date = date_range[1].strftime('%Y-%m-%d')
-            else:
-                start_date = default_start.strftime('%Y-%m-%d')
-                end_date = default_end.strftime('%Y-%m-%d')
+    if len(rs_codes) == 0:
+        st.warning("Tidak ada data di kolom NoRS setelah penggabungan dan pembersihan.")
+        return pd.DataFrame()
 
-        # Filter TransactionType untuk NGRS
-        def fetch_transaction_types(table_name):
-            client = get_bigquery_client()
-            if client is None:
-                return []
-            query = f"SELECT DISTINCT TransactionType FROM `alfred-analytics-406004.analytics_alfred.{table_name}` WHERE TransactionType IS NOT NULL"
-            df = client.query(query).to_dataframe()
-            return df["TransactionType"].tolist()
+    if len(chip_codes) == 0:
+        st.warning("Tidak ada data di kolom NoChip setelah pembersihan.")
+        return pd.DataFrame()
 
-        transaction_types_ngrs = fetch_transaction_types("All_pjpnonpjp")
-        selected_transaction_types_ngrs = st.sidebar.multiselect(
-            "Pilih TransactionType NGRS",
-            transaction_types_ngrs,
-            default=transaction_types_ngrs,
-            key="transaction_type_ngrs_filter"
-        )
+    missing_codes = difference_codes(rs_codes, chip_codes)
 
-        # Filter ClusterID tunggal untuk semua tabel
-        def fetch_clusters(table_name, cluster_column):
-            client = get_bigquery_client()
-            if client is None:
-                return []
-            query = f"SELECT DISTINCT {cluster_column} FROM `alfred-analytics-406004.analytics_alfred.{table_name}` WHERE {cluster_column} IS NOT NULL"
-            df = client.query(query).to_dataframe()
-            return [int(x) for x in df[cluster_column].tolist()]
+    if len(missing_codes) == 0:
+        st.info("Tidak ada nomor yang hilang ditemukan antara NoRS dan NoChip.")
+        return pd.DataFrame()
 
-        st.sidebar.markdown("**Filter ClusterID (Berlaku untuk Semua Tabel)**")
-        cluster_ids = fetch_clusters("linkaja_Digipos_B2B_tf_Cluster", "ClusterID")
-        selected_cluster_ids = st.sidebar.multiselect(
-            "Pilih ClusterID",
-            cluster_ids,
-            default=cluster_ids,
-            key="cluster_id_filter"
-        )
+    return pd.DataFrame({'NoRS': decode_phone_numbers(missing_codes)})
 
-    with st.spinner("Mengambil data agregasi untuk scorecard..."):
-        # Fungsi untuk menghitung semua metrik per cluster
-        def calculate_metrics_per_cluster(cluster_list):
-            metrics = {}
-            for cluster in cluster_list:
-                cluster_metrics = {}
-                
-                # LinkAja Debit
-                cluster_metrics['linkaja_row_count_debit'] = fetch_aggregate_data(
-                    "linkaja_Digipos_B2B_tf_Cluster", count_column="*", date_column="InitiateDate",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], filter_column="Debit", filter_not_zero=True
-                )[0]
-                
-                # LinkAja Credit
-                cluster_metrics['linkaja_row_count_credit'] = fetch_aggregate_data(
-                    "linkaja_Digipos_B2B_tf_Cluster", count_column="*", date_column="InitiateDate",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], filter_column="Credit", filter_not_zero=True
-                )[0]
-                
-                # LinkAja Total Debit
-                cluster_metrics['linkaja_total_debit'] = fetch_aggregate_data(
-                    "linkaja_Digipos_B2B_tf_Cluster", sum_column="Debit", date_column="InitiateDate",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], filter_column="Debit", filter_not_zero=True
-                )[1]
-                
-                # LinkAja Total Credit
-                cluster_metrics['linkaja_total_credit'] = fetch_aggregate_data(
-                    "linkaja_Digipos_B2B_tf_Cluster", sum_column="Credit", date_column="InitiateDate",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], filter_column="Credit", filter_not_zero=True
-                )[1]
-                
-                # NGRS
-                cluster_metrics['all_row_count'], cluster_metrics['all_total_spend'] = fetch_aggregate_data(
-                    "All_pjpnonpjp", count_column="*", sum_column="SpendAmount", date_column="dt",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], transaction_type_column="TransactionType",
-                    selected_transaction_types=selected_transaction_types_ngrs
-                )
-                
-                # Alfred LinkAja
-                cluster_metrics['alfred_row_count'], cluster_metrics['alfred_total_amount'] = fetch_aggregate_data(
-                    "alfred_linkaja", count_column="*", sum_column="Credit", date_column="InitiateDate",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], transaction_scenario="Digipos B2B Transfer",
-                    credit_condition=True
-                )
-                
-                # Alfred Reversal
-                cluster_metrics['alfred_reversal_row_count'], cluster_metrics['alfred_reversal_total_amount'] = fetch_aggregate_data(
-                    "alfred_linkaja", count_column="*", sum_column="Debit", date_column="InitiateDate",
-                    start_date=start_date, end_date=end_date, cluster_column="ClusterID",
-                    selected_clusters=[cluster], transaction_scenario="Buy Goods Reversal for General Merchant"
-                )
-
-                # Total_TP (baru)
-                cluster_metrics['total_tp'] = fetch_total_tp(
-                    start_date=start_date,
-                    end_date=end_date,
-                    selected_transaction_types=selected_transaction_types_ngrs,
-                    selected_cluster_ids=[cluster]
-                )
-                
-                # Finpay (baru)
-                cluster_metrics['total_trx_finpay'], cluster_metrics['nilai_trx_finpay'] = fetch_finpay_data(
-                    start_date=start_date,
-                    end_date=end_date,
-                    selected_cluster_ids=[cluster]
-                )
-
-                cluster_metrics['total_trx_acquisition'], cluster_metrics['total_amount_acquisition'] = fetch_acquisition_data(
-                    start_date=start_date,
-                    end_date=end_date,
-                    selected_cluster_ids=[cluster]
-                )
-
-
-                cluster_metrics['total_trx_roaming'], cluster_metrics['total_amount_roaming'] = fetch_roaming_data(
-                    start_date=start_date,
-                    end_date=end_date,
-                    selected_cluster_ids=[cluster]
-                )
-                        # Perhitungan tambahan
-                # Perhitungan tambahan (diperbarui untuk menyertakan Finpay)
-                cluster_metrics['total_transaksi_linkaja'] = (cluster_metrics['linkaja_row_count_debit'] + 
-                                                            cluster_metrics['alfred_row_count'] - 
-                                                            cluster_metrics['alfred_reversal_row_count'] + 
-                                                            cluster_metrics['total_trx_finpay'])
-                cluster_metrics['total_nilai_transaksi_ngrs'] = (cluster_metrics['linkaja_total_debit'] + 
-                                                                cluster_metrics['alfred_total_amount'] - 
-                                                                cluster_metrics['alfred_reversal_total_amount'] + 
-                                                                cluster_metrics['nilai_trx_finpay'])
-                cluster_metrics['fee'] = cluster_metrics['total_nilai_transaksi_ngrs'] - cluster_metrics['all_total_spend']
-                
-                metrics[cluster] = cluster_metrics
-            return metrics
-
-        # Hitung metrik untuk semua cluster yang dipilih
-        all_metrics = calculate_metrics_per_cluster(selected_cluster_ids)
-
-        # Hitung total untuk overview
-        linkaja_row_count_debit = sum(m['linkaja_row_count_debit'] for m in all_metrics.values())
-        linkaja_row_count_credit = sum(m['linkaja_row_count_credit'] for m in all_metrics.values())
-        linkaja_total_debit = sum(m['linkaja_total_debit'] for m in all_metrics.values())
-        linkaja_total_credit = sum(m['linkaja_total_credit'] for m in all_metrics.values())
-        all_row_count = sum(m['all_row_count'] for m in all_metrics.values())
-        all_total_spend = sum(m['all_total_spend'] for m in all_metrics.values())
-        alfred_row_count = sum(m['alfred_row_count'] for m in all_metrics.values())
-        alfred_total_amount = sum(m['alfred_total_amount'] for m in all_metrics.values())
-        alfred_reversal_row_count = sum(m['alfred_reversal_row_count'] for m in all_metrics.values())
-        alfred_reversal_total_amount = sum(m['alfred_reversal_total_amount'] for m in all_metrics.values())
-        total_trx_finpay = sum(m['total_trx_finpay'] for m in all_metrics.values())  # Baru
-        nilai_trx_finpay = sum(m['nilai_trx_finpay'] for m in all_metrics.values())
-        total_transaksi_linkaja = sum(m['total_transaksi_linkaja'] for m in all_metrics.values())
-        total_nilai_transaksi_ngrs = sum(m['total_nilai_transaksi_ngrs'] for m in all_metrics.values())
-        fee = sum(m['fee'] for m in all_metrics.values())
-        total_tp = sum(m['total_tp'] for m in all_metrics.values())
-
-        # Hitung total akuisisi (dari alfred_ngrs_akui)
-        total_trx_acquisition = sum(m['total_trx_acquisition'] for m in all_metrics.values())
-        total_amount_acquisition = sum(m['total_amount_acquisition'] for m in all_metrics.values())
-        # Hitung total untuk overview
-        total_trx_roaming = sum(m['total_trx_roaming'] for m in all_metrics.values())
-        total_amount_roaming = sum(m['total_amount_roaming'] for m in all_metrics.values())
-        # Tambahkan CSS untuk styling (digunakan untuk semua grup)
-        st.markdown(
-            """
-            <style>
-                /* Box besar yang membungkus semua kolom */
-                .group-container {
-                    background-color: white;
-                    padding: 20px;
-                    border-radius: 12px;
-                    box-shadow: 2px 4px 10px rgba(0,0,0,0.15);
-                    margin-bottom: 20px;
-                    border: 2px solid #edededed; /* Gray untuk border container */
-                }
 
-                /* Header dalam box besar */
-                .group-header {
-                    text-align: center;
-                    font-size: 18px;
-                    font-weight: normal;
-                    color: #333;
-                    padding: 10px;
-                    border-bottom: 2px solid #edededed; /* Gray untuk border bawah header */
-                    margin-bottom: 15px;
-                }
+@st.cache_data
+def get_missing_numbers_in_linkaja(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    linkaja_df, ngrs_df, alfred_df = load_detail_frames(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
 
-                .group-header-font {
-                    text-align: center;
-                    font-size: 20px;
-                    font-weight: bold;
-                    color: #333;
-                    padding: 10px;
-                    border-bottom: 2px solid #edededed; /* Gray untuk border bawah header */
-                    margin-bottom: 15px;
-                }
+    if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
+        st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
+        return pd.DataFrame()
 
-                /* Wrapper untuk scorecards */
-                .scorecard-container {
-                    display: flex;
-                    justify-content: space-between;
-                    gap: 15px;
-                    padding: 10px;
-                }
+    try:
+        rs_codes, chip_codes = detail_number_codes(linkaja_df, ngrs_df, alfred_df)
+    except KeyError as e:
+        st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
+        return pd.DataFrame()
 
-                /* Box dalam box (scorecard utama) */
-                .scorecard {
-                    flex: 1;
-                    text-align: center;
-                    border-radius: 10px;
-                    padding: 15px;
-                    box-shadow: 2px 2px 8px rgba(0,0,0,0.1);
-                    border: 1px solid #edededed; /* Gray untuk border scorecard */
-                }
+    if len(rs_codes) == 0:
+        st.warning("Tidak ada data di kolom NoRS setelah penggabungan dan pembersihan.")
+        return pd.DataFrame()
 
-                /* Inner box untuk nilai */
-                .metric-box {
-                    background: #f9f9f9;
-                    padding: 10px;
-                    border-radius: 8px;
-                    box-shadow: inset 2px 2px 5px rgba(0,0,0,0.1);
-                    font-size: 18px;
-                    font-weight: bold;
-                    color: #333;
-                    margin-top: 8px;
-                }
+    if len(chip_codes) == 0:
+        st.warning("Tidak ada data di kolom NoChip setelah pembersihan.")
+        return pd.DataFrame()
 
-                /* Label untuk setiap metric */
-                .metric-label {
-                    font-size: 14px;
-                    color: #666;
-                }
+    missing_codes = difference_codes(chip_codes, rs_codes)
 
-                /* Warna spesifik untuk grup berdasarkan kombinasi warna Anda */
-                .linkaja-group { background-color: #8ec1da; } /* Med Blue untuk LinkAja */
-                .finpay-group { background-color: #cdedecec; } /* Light Blue untuk Finpay */
-                .ngrs-group { background-color: #f6d6c2; } /* Light Red untuk NGRS */
-                .summary-group { background-color: #d47264; } /* Med Red untuk Summary */
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
+    if len(missing_codes) == 0:
+        st.info("Tidak ada nomor dari NGRS yang hilang di gabungan LinkAja/Alfred.")
+        return pd.DataFrame()
 
-        # Grup 1: Transaksi LinkAja dengan border (seperti yang ada)
-        st.markdown("<div class='group-header-font'>Transaksi LinkAja</div>", unsafe_allow_html=True)
+    return pd.DataFrame({'NoChip': decode_phone_numbers(missing_codes)})
 
-        # Kolom untuk scorecards (dibungkus dalam div container utama)
-        col1, col2, col3, col4 = st.columns(4)
 
-        with col1:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Transaksi Debit</div>
-                    <div class="metric-box">{linkaja_row_count_debit:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+@st.cache_data
+def get_full_missing_in_ngrs(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    linkaja_df, ngrs_df, alfred_df = load_detail_frames(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
 
-        with col2:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Transaksi Credit</div>
-                    <div class="metric-box">{linkaja_row_count_credit:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
+        st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
+        return pd.DataFrame()
 
-        with col3:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Transaksi OutCluster</div>
-                    <div class="metric-box">{alfred_row_count:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    try:
+        rs_codes, chip_codes = detail_number_codes(linkaja_df, ngrs_df, alfred_df)
+    except KeyError as e:
+        st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
+        return pd.DataFrame()
 
-        with col4:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Transaksi Reversal</div>
-                    <div class="metric-box">{alfred_reversal_row_count:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    missing_codes = difference_codes(rs_codes, chip_codes)
 
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+    if len(missing_codes) == 0:
+        return pd.DataFrame()
 
-        # Divider antar grup
-        st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+    combined_df = pd.concat([linkaja_df, alfred_df])
+    full_missing_data = combined_df[contains_codes(missing_codes, encode_phone_numbers(combined_df['NoRS']))]
 
-        # Grup 2: Nilai Transaksi LinkAja dengan border (sesuai desain grup 1)
-        st.markdown("<div class='group-header-font'>Nilai Transaksi LinkAja (Rp)</div>", unsafe_allow_html=True)
+    return full_missing_data
 
-        # Kolom untuk scorecards
-        col5, col6, col7, col8 = st.columns(4)
 
-        with col5:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Nilai Debit</div>
-                    <div class="metric-box">Rp {format_rupiah(linkaja_total_debit)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+@st.cache_data
+def get_full_missing_in_linkaja(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    linkaja_df, ngrs_df, alfred_df = load_detail_frames(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
 
-        with col6:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Nilai Credit</div>
-                    <div class="metric-box">Rp {format_rupiah(linkaja_total_credit)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
+        st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
+        return pd.DataFrame()
 
-        with col7:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Nilai OutCluster</div>
-                    <div class="metric-box">Rp {format_rupiah(alfred_total_amount)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    try:
+        rs_codes, chip_codes = detail_number_codes(linkaja_df, ngrs_df, alfred_df)
+    except KeyError as e:
+        st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
+        return pd.DataFrame()
 
-        with col8:
-            st.markdown(
-                f"""
-                <div class="scorecard linkaja-group">
-                    <div class="metric-label">Total Nilai Reversal</div>
-                    <div class="metric-box">Rp {format_rupiah(alfred_reversal_total_amount)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    missing_codes = difference_codes(chip_codes, rs_codes)
 
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+    if len(missing_codes) == 0:
+        return pd.DataFrame()
 
-        # Divider antar grup
-        st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+    full_missing_data = ngrs_df[contains_codes(missing_codes, encode_phone_numbers(ngrs_df['NoChip']))]
 
-        # Grup 3: Transaksi & Nilai Finpay dengan border (sesuai desain grup 1)
-        st.markdown("<div class='group-header-font'>Transaksi & Nilai Finpay</div>", unsafe_allow_html=True)
+    return full_missing_data
 
-        # Kolom untuk scorecards
-        col12, col13 = st.columns(2)
+# Fungsi untuk nomor RS dari potongan mentah LinkAja/Alfred (normalisasi 62... dilakukan saat enkode)
+def counterparty_numbers(df):
+    if 'CounterParty' in df.columns:
+        return extract_leading_number(df['CounterParty'])
+    return pd.Series(index=df.index, dtype=object)
 
-        with col12:
-            st.markdown(
-                f"""
-                <div class="scorecard finpay-group">
-                    <div class="metric-label">Total Transaksi Finpay</div>
-                    <div class="metric-box">{total_trx_finpay:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+# Fungsi untuk NoChip dari potongan mentah NGRS
+def chip_numbers(df):
+    if 'NoChip' in df.columns:
+        return df['NoChip']
+    return pd.Series(index=df.index, dtype=object)
 
-        with col13:
-            st.markdown(
-                f"""
-                <div class="scorecard finpay-group">
-                    <div class="metric-label">Nilai Transaksi Finpay</div>
-                    <div class="metric-box">Rp {format_rupiah(nilai_trx_finpay)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+EMPTY_RECONCILIATION = {
+    "missing_in_ngrs": pd.DataFrame(),
+    "missing_in_linkaja": pd.DataFrame(),
+    "full_missing_in_ngrs": pd.DataFrame(),
+    "full_missing_in_linkaja": pd.DataFrame(),
+}
 
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+# Fungsi rekonsiliasi streaming (keempat tabel sekaligus). Potongan ekstrak dibaca satu per satu:
+# pass pertama membangun himpunan nomor unik per sumber, pass kedua hanya menyiapkan baris detail
+# untuk nomor yang hilang. Memori puncak: himpunan nomor + satu potongan + baris hasil.
+@st.cache_data
+def get_reconciliation_streaming(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    if get_bigquery_client() is None:
+        return EMPTY_RECONCILIATION
+    try:
+        linkaja_paths = extract_linkaja_detail(date_ranges, selected_cluster_ids)
+        ngrs_paths = extract_ngrs_detail(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+        alfred_paths = extract_alfred_detail(date_ranges, selected_cluster_ids)
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat mengambil data detail untuk rekonsiliasi: {e}")
+        return EMPTY_RECONCILIATION
 
-        # Divider antar grup
-        st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+    rs_codes = union_codes(
+        collect_numbers(iter_extract(linkaja_paths), counterparty_numbers),
+        collect_numbers(iter_extract(alfred_paths), counterparty_numbers)
+    )
+    chip_codes = collect_numbers(iter_extract(ngrs_paths), chip_numbers)
 
-        # Grup 4: Transaksi dan Nilai NGRS dengan border (sesuai desain grup 1)
-        st.markdown("<div class='group-header-font'>Transaksi & Nilai NGRS</div>", unsafe_allow_html=True)
+    missing_in_ngrs = difference_codes(rs_codes, chip_codes)
+    missing_in_linkaja = difference_codes(chip_codes, rs_codes)
+    del rs_codes, chip_codes
 
-        # Kolom untuk scorecards
-        col9, col10, col11 = st.columns(3)
+    full_missing_in_ngrs = collect_rows(
+        rows
+        for paths in (linkaja_paths, alfred_paths)
+        for rows in iter_matching_rows(iter_extract(paths), counterparty_numbers, missing_in_ngrs, prepare_counterparty_detail)
+    )
+    full_missing_in_linkaja = collect_rows(
+        iter_matching_rows(iter_extract(ngrs_paths), chip_numbers, missing_in_linkaja, prepare_ngrs_detail)
+    )
+    return {
+        "missing_in_ngrs": pd.DataFrame({"NoRS": decode_phone_numbers(missing_in_ngrs)}) if len(missing_in_ngrs) else pd.DataFrame(),
+        "missing_in_linkaja": pd.DataFrame({"NoChip": decode_phone_numbers(missing_in_linkaja)}) if len(missing_in_linkaja) else pd.DataFrame(),
+        "full_missing_in_ngrs": full_missing_in_ngrs,
+        "full_missing_in_linkaja": full_missing_in_linkaja,
+    }
+
+# Fungsi untuk hasil rekonsiliasi per tabel: dari hasil streaming jika ada, selain itu via pandas
+def reconciliation_result(reconciliation, name, date_ranges, selected_cluster_ids, selected_transaction_types_ngrs):
+    if reconciliation is not None:
+        return reconciliation[name]
+    compute = {
+        "missing_in_ngrs": get_missing_numbers_in_ngrs,
+        "missing_in_linkaja": get_missing_numbers_in_linkaja,
+        "full_missing_in_ngrs": get_full_missing_in_ngrs,
+        "full_missing_in_linkaja": get_full_missing_in_linkaja,
+    }[name]
+    return compute(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+
+# Fungsi untuk menampilkan analisis transaksi anomali (rekonsiliasi LinkAja/Alfred vs NGRS)
+def render_anomaly_analysis(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs, streaming=False):
+    reconciliation = None
+    if streaming:
+        with st.spinner("Menjalankan rekonsiliasi streaming..."):
+            reconciliation = get_reconciliation_streaming(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+
+    # Streamlit app - Analisis NoChip (dibawah timeseries plots)
+    st.markdown("---")
+    st.markdown(
+                """
+                <style>
+                    .title-box {
+                        text-align: center;
+                        padding: 15px;
+                        background-color: white;
+                        border-radius: 10px;
+                        box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
+                        margin-bottom: 20px;
+                        font-size: 20px;
+                        font-weight: bold;
+                        color: #333;
+                    }
+                </style>
 
-        with col9:
-            st.markdown(
-                f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total Transaksi NGRS</div>
-                    <div class="metric-box">{all_row_count:,}</div>
+                <div class="title-box">
+                    Analisis Transaksi Anomali
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-        with col10:
-            st.markdown(
-                f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total Nilai Denom NGRS</div>
-                    <div class="metric-box">Rp {format_rupiah(all_total_spend)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    st.markdown("<div class='group-header'>Chip Data LinkAja yang Tidak Ada di Data NGRS</div>", unsafe_allow_html=True)
 
-        with col11:
-            st.markdown(
-                f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total NGRS * TP</div>
-                    <div class="metric-box">Rp {format_rupiah(total_tp)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    with st.spinner("Menghitung total NoChip yang hilang di NGRS..."):
+        result_df_ngrs = reconciliation_result(reconciliation, "missing_in_ngrs", date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+        total_missing_norchip = len(result_df_ngrs) if not result_df_ngrs.empty else 0
 
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+    with st.container():
+        # Styling tambahan untuk keterangan (opsional, jika ingin konsisten dengan desain Anda)
+        st.markdown(
+            """
+            <style>
+            .info-message {
+                margin-bottom: 10px;
+                padding: 10px;
+                background-color: #f0f8ff;
+                border-radius: 8px;
+                box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+                text-align: center;
+            }
+            </style>
+            """,
+            unsafe_allow_html=True
+        )
 
-        st.markdown("<div class='group-header-font'>Transaksi & Nilai Akuisisi</div>", unsafe_allow_html=True)
+        with st.spinner("Menyiapkan data missing in NGRS..."):
+            result_df_ngrs = reconciliation_result(reconciliation, "missing_in_ngrs", date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+            total_missing_numbers = len(result_df_ngrs) if not result_df_ngrs.empty else 0
 
-        # Kolom untuk scorecards (2 kolom)
-        col12, col13 = st.columns(2)
-        
-        with col12:
-            st.markdown(
-                f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total Transaksi Akuisisi</div>
-                    <div class="metric-box">{total_trx_acquisition:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-        
-        with col13:
-            st.markdown(
-                f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total Nilai Akuisisi</div>
-                    <div class="metric-box">Rp {format_rupiah(total_amount_acquisition)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
+            if not result_df_ngrs.empty:
+                st.success(f"Data ditemukan! Berikut adalah nomor dari LinkAja/Alfred yang tidak ada di NGRS Data: ({total_missing_numbers} nomor ditemukan)")
+                st.dataframe(result_df_ngrs)
+            else:
+                st.warning("Tidak ada nomor yang hilang di NGRS.")
+
+        # Tabel tambahan pertama: Data lengkap dari nomor yang hilang di NGRS
+        st.markdown("<div class='group-header'>Data Transaksi Chip LinkAja yang Tidak ada di NGRS</div>", unsafe_allow_html=True)
+
+    # Tabel tambahan pertama: Data lengkap dari nomor yang hilang di NGRS
+
+
+    with st.spinner("Menyiapkan data lengkap missing in NGRS..."):
+        full_df_ngrs = reconciliation_result(reconciliation, "full_missing_in_ngrs", date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+        if not full_df_ngrs.empty:
+            st.success("Data lengkap ditemukan untuk nomor yang tidak ada di NGRS:")
+            st.dataframe(full_df_ngrs)
+            excel_data_ngrs = to_excel(full_df_ngrs)
+            st.download_button(
+                label="Unduh Data Lengkap Missing in NGRS (Excel)",
+                data=excel_data_ngrs,
+                file_name=f"Full_Missing_in_NGRS_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
-        
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+        else:
+            st.warning("Tidak ada data lengkap untuk nomor yang hilang di NGRS.")
 
+    # Tabel kedua: Nomor dari NGRS yang tidak ada di LinkAja/Alfred (hanya nomor)
 
-        # Grup Baru: Transaksi & Nilai Roaming
-        st.markdown("<div class='group-header-font'>Transaksi & Nilai Roaming</div>", unsafe_allow_html=True)
-        col20, col21 = st.columns(2)
-        with col20:
-            st.markdown(f'<div class="scorecard ngrs-group"><div class="metric-label">Total Transaksi Roaming</div><div class="metric-box">{total_trx_roaming:,}</div></div>', unsafe_allow_html=True)
-        with col21:
-            st.markdown(f'<div class="scorecard ngrs-group"><div class="metric-label">Total Nilai Roaming</div><div class="metric-box">Rp {format_rupiah(total_amount_roaming)}</div></div>', unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-        st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+    st.markdown("<div class='group-header'>Chip Data NGRS yang Tidak Ada di Data LinkAja</div>", unsafe_allow_html=True)
 
+    with st.spinner("Menyiapkan data missing in LinkAja/Alfred..."):
+        result_df_linkaja = reconciliation_result(reconciliation, "missing_in_linkaja", date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+        if not result_df_linkaja.empty:
+            st.success("Data ditemukan! Berikut adalah nomor dari NGRS yang tidak ada di LinkAja/Alfred:")
+            st.dataframe(result_df_linkaja)
+        else:
+            st.warning("Tidak ada nomor dari NGRS yang hilang di LinkAja/Alfred.")
 
-        # Divider antar grup
-        st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
-        # Grup 5: Ringkasan Tambahan dengan border (sesuai desain grup 1)
-        st.markdown("<div class='group-header-font'>Total Transaksi NGRS & LinkAja</div>", unsafe_allow_html=True)
+    st.markdown("<div class='group-header'>Data Transaksi Chip NGRS yang Tidak ada di LinkAja</div>", unsafe_allow_html=True)
+    # Tabel tambahan kedua: Data lengkap dari nomor NGRS yang hilang di LinkAja/Alfred
+    with st.spinner("Menghitung total transaksi dan nilai NoChip hilang di LinkAja/Alfred..."):
+        full_df_linkaja = reconciliation_result(reconciliation, "full_missing_in_linkaja", date_ranges, selected_cluster_ids, selected_transaction_types_ngrs)
+        total_transactions_missing = len(full_df_linkaja) if not full_df_linkaja.empty else 0
+        total_value_missing = full_df_linkaja['SpendAmount'].sum() if not full_df_linkaja.empty and 'SpendAmount' in full_df_linkaja.columns else 0
 
-        # Baris pertama: 2 kolom
-        col14, col15 = st.columns(2)
+    with st.container():
+        st.markdown("""<div class="linkaja-missing-scorecard-container">""", unsafe_allow_html=True)
 
-        with col14:
-            st.markdown(
-                f"""
-                <div class="scorecard summary-group">
-                    <div class="metric-label">Total Transaksi LinkAja + Finpay</div>
-                    <div class="metric-box">{total_transaksi_linkaja:,}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-
-        with col15:
+        col1, col2 = st.columns(2)
+        with col1:
             st.markdown(
                 f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total Transaksi NGRS</div>
-                    <div class="metric-box">{all_row_count:,}</div>
+                <div class="linkaja-missing-scorecard">
+                    <div class="linkaja-missing-metric-label">Total Transaksi</div>
+                    <div class="linkaja-missing-metric-value">{total_transactions_missing:,}</div>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-        # Baris kedua: 2 kolom
-        col16, col17 = st.columns(2)
-
-        with col16:
+        with col2:
             st.markdown(
                 f"""
-                <div class="scorecard summary-group">
-                    <div class="metric-label">Total Nilai Transaksi LinkAja + Finpay</div>
-                    <div class="metric-box">Rp {format_rupiah(total_nilai_transaksi_ngrs)}</div>
+                <div class="linkaja-missing-scorecard">
+                    <div class="linkaja-missing-metric-label">Total Nilai Transaksi </div>
+                    <div class="linkaja-missing-metric-value"> {format_rupiah(total_value_missing)}</div>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-        with col17:
-            st.markdown(
-                f"""
-                <div class="scorecard ngrs-group">
-                    <div class="metric-label">Total NGRS * TP</div>
-                    <div class="metric-box">Rp {format_rupiah(total_tp)}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        st.markdown("""</div>""", unsafe_allow_html=True)
 
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
-        st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
-
-        # Tampilkan tabel per cluster jika ada tepat 6 cluster yang dipilih
-        if len(selected_cluster_ids) <= 6:
-            st.markdown("---")
-            st.markdown("<h3 style='text-align: center;'>Summary Per Cluster</h3>", unsafe_allow_html=True)
-            st.markdown("<br>", unsafe_allow_html=True)
-
-            # Buat DataFrame untuk tabel
-            cluster_data = {
-                "Cluster ID": selected_cluster_ids,
-                "Total Transaksi LinkAja Debit": [all_metrics[cluster]['linkaja_row_count_debit'] for cluster in selected_cluster_ids],
-                "Total Transaksi LinkAja Credit": [all_metrics[cluster]['linkaja_row_count_credit'] for cluster in selected_cluster_ids],
-                "Total Transaksi NGRS": [all_metrics[cluster]['all_row_count'] for cluster in selected_cluster_ids],
-                "Total Transaksi LinkAja OutCluster": [all_metrics[cluster]['alfred_row_count'] for cluster in selected_cluster_ids],
-                "Total Transaksi LinkAja Reversal": [all_metrics[cluster]['alfred_reversal_row_count'] for cluster in selected_cluster_ids],
-                "Total Nilai (Rp) LinkAja Debit": [f"Rp {format_rupiah(all_metrics[cluster]['linkaja_total_debit'])}" for cluster in selected_cluster_ids],
-                "Total Nilai (Rp) LinkAja Credit": [f"Rp {format_rupiah(all_metrics[cluster]['linkaja_total_credit'])}" for cluster in selected_cluster_ids],
-                "Total Nilai Denom NGRS": [f" {format_rupiah(all_metrics[cluster]['all_total_spend'])}" for cluster in selected_cluster_ids],
-                "Total Nilai (Rp) LinkAja Outcluster": [f"Rp {format_rupiah(all_metrics[cluster]['alfred_total_amount'])}" for cluster in selected_cluster_ids],
-                "Total Nilai (Rp) LinkAja Reversal": [f"Rp {format_rupiah(all_metrics[cluster]['alfred_reversal_total_amount'])}" for cluster in selected_cluster_ids],
-                "Total Transaksi LinkAja": [all_metrics[cluster]['total_transaksi_linkaja'] for cluster in selected_cluster_ids],
-                "Total Transaksi NGRS": [all_metrics[cluster]['all_row_count'] for cluster in selected_cluster_ids],
-                "Total Nilai Transaksi LinkAja": [f"Rp {format_rupiah(all_metrics[cluster]['total_nilai_transaksi_ngrs'])}" for cluster in selected_cluster_ids],
-                "Total Nilai Denom NGRS": [f"Rp {format_rupiah(all_metrics[cluster]['all_total_spend'])}" for cluster in selected_cluster_ids],
-                "Fee": [f"Rp {format_rupiah(all_metrics[cluster]['fee'])}" for cluster in selected_cluster_ids],
-                "Total Transaksi Akuisisi": [all_metrics[cluster]['total_trx_acquisition'] for cluster in selected_cluster_ids],
-                "Total Nilai Akuisisi": [f"Rp {format_rupiah(all_metrics[cluster]['total_amount_acquisition'])}" for cluster in selected_cluster_ids],
-                "Total Nilai Roaming": [f"Rp {format_rupiah(all_metrics[cluster]['total_amount_roaming'])}" for cluster in selected_cluster_ids]
-            }
-            df_cluster = pd.DataFrame(cluster_data)
-
-            # Tampilkan tabel
-            st.dataframe(df_cluster, use_container_width=True)
-
-        def normalize_phone_number(number):
-            if pd.isna(number):  # Handle NaN
-                return None
-            number = str(number).strip()  # Konversi ke string dan hapus spasi
-            if number.startswith('8'):  # Jika dimulai dengan 8 atau 6, tambahkan 62
-                return '62' + number
-            else:  # Jika tidak dimulai dengan 8 atau 6, kembalikan nomor asli tanpa perubahan
-                return number
-        
-        st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
-        st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
+        st.markdown(
 
-        with st.spinner("Menyiapkan data untuk Excel dan grafik..."):
-            # Fungsi untuk mengambil data harian
-            daily_summary_df = fetch_daily_summary(
-                start_date=start_date,
-                end_date=end_date,
-                selected_transaction_types_ngrs=selected_transaction_types_ngrs,
-                selected_cluster_ids=selected_cluster_ids
-            )
-            
-            if not daily_summary_df.empty:
-                # Tampilkan preview tabel
-                st.markdown('</div>', unsafe_allow_html=True)
-                st.markdown(
-                    """
-                    <style>
-                        .title-box {
-                            text-align: center;
-                            padding: 15px;
-                            background-color: white;
-                            border-radius: 10px;
-                            box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
-                            margin-bottom: 20px;
-                            font-size: 20px;
-                            font-weight: bold;
-                            color: #333;
-                        }
-                    </style>
-        
-                    <div class="title-box">
-                        Preview Summary
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-                st.markdown(
-                    """
-                    <style>
-                    .centered-dataframe {
-                        display: flex;
-                        justify-content: center;
-                        margin-bottom: 20px;
-                    }
-                    .centered-dataframe div[data-testid="stDataFrame"] {
-                        width: 80%; /* Lebar maksimum untuk tetap responsif */
-                        max-width: 1200px; /* Batas maksimum untuk mencegah terlalu lebar */
-                    }
-                    </style>
-                    """,
-                    unsafe_allow_html=True
-                )
-        
-                # Tampilkan preview tabel di tengah
-                with st.container():
-                    st.markdown('<div class="centered-dataframe">', unsafe_allow_html=True)
-                    st.dataframe(daily_summary_df)
-                    st.markdown('</div>', unsafe_allow_html=True)
-            
-                
-                # Salin DataFrame tanpa format Rupiah
-                df_for_excel = daily_summary_df.copy()
-                
-                # Pastikan kolom numerik tetap dalam format angka (tanpa formatting)
-                kolom_numerik = [
-                    'Total_Nilai_Denom_NGRS',
-                    'Total_TP_NGRS',
-                    'Total_Nilai_Transaksi_LinkAja',
-                    'Total_Nilai_Finpay',
-                    'Total_Nilai_Akuisisi',
-                    'Total_Nilai_Roaming'
-                ]
-
-                # Konversi kolom ke tipe numerik (jika belum)
-                for kolom in kolom_numerik:
-                    df_for_excel[kolom] = pd.to_numeric(df_for_excel[kolom], errors='coerce')
-                
-                # Buat buffer untuk menyimpan file Excel
-                output = io.BytesIO()
-                
-                # Generate Excel file
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_for_excel.to_excel(writer, index=False)
-                
-                # Ambil data dari buffer
-                excel_data = output.getvalue()
-                
-                # Tombol download
-                st.download_button(
-                    label="Unduh Summary Harian (Excel)",
-                    data=excel_data,
-                    file_name=f"Daily_Summary_{start_date}_to_{end_date}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-        
-                st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
-                st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
-        
-                # Buat timeseries plots menggunakan Plotly
-                st.markdown(
-                    """
-                    <style>
-                        .title-box {
-                            text-align: center;
-                            padding: 15px;
-                            background-color: white;
-                            border-radius: 10px;
-                            box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
-                            margin-bottom: 20px;
-                            font-size: 20px;
-                            font-weight: bold;
-                            color: #333;
-                        }
-                    </style>
-        
-                    <div class="title-box">
-                        Timeseries Plot
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-        
-                # Plot 1: Total Transaksi NGRS dan Total Transaksi LinkAja (Kiri)
-                fig1 = go.Figure()
-                fig1.add_trace(go.Scatter(x=daily_summary_df['Date'], y=daily_summary_df['Total_Transaksi_NGRS'], mode='lines+markers', name='Total Transaksi NGRS', line=dict(color='green')))
-                fig1.add_trace(go.Scatter(x=daily_summary_df['Date'], y=daily_summary_df['Total_Transaksi_LinkAja'], mode='lines+markers', name='Total Transaksi LinkAja', line=dict(color='blue')))
-                fig1.add_trace(go.Scatter(x=daily_summary_df['Date'], y=daily_summary_df['Total_Transaksi_Finpay'], mode='lines+markers', name='Total Transaksi Finpay', line=dict(color='cyan')))
-                fig1.update_layout(
-                    title='Total Transaksi NGRS vs LinkAja vs Finpay',
-                    xaxis_title='Tanggal',
-                    yaxis_title='Jumlah Transaksi',
-                    template='plotly_white'
-                )
-        
-                # Plot 2: Total TP NGRS dan Total Nilai Transaksi LinkAja (Kanan)
-                fig2 = go.Figure()
-                fig2.add_trace(go.Scatter(x=daily_summary_df['Date'], y=daily_summary_df['Total_TP_NGRS'], mode='lines+markers', name='Total TP NGRS', line=dict(color='purple')))
-                fig2.add_trace(go.Scatter(x=daily_summary_df['Date'], y=daily_summary_df['Total_Nilai_Transaksi_LinkAja'], mode='lines+markers', name='Total Nilai Transaksi LinkAja', line=dict(color='orange')))
-                fig2.add_trace(go.Scatter(x=daily_summary_df['Date'], y=daily_summary_df['Total_Nilai_Finpay'], mode='lines+markers', name='Total Nilai Finpay', line=dict(color='red')))
-                fig2.update_layout(
-                    title='Total TP NGRS vs Nilai Transaksi LinkAja vs Finpay',
-                    xaxis_title='Tanggal',
-                    yaxis_title='Nilai (Rp)',
-                    template='plotly_white'
-                )
-        
-                # Tampilkan plot berdampingan menggunakan container CSS
-                st.markdown("<div class='plot-container'>", unsafe_allow_html=True)
-                st.plotly_chart(fig1, use_container_width=True)
-                st.plotly_chart(fig2, use_container_width=True)
-                st.markdown("</div>", unsafe_allow_html=True)
-            else:
-                st.warning("Tidak ada data untuk periode yang dipilih.")
-
-        # Fungsi untuk mengambil data detail dari masing-masing tabel dengan filter
-        def fetch_linkaja_data():
-            client = get_bigquery_client()
-            if client is None:
-                return pd.DataFrame()
-            
-            query = f"""
-            SELECT *
-            FROM `alfred-analytics-406004.analytics_alfred.linkaja_Digipos_B2B_tf_Cluster`
-            WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-            AND (CAST(Credit AS FLOAT64) != 0)
-            """
-            df = client.query(query).to_dataframe()
-            
-            if 'CounterParty' in df.columns:
-                def extract_first_number(text):
-                    if pd.isna(text):
-                        return None
-                    match = re.match(r'(\d+)', str(text))
-                    return match.group(1) if match else None
-                df['NoRS'] = df['CounterParty'].apply(extract_first_number)
-            
-            if 'NoRS' in df.columns:
-                df['NoRS'] = df['NoRS'].apply(normalize_phone_number)
-            
-            for col in df.columns:
-                dtype_str = str(df[col].dtype).lower()
-                if 'date' in dtype_str or dtype_str.startswith('db_dtypes'):
-                    df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
-                    df[col] = df[col].where(df[col].notna(), None)
-                elif dtype_str in ['int64', 'int32', 'uint64', 'uint32', 'float64', 'float32']:
-                    df[col] = df[col].where(df[col].notna(), None)
-                elif dtype_str == 'bool':
-                    df[col] = df[col].where(df[col].notna(), False)
-                else:
-                    df[col] = df[col].fillna('')
-            return df
-
-        def fetch_ngrs_data():
-            client = get_bigquery_client()
-            if client is None:
-                return pd.DataFrame()
-            
-            query = f"""
-            SELECT *
-            FROM `alfred-analytics-406004.analytics_alfred.All_pjpnonpjp`
-            WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-            AND TransactionType IN ({', '.join([f"'{ttype}'" for ttype in selected_transaction_types_ngrs])})
             """
-            df = client.query(query).to_dataframe()
-            
-            if 'NoChip' in df.columns:
-                df['NoChip'] = df['NoChip'].apply(normalize_phone_number)
-            
-            for col in df.columns:
-                dtype_str = str(df[col].dtype).lower()
-                if 'date' in dtype_str or dtype_str.startswith('db_dtypes'):
-                    df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
-                    df[col] = df[col].where(df[col].notna(), None)
-                elif dtype_str in ['int64', 'int32', 'uint64', 'uint32', 'float64', 'float32']:
-                    df[col] = df[col].where(df[col].notna(), None)
-                elif dtype_str == 'bool':
-                    df[col] = df[col].where(df[col].notna(), False)
-                else:
-                    df[col] = df[col].fillna('')
-            return df
-
-        def fetch_alfred_data():
-            client = get_bigquery_client()
-            if client is None:
-                return pd.DataFrame()
-            
-            query = f"""
-            SELECT *
-            FROM `alfred-analytics-406004.analytics_alfred.alfred_linkaja`
-            WHERE DATE(InitiateDate) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
-            AND ClusterID IN ({', '.join(map(str, selected_cluster_ids))})
-            AND (
-                (TransactionScenario = 'Digipos B2B Transfer' AND CAST(Credit AS FLOAT64) != 0)
-                OR TransactionScenario = 'Buy Goods Reversal for General Merchant'
+            <style>
+            .linkaja-missing-scorecard-container {
+                display: flex;
+                gap: 15px;
+                justify-content: center;
+                margin-bottom: 20px;
+            }
+            .linkaja-missing-scorecard {
+                background-color: #ffb5b5;
+                border-radius: 8px;
+                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+                padding: 15px;
+                flex: 1;
+                text-align: center;
+                min-width: 150px;
+                max-width: 250px;
+            }
+            .linkaja-missing-metric-label {
+                color: #666;
+                font-size: 14px;
+                margin-bottom: 5px;
+            }
+            .linkaja-missing-metric-value {
+                color: #333;
+                font-size: 18px;
+                font-weight: bold;
+            }
+            </style>
+            """,
+            unsafe_allow_html=True
+        )
+    # Tabel tambahan kedua: Data lengkap dari nomor NGRS yang hilang di LinkAja/Alfred
+
+    with st.spinner("Menyiapkan data lengkap missing in LinkAja/Alfred..."):
+        if not full_df_linkaja.empty:
+            st.success("Data lengkap ditemukan untuk nomor dari NGRS yang tidak ada di LinkAja/Alfred:")
+            st.dataframe(full_df_linkaja)
+            excel_data_linkaja = to_excel(full_df_linkaja)
+            st.download_button(
+                label="Unduh Data Lengkap Missing in LinkAja/Alfred (Excel)",
+                data=excel_data_linkaja,
+                file_name=f"Full_Missing_in_LinkAja_Alfred_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
-            """
-            df = client.query(query).to_dataframe()
-            
-            if 'CounterParty' in df.columns:
-                def extract_first_number(text):
-                    if pd.isna(text):
-                        return None
-                    match = re.match(r'(\d+)', str(text))
-                    return match.group(1) if match else None
-                df['NoRS'] = df['CounterParty'].apply(extract_first_number)
-            
-            if 'NoRS' in df.columns:
-                df['NoRS'] = df['NoRS'].apply(normalize_phone_number)
-            
-            for col in df.columns:
-                dtype_str = str(df[col].dtype).lower()
-                if 'date' in dtype_str or dtype_str.startswith('db_dtypes'):
-                    df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
-                    df[col] = df[col].where(df[col].notna(), None)
-                elif dtype_str in ['int64', 'int32', 'uint64', 'uint32', 'float64', 'float32']:
-                    df[col] = df[col].where(df[col].notna(), None)
-                elif dtype_str == 'bool':
-                    df[col] = df[col].where(df[col].notna(), False)
-                else:
-                    df[col] = df[col].fillna('')
-            return df
+        else:
+            st.warning("Tidak ada data lengkap untuk nomor dari NGRS yang hilang di LinkAja/Alfred.")
+
+# Fragment analisis anomali: pilihan cost gate, konfirmasi, dan tombol download hanya menjalankan ulang bagian ini
+@st.fragment
+def render_reconciliation_section(start_date, end_date, selected_cluster_ids, selected_transaction_types_ngrs, streaming):
+    with timed("Update analisis anomali"):
+        # Analisis anomali: ekstrak detail dicek dulu terhadap anggaran biaya halaman
+        policy, date_ranges = cost_gate(
+            "linkajaall", "reconciliation",
+            lambda chunk_start, chunk_end: build_detail_queries(chunk_start, chunk_end, selected_cluster_ids, selected_transaction_types_ngrs),
+            start_date, end_date
+        )
+        if policy is None:
+            st.info("Analisis transaksi anomali belum dijalankan. Pilih cara menjalankan dan konfirmasi di atas.")
+        else:
+            render_anomaly_analysis(date_ranges, selected_cluster_ids, selected_transaction_types_ngrs, streaming=streaming)
+
+# Fungsi untuk rentang tanggal tampilan default: "Per Hari" (hari ini) dan "Rentang Hari"
+def default_views():
+    today = datetime.now().date()
+    return [(today, today), (DEFAULT_START, today)]
+
+# Fungsi untuk memanaskan cache tampilan default (dipanggil oleh warmup.py).
+# Argumen harus sama persis dengan pemanggilan di main() agar kunci cache cocok.
+# Kubus metrik mencakup semua cluster dan TransactionType, jadi cukup dihangatkan per rentang tanggal.
+# Entri lama dibuang dulu (kubus tanpa TTL), agar tiap jadwal benar-benar memuat data terbaru.
+def warm_cache():
+    fetch_transaction_types("All_pjpnonpjp")
+    fetch_clusters("linkaja_Digipos_B2B_tf_Cluster", "ClusterID")
+    for view_start, view_end in default_views():
+        start_date = view_start.strftime('%Y-%m-%d')
+        end_date = view_end.strftime('%Y-%m-%d')
+        clear_metrics_cube(CUBE_SOURCES_LINKAJAALL, start_date, end_date)
+        load_metrics_cube(CUBE_SOURCES_LINKAJAALL, start_date, end_date)
+
+# Fungsi untuk scorecard jumlah dan nilai transaksi LinkAja (grup 1 dan 2)
+def render_linkaja_scorecards(totals):
+    # Grup 1: Transaksi LinkAja dengan border (seperti yang ada)
+    st.markdown("<div class='group-header-font'>Transaksi LinkAja</div>", unsafe_allow_html=True)
+
+    # Kolom untuk scorecards (dibungkus dalam div container utama)
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Transaksi Debit</div>
+                <div class="metric-box">{totals['linkaja_row_count_debit']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
+    with col2:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Transaksi Credit</div>
+                <div class="metric-box">{totals['linkaja_row_count_credit']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-        @st.cache_data
-        def get_missing_numbers_in_ngrs():
-            linkaja_df = fetch_linkaja_data()
-            ngrs_df = fetch_ngrs_data()
-            alfred_df = fetch_alfred_data()
-
-            if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
-                st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
-                return pd.DataFrame()
-
-            try:
-                combined_nors = pd.concat([linkaja_df['NoRS'], alfred_df['NoRS']]).drop_duplicates().dropna()
-            except KeyError as e:
-                st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
-                return pd.DataFrame()
-
-            if combined_nors.empty:
-                st.warning("Tidak ada data di kolom NoRS setelah penggabungan dan pembersihan.")
-                return pd.DataFrame()
+    with col3:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Transaksi OutCluster</div>
+                <div class="metric-box">{totals['alfred_row_count']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            ngrs_nochip = ngrs_df['NoChip'].drop_duplicates().dropna()
+    with col4:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Transaksi Reversal</div>
+                <div class="metric-box">{totals['alfred_reversal_row_count']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            if ngrs_nochip.empty:
-                st.warning("Tidak ada data di kolom NoChip setelah pembersihan.")
-                return pd.DataFrame()
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
 
-            missing_numbers = combined_nors[~combined_nors.isin(ngrs_nochip)]
+    # Divider antar grup
+    st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
-            if missing_numbers.empty:
-                st.info("Tidak ada nomor yang hilang ditemukan antara NoRS dan NoChip.")
-                return pd.DataFrame()
+    # Grup 2: Nilai Transaksi LinkAja dengan border (sesuai desain grup 1)
+    st.markdown("<div class='group-header-font'>Nilai Transaksi LinkAja (Rp)</div>", unsafe_allow_html=True)
 
-            return pd.DataFrame(missing_numbers, columns=['NoRS'])
+    # Kolom untuk scorecards
+    col5, col6, col7, col8 = st.columns(4)
 
+    with col5:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Nilai Debit</div>
+                <div class="metric-box">Rp {format_rupiah(totals['linkaja_total_debit'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-        @st.cache_data
-        def get_missing_numbers_in_linkaja():
-            linkaja_df = fetch_linkaja_data()
-            ngrs_df = fetch_ngrs_data()
-            alfred_df = fetch_alfred_data()
+    with col6:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Nilai Credit</div>
+                <div class="metric-box">Rp {format_rupiah(totals['linkaja_total_credit'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
-                st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
-                return pd.DataFrame()
+    with col7:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Nilai OutCluster</div>
+                <div class="metric-box">Rp {format_rupiah(totals['alfred_total_amount'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            try:
-                combined_nors = pd.concat([linkaja_df['NoRS'], alfred_df['NoRS']]).drop_duplicates().dropna()
-            except KeyError as e:
-                st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
-                return pd.DataFrame()
+    with col8:
+        st.markdown(
+            f"""
+            <div class="scorecard linkaja-group">
+                <div class="metric-label">Total Nilai Reversal</div>
+                <div class="metric-box">Rp {format_rupiah(totals['alfred_reversal_total_amount'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            if combined_nors.empty:
-                st.warning("Tidak ada data di kolom NoRS setelah penggabungan dan pembersihan.")
-                return pd.DataFrame()
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
 
-            ngrs_nochip = ngrs_df['NoChip'].drop_duplicates().dropna()
+    # Divider antar grup
+    st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
-            if ngrs_nochip.empty:
-                st.warning("Tidak ada data di kolom NoChip setelah pembersihan.")
-                return pd.DataFrame()
+# Fungsi untuk scorecard Finpay (grup 3)
+def render_finpay_scorecards(totals):
+    # Grup 3: Transaksi & Nilai Finpay dengan border (sesuai desain grup 1)
+    st.markdown("<div class='group-header-font'>Transaksi & Nilai Finpay</div>", unsafe_allow_html=True)
 
-            missing_numbers = ngrs_nochip[~ngrs_nochip.isin(combined_nors)]
+    # Kolom untuk scorecards
+    col12, col13 = st.columns(2)
 
-            if missing_numbers.empty:
-                st.info("Tidak ada nomor dari NGRS yang hilang di gabungan LinkAja/Alfred.")
-                return pd.DataFrame()
+    with col12:
+        st.markdown(
+            f"""
+            <div class="scorecard finpay-group">
+                <div class="metric-label">Total Transaksi Finpay</div>
+                <div class="metric-box">{totals['total_trx_finpay']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            return pd.DataFrame(missing_numbers, columns=['NoChip'])
+    with col13:
+        st.markdown(
+            f"""
+            <div class="scorecard finpay-group">
+                <div class="metric-label">Nilai Transaksi Finpay</div>
+                <div class="metric-box">Rp {format_rupiah(totals['nilai_trx_finpay'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
 
-        @st.cache_data
-        def get_full_missing_in_ngrs():
-            linkaja_df = fetch_linkaja_data()
-            ngrs_df = fetch_ngrs_data()
-            alfred_df = fetch_alfred_data()
+    # Divider antar grup
+    st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
-            if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
-                st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
-                return pd.DataFrame()
+# Fungsi untuk scorecard NGRS (grup 4)
+def render_ngrs_scorecards(totals):
+    # Grup 4: Transaksi dan Nilai NGRS dengan border (sesuai desain grup 1)
+    st.markdown("<div class='group-header-font'>Transaksi & Nilai NGRS</div>", unsafe_allow_html=True)
 
-            try:
-                combined_nors = pd.concat([linkaja_df['NoRS'], alfred_df['NoRS']]).drop_duplicates().dropna()
-            except KeyError as e:
-                st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
-                return pd.DataFrame()
+    # Kolom untuk scorecards
+    col9, col10, col11 = st.columns(3)
 
-            ngrs_nochip = ngrs_df['NoChip'].drop_duplicates().dropna()
+    with col9:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total Transaksi NGRS</div>
+                <div class="metric-box">{totals['all_row_count']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            missing_numbers = combined_nors[~combined_nors.isin(ngrs_nochip)]
+    with col10:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total Nilai Denom NGRS</div>
+                <div class="metric-box">Rp {format_rupiah(totals['all_total_spend'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            if missing_numbers.empty:
-                return pd.DataFrame()
+    with col11:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total NGRS * TP</div>
+                <div class="metric-box">Rp {format_rupiah(totals['total_tp'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            combined_df = pd.concat([linkaja_df, alfred_df])
-            full_missing_data = combined_df[combined_df['NoRS'].isin(missing_numbers)]
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
 
-            return full_missing_data
+# Fungsi untuk scorecard Akuisisi
+def render_acquisition_scorecards(totals):
+    st.markdown("<div class='group-header-font'>Transaksi & Nilai Akuisisi</div>", unsafe_allow_html=True)
 
+    # Kolom untuk scorecards (2 kolom)
+    col12, col13 = st.columns(2)
+    
+    with col12:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total Transaksi Akuisisi</div>
+                <div class="metric-box">{totals['total_trx_acquisition']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+    
+    with col13:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total Nilai Akuisisi</div>
+                <div class="metric-box">Rp {format_rupiah(totals['total_amount_acquisition'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+    
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup scorecard-container
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+
+# Fungsi untuk scorecard Roaming
+def render_roaming_scorecards(totals):
+    # Grup Baru: Transaksi & Nilai Roaming
+    st.markdown("<div class='group-header-font'>Transaksi & Nilai Roaming</div>", unsafe_allow_html=True)
+    col20, col21 = st.columns(2)
+    with col20:
+        st.markdown(f'<div class="scorecard ngrs-group"><div class="metric-label">Total Transaksi Roaming</div><div class="metric-box">{totals["total_trx_roaming"]:,}</div></div>', unsafe_allow_html=True)
+    with col21:
+        st.markdown(f'<div class="scorecard ngrs-group"><div class="metric-label">Total Nilai Roaming</div><div class="metric-box">Rp {format_rupiah(totals["total_amount_roaming"])}</div></div>', unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+
+    # Divider antar grup
+    st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+
+# Fungsi untuk scorecard total transaksi NGRS & LinkAja (grup 5)
+def render_overview_scorecards(totals):
+    # Grup 5: Ringkasan Tambahan dengan border (sesuai desain grup 1)
+    st.markdown("<div class='group-header-font'>Total Transaksi NGRS & LinkAja</div>", unsafe_allow_html=True)
+
+    # Baris pertama: 2 kolom
+    col14, col15 = st.columns(2)
+
+    with col14:
+        st.markdown(
+            f"""
+            <div class="scorecard summary-group">
+                <div class="metric-label">Total Transaksi LinkAja + Finpay</div>
+                <div class="metric-box">{totals['total_transaksi_linkaja']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-        @st.cache_data
-        def get_full_missing_in_linkaja():
-            linkaja_df = fetch_linkaja_data()
-            ngrs_df = fetch_ngrs_data()
-            alfred_df = fetch_alfred_data()
+    with col15:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total Transaksi NGRS</div>
+                <div class="metric-box">{totals['all_row_count']:,}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            if linkaja_df.empty or alfred_df.empty or ngrs_df.empty:
-                st.error("Salah satu atau semua DataFrame kosong. Periksa query, filter, atau koneksi BigQuery.")
-                return pd.DataFrame()
+    # Baris kedua: 2 kolom
+    col16, col17 = st.columns(2)
 
-            try:
-                combined_nors = pd.concat([linkaja_df['NoRS'], alfred_df['NoRS']]).drop_duplicates().dropna()
-            except KeyError as e:
-                st.error(f"Error: Kolom 'NoRS' tidak ditemukan. ({str(e)})")
-                return pd.DataFrame()
+    with col16:
+        st.markdown(
+            f"""
+            <div class="scorecard summary-group">
+                <div class="metric-label">Total Nilai Transaksi LinkAja + Finpay</div>
+                <div class="metric-box">Rp {format_rupiah(totals['total_nilai_transaksi_ngrs'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            ngrs_nochip = ngrs_df['NoChip'].drop_duplicates().dropna()
+    with col17:
+        st.markdown(
+            f"""
+            <div class="scorecard ngrs-group">
+                <div class="metric-label">Total NGRS * TP</div>
+                <div class="metric-box">Rp {format_rupiah(totals['total_tp'])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-            missing_numbers = ngrs_nochip[~ngrs_nochip.isin(combined_nors)]
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
+    st.markdown("</div>", unsafe_allow_html=True)  # Tutup group-container
 
-            if missing_numbers.empty:
-                return pd.DataFrame()
+# Fungsi untuk tabel ringkasan per cluster (hanya jika cluster terpilih <= 6)
+def render_cluster_table(all_metrics, selected_cluster_ids):
+    # Tampilkan tabel per cluster jika ada tepat 6 cluster yang dipilih
+    if len(selected_cluster_ids) <= 6:
+        st.markdown("---")
+        st.markdown("<h3 style='text-align: center;'>Summary Per Cluster</h3>", unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        # Buat DataFrame untuk tabel
+        cluster_data = {
+            "Cluster ID": selected_cluster_ids,
+            "Total Transaksi LinkAja Debit": [all_metrics[cluster]['linkaja_row_count_debit'] for cluster in selected_cluster_ids],
+            "Total Transaksi LinkAja Credit": [all_metrics[cluster]['linkaja_row_count_credit'] for cluster in selected_cluster_ids],
+            "Total Transaksi NGRS": [all_metrics[cluster]['all_row_count'] for cluster in selected_cluster_ids],
+            "Total Transaksi LinkAja OutCluster": [all_metrics[cluster]['alfred_row_count'] for cluster in selected_cluster_ids],
+            "Total Transaksi LinkAja Reversal": [all_metrics[cluster]['alfred_reversal_row_count'] for cluster in selected_cluster_ids],
+            "Total Nilai (Rp) LinkAja Debit": [f"Rp {format_rupiah(all_metrics[cluster]['linkaja_total_debit'])}" for cluster in selected_cluster_ids],
+            "Total Nilai (Rp) LinkAja Credit": [f"Rp {format_rupiah(all_metrics[cluster]['linkaja_total_credit'])}" for cluster in selected_cluster_ids],
+            "Total Nilai Denom NGRS": [f" {format_rupiah(all_metrics[cluster]['all_total_spend'])}" for cluster in selected_cluster_ids],
+            "Total Nilai (Rp) LinkAja Outcluster": [f"Rp {format_rupiah(all_metrics[cluster]['alfred_total_amount'])}" for cluster in selected_cluster_ids],
+            "Total Nilai (Rp) LinkAja Reversal": [f"Rp {format_rupiah(all_metrics[cluster]['alfred_reversal_total_amount'])}" for cluster in selected_cluster_ids],
+            "Total Transaksi LinkAja": [all_metrics[cluster]['total_transaksi_linkaja'] for cluster in selected_cluster_ids],
+            "Total Transaksi NGRS": [all_metrics[cluster]['all_row_count'] for cluster in selected_cluster_ids],
+            "Total Nilai Transaksi LinkAja": [f"Rp {format_rupiah(all_metrics[cluster]['total_nilai_transaksi_ngrs'])}" for cluster in selected_cluster_ids],
+            "Total Nilai Denom NGRS": [f"Rp {format_rupiah(all_metrics[cluster]['all_total_spend'])}" for cluster in selected_cluster_ids],
+            "Fee": [f"Rp {format_rupiah(all_metrics[cluster]['fee'])}" for cluster in selected_cluster_ids],
+            "Total Transaksi Akuisisi": [all_metrics[cluster]['total_trx_acquisition'] for cluster in selected_cluster_ids],
+            "Total Nilai Akuisisi": [f"Rp {format_rupiah(all_metrics[cluster]['total_amount_acquisition'])}" for cluster in selected_cluster_ids],
+            "Total Nilai Roaming": [f"Rp {format_rupiah(all_metrics[cluster]['total_amount_roaming'])}" for cluster in selected_cluster_ids]
+        }
+        df_cluster = pd.DataFrame(cluster_data)
 
-            full_missing_data = ngrs_df[ngrs_df['NoChip'].isin(missing_numbers)]
+        # Tampilkan tabel
+        st.dataframe(df_cluster, use_container_width=True)
 
-            return full_missing_data
+    st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
+    st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
 
-        # Streamlit app - Analisis NoChip (dibawah timeseries plots)
-        st.markdown("---")
+# Fungsi untuk preview ringkasan harian, unduhan Excel, dan grafik timeseries
+def render_daily_summary(daily_summary_df, start_date, end_date):
+    if not daily_summary_df.empty:
+        # Tampilkan preview tabel
+        st.markdown('</div>', unsafe_allow_html=True)
         st.markdown(
-                    """
-                    <style>
-                        .title-box {
-                            text-align: center;
-                            padding: 15px;
-                            background-color: white;
-                            border-radius: 10px;
-                            box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
-                            margin-bottom: 20px;
-                            font-size: 20px;
-                            font-weight: bold;
-                            color: #333;
-                        }
-                    </style>
-
-                    <div class="title-box">
-                        Analisis Transaksi Anomali
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-        
-        st.markdown("<div class='group-header'>Chip Data LinkAja yang Tidak Ada di Data NGRS</div>", unsafe_allow_html=True)
-
-        with st.spinner("Menghitung total NoChip yang hilang di NGRS..."):
-            result_df_ngrs = get_missing_numbers_in_ngrs()
-            total_missing_norchip = len(result_df_ngrs) if not result_df_ngrs.empty else 0
-
-        with st.container():
-            # Styling tambahan untuk keterangan (opsional, jika ingin konsisten dengan desain Anda)
-            st.markdown(
-                """
-                <style>
-                .info-message {
-                    margin-bottom: 10px;
-                    padding: 10px;
-                    background-color: #f0f8ff;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+            """
+            <style>
+                .title-box {
                     text-align: center;
+                    padding: 15px;
+                    background-color: white;
+                    border-radius: 10px;
+                    box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
+                    margin-bottom: 20px;
+                    font-size: 20px;
+                    font-weight: bold;
+                    color: #333;
                 }
-                </style>
-                """,
-                unsafe_allow_html=True
-            )
-
-            with st.spinner("Menyiapkan data missing in NGRS..."):
-                result_df_ngrs = get_missing_numbers_in_ngrs()
-                total_missing_numbers = len(result_df_ngrs) if not result_df_ngrs.empty else 0
+            </style>
 
-                if not result_df_ngrs.empty:
-                    st.success(f"Data ditemukan! Berikut adalah nomor dari LinkAja/Alfred yang tidak ada di NGRS Data: ({total_missing_numbers} nomor ditemukan)")
-                    st.dataframe(result_df_ngrs)
-                else:
-                    st.warning("Tidak ada nomor yang hilang di NGRS.")
+            <div class="title-box">
+                Preview Summary
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+        st.markdown(
+            """
+            <style>
+            .centered-dataframe {
+                display: flex;
+                justify-content: center;
+                margin-bottom: 20px;
+            }
+            .centered-dataframe div[data-testid="stDataFrame"] {
+                width: 80%; /* Lebar maksimum untuk tetap responsif */
+                max-width: 1200px; /* Batas maksimum untuk mencegah terlalu lebar */
+            }
+            </style>
+            """,
+            unsafe_allow_html=True
+        )
 
-            # Tabel tambahan pertama: Data lengkap dari nomor yang hilang di NGRS
-            st.markdown("<div class='group-header'>Data Transaksi Chip LinkAja yang Tidak ada di NGRS</div>", unsafe_allow_html=True)
+        # Tampilkan preview tabel di tengah
+        with st.container():
+            st.markdown('<div class="centered-dataframe">', unsafe_allow_html=True)
+            st.dataframe(daily_summary_df)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
         
-        # Tabel tambahan pertama: Data lengkap dari nomor yang hilang di NGRS
+        # Salin DataFrame tanpa format Rupiah
+        df_for_excel = daily_summary_df.copy()
         
-       
-        with st.spinner("Menyiapkan data lengkap missing in NGRS..."):
-            full_df_ngrs = get_full_missing_in_ngrs()
-            if not full_df_ngrs.empty:
-                st.success("Data lengkap ditemukan untuk nomor yang tidak ada di NGRS:")
-                st.dataframe(full_df_ngrs)
-                excel_data_ngrs = to_excel(full_df_ngrs)
-                st.download_button(
-                    label="Unduh Data Lengkap Missing in NGRS (Excel)",
-                    data=excel_data_ngrs,
-                    file_name=f"Full_Missing_in_NGRS_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            else:
-                st.warning("Tidak ada data lengkap untuk nomor yang hilang di NGRS.")
+        # Pastikan kolom numerik tetap dalam format angka (tanpa formatting)
+        kolom_numerik = [
+            'Total_Nilai_Denom_NGRS',
+            'Total_TP_NGRS',
+            'Total_Nilai_Transaksi_LinkAja',
+            'Total_Nilai_Finpay',
+            'Total_Nilai_Akuisisi',
+            'Total_Nilai_Roaming'
+        ]
 
-        # Tabel kedua: Nomor dari NGRS yang tidak ada di LinkAja/Alfred (hanya nomor)
+        # Konversi kolom ke tipe numerik (jika belum)
+        for kolom in kolom_numerik:
+            df_for_excel[kolom] = pd.to_numeric(df_for_excel[kolom], errors='coerce')
         
-        st.markdown("<div class='group-header'>Chip Data NGRS yang Tidak Ada di Data LinkAja</div>", unsafe_allow_html=True)
-       
-        with st.spinner("Menyiapkan data missing in LinkAja/Alfred..."):
-            result_df_linkaja = get_missing_numbers_in_linkaja()
-            if not result_df_linkaja.empty:
-                st.success("Data ditemukan! Berikut adalah nomor dari NGRS yang tidak ada di LinkAja/Alfred:")
-                st.dataframe(result_df_linkaja)
-            else:
-                st.warning("Tidak ada nomor dari NGRS yang hilang di LinkAja/Alfred.")
-
+        # Buat buffer untuk menyimpan file Excel
+        output = io.BytesIO()
+        
+        # Generate Excel file
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df_for_excel.to_excel(writer, index=False)
+        
+        # Ambil data dari buffer
+        excel_data = output.getvalue()
+        
+        # Tombol download
+        st.download_button(
+            label="Unduh Summary Harian (Excel)",
+            data=excel_data,
+            file_name=f"Daily_Summary_{start_date}_to_{end_date}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
 
-        st.markdown("<div class='group-header'>Data Transaksi Chip NGRS yang Tidak ada di LinkAja</div>", unsafe_allow_html=True)
-        # Tabel tambahan kedua: Data lengkap dari nomor NGRS yang hilang di LinkAja/Alfred
-        with st.spinner("Menghitung total transaksi dan nilai NoChip hilang di LinkAja/Alfred..."):
-            full_df_linkaja = get_full_missing_in_linkaja()
-            total_transactions_missing = len(full_df_linkaja) if not full_df_linkaja.empty else 0
-            total_value_missing = full_df_linkaja['SpendAmount'].sum() if not full_df_linkaja.empty and 'SpendAmount' in full_df_linkaja.columns else 0
+        st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
+        st.markdown("""</div>""", unsafe_allow_html=True)  # Tutup group-border
 
-        with st.container():
-            st.markdown("""<div class="linkaja-missing-scorecard-container">""", unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(
-                    f"""
-                    <div class="linkaja-missing-scorecard">
-                        <div class="linkaja-missing-metric-label">Total Transaksi</div>
-                        <div class="linkaja-missing-metric-value">{total_transactions_missing:,}</div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            
-            with col2:
-                st.markdown(
-                    f"""
-                    <div class="linkaja-missing-scorecard">
-                        <div class="linkaja-missing-metric-label">Total Nilai Transaksi </div>
-                        <div class="linkaja-missing-metric-value"> {format_rupiah(total_value_missing)}</div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            
-            st.markdown("""</div>""", unsafe_allow_html=True)
-            
-            st.markdown(
-            
-                """
-                <style>
-                .linkaja-missing-scorecard-container {
-                    display: flex;
-                    gap: 15px;
-                    justify-content: center;
-                    margin-bottom: 20px;
-                }
-                .linkaja-missing-scorecard {
-                    background-color: #ffb5b5;
-                    border-radius: 8px;
-                    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-                    padding: 15px;
-                    flex: 1;
+        # Buat timeseries plots menggunakan Plotly
+        st.markdown(
+            """
+            <style>
+                .title-box {
                     text-align: center;
-                    min-width: 150px;
-                    max-width: 250px;
-                }
-                .linkaja-missing-metric-label {
-                    color: #666;
-                    font-size: 14px;
-                    margin-bottom: 5px;
-                }
-                .linkaja-missing-metric-value {
-                    color: #333;
-                    font-size: 18px;
+                    padding: 15px;
+                    background-color: white;
+                    border-radius: 10px;
+                    box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
+                    margin-bottom: 20px;
+                    font-size: 20px;
                     font-weight: bold;
+                    color: #333;
                 }
-                </style>
-                """,
-                unsafe_allow_html=True
-            )
-        # Tabel tambahan kedua: Data lengkap dari nomor NGRS yang hilang di LinkAja/Alfred
-        
-        with st.spinner("Menyiapkan data lengkap missing in LinkAja/Alfred..."):
-            if not full_df_linkaja.empty:
-                st.success("Data lengkap ditemukan untuk nomor dari NGRS yang tidak ada di LinkAja/Alfred:")
-                st.dataframe(full_df_linkaja)
-                excel_data_linkaja = to_excel(full_df_linkaja)
-                st.download_button(
-                    label="Unduh Data Lengkap Missing in LinkAja/Alfred (Excel)",
-                    data=excel_data_linkaja,
-                    file_name=f"Full_Missing_in_LinkAja_Alfred_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            </style>
+
+            <div class="title-box">
+                Timeseries Plot
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        # Granularitas (harian/mingguan/bulanan) mengikuti rentang tanggal
+        chart_columns = [
+            'Total_Transaksi_NGRS', 'Total_Transaksi_LinkAja', 'Total_Transaksi_Finpay',
+            'Total_TP_NGRS', 'Total_Nilai_Transaksi_LinkAja', 'Total_Nilai_Finpay'
+        ]
+        chart_df, granularity = resample_timeseries(daily_summary_df, 'Date', chart_columns)
+
+        # Plot 1: Total Transaksi NGRS dan Total Transaksi LinkAja (Kiri)
+        fig1 = go.Figure()
+        fig1.add_trace(timeseries_trace(chart_df['Date'], chart_df['Total_Transaksi_NGRS'], 'Total Transaksi NGRS', 'green'))
+        fig1.add_trace(timeseries_trace(chart_df['Date'], chart_df['Total_Transaksi_LinkAja'], 'Total Transaksi LinkAja', 'blue'))
+        fig1.add_trace(timeseries_trace(chart_df['Date'], chart_df['Total_Transaksi_Finpay'], 'Total Transaksi Finpay', 'cyan'))
+        fig1.update_layout(
+            title='Total Transaksi NGRS vs LinkAja vs Finpay',
+            xaxis_title=time_axis_title(granularity),
+            yaxis_title='Jumlah Transaksi',
+            template='plotly_white'
+        )
+
+        # Plot 2: Total TP NGRS dan Total Nilai Transaksi LinkAja (Kanan)
+        fig2 = go.Figure()
+        fig2.add_trace(timeseries_trace(chart_df['Date'], chart_df['Total_TP_NGRS'], 'Total TP NGRS', 'purple', formatter=format_rupiah))
+        fig2.add_trace(timeseries_trace(chart_df['Date'], chart_df['Total_Nilai_Transaksi_LinkAja'], 'Total Nilai Transaksi LinkAja', 'orange', formatter=format_rupiah))
+        fig2.add_trace(timeseries_trace(chart_df['Date'], chart_df['Total_Nilai_Finpay'], 'Total Nilai Finpay', 'red', formatter=format_rupiah))
+        fig2.update_layout(
+            title='Total TP NGRS vs Nilai Transaksi LinkAja vs Finpay',
+            xaxis_title=time_axis_title(granularity),
+            yaxis_title='Nilai (Rp)',
+            template='plotly_white'
+        )
+
+        # Tampilkan plot berdampingan menggunakan container CSS
+        st.markdown("<div class='plot-container'>", unsafe_allow_html=True)
+        st.plotly_chart(fig1, use_container_width=True)
+        st.plotly_chart(fig2, use_container_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+    else:
+        st.warning("Tidak ada data untuk periode yang dipilih.")
+
+def main():
+    st.markdown(
+        """
+        <h1 style='text-align: center;'>LinkAja x NGRS Validator</h1>
+        """,
+        unsafe_allow_html=True
+    )
+    st.markdown("---")
+    st.markdown('<div class="summary-title-box">', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown(
+        """
+        <style>
+            .title-box {
+                text-align: center;
+                padding: 15px;
+                background-color: white;
+                border-radius: 10px;
+                box-shadow: 2px 2px 10px rgba(0,0,0,0.2);
+                margin-bottom: 20px;
+                font-size: 20px;
+                font-weight: bold;
+                color: #333;
+            }
+        </style>
+
+        <div class="title-box">
+            Data Overview Summary
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.markdown(
+        """
+        <style>
+        .scorecard-container {
+            display: flex;
+            justify-content: space-between;
+            gap: 20px;
+            margin-bottom: 20px;
+        }
+        .scorecard {
+            background-color: #f0f8ff;
+            border-radius: 8px;
+            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+            padding: 15px;
+            flex: 1;
+            text-align: center;
+            min-width: 0;
+        }
+        .metric-label {
+            color: #666;
+            font-size: 14px;
+            margin-bottom: 5px;
+        }
+        .metric-value {
+            color: #333;
+            font-size: 18px;
+            font-weight: bold;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
+
+    # Filter tanggal dan Cluster untuk scorecard
+    default_start = DEFAULT_START
+    default_end = datetime.now().date()
+
+    # Deklarasi variabel di scope fungsi
+    start_date = default_start.strftime('%Y-%m-%d')
+    end_date = default_end.strftime('%Y-%m-%d')
+
+    with st.sidebar:
+        st.sidebar.markdown("**Filter untuk Scorecard Keseluruhan**")
+        st.sidebar.markdown("---")
+
+        st.sidebar.markdown("**Filter Tanggal Keseluruhan**")
+        filter_type = st.sidebar.selectbox(
+            "Tipe Filter Tanggal",
+            ["Per Hari", "Rentang Hari"],
+            key="filter_type_overall"
+        )
+        if filter_type == "Per Hari":
+            selected_date = st.sidebar.date_input("Pilih Tanggal", default_end, key="overall_date_single")
+            start_date = selected_date.strftime('%Y-%m-%d')
+            end_date = selected_date.strftime('%Y-%m-%d')
+        else:
+            date_range = st.sidebar.date_input("Pilih Rentang Tanggal", [default_start, default_end], key="overall_date_range")
+            if len(date_range) == 2:
+                start_date = date_range[0].strftime('%Y-%m-%d')
+                end_date = date_range[1].strftime('%Y-%m-%d')
             else:
-                st.warning("Tidak ada data lengkap untuk nomor dari NGRS yang hilang di LinkAja/Alfred.")
+                start_date = default_start.strftime('%Y-%m-%d')
+                end_date = default_end.strftime('%Y-%m-%d')
+
+        # Filter TransactionType untuk NGRS
+        transaction_types_ngrs = fetch_transaction_types("All_pjpnonpjp")
+        selected_transaction_types_ngrs = st.sidebar.multiselect(
+            "Pilih TransactionType NGRS",
+            transaction_types_ngrs,
+            default=transaction_types_ngrs,
+            key="transaction_type_ngrs_filter"
+        )
+
+        # Filter ClusterID tunggal untuk semua tabel
+        st.sidebar.markdown("**Filter ClusterID (Berlaku untuk Semua Tabel)**")
+        cluster_ids = fetch_clusters("linkaja_Digipos_B2B_tf_Cluster", "ClusterID")
+        selected_cluster_ids = st.sidebar.multiselect(
+            "Pilih ClusterID",
+            cluster_ids,
+            default=cluster_ids,
+            key="cluster_id_filter"
+        )
+
+        # Mode rekonsiliasi streaming: hemat memori untuk rentang tanggal panjang
+        streaming_reconciliation = st.sidebar.toggle(
+            "Rekonsiliasi hemat memori (streaming)",
+            value=True,
+            key="streaming_reconciliation",
+            help="Data detail dibaca per potongan; hanya nomor unik yang disimpan di memori."
+        )
+
+    # CSS untuk semua grup scorecard
+    st.markdown(
+        """
+        <style>
+            /* Box besar yang membungkus semua kolom */
+            .group-container {
+                background-color: white;
+                padding: 20px;
+                border-radius: 12px;
+                box-shadow: 2px 4px 10px rgba(0,0,0,0.15);
+                margin-bottom: 20px;
+                border: 2px solid #edededed; /* Gray untuk border container */
+            }
+
+            /* Header dalam box besar */
+            .group-header {
+                text-align: center;
+                font-size: 18px;
+                font-weight: normal;
+                color: #333;
+                padding: 10px;
+                border-bottom: 2px solid #edededed; /* Gray untuk border bawah header */
+                margin-bottom: 15px;
+            }
+
+            .group-header-font {
+                text-align: center;
+                font-size: 20px;
+                font-weight: bold;
+                color: #333;
+                padding: 10px;
+                border-bottom: 2px solid #edededed; /* Gray untuk border bawah header */
+                margin-bottom: 15px;
+            }
+
+            /* Wrapper untuk scorecards */
+            .scorecard-container {
+                display: flex;
+                justify-content: space-between;
+                gap: 15px;
+                padding: 10px;
+            }
+
+            /* Box dalam box (scorecard utama) */
+            .scorecard {
+                flex: 1;
+                text-align: center;
+                border-radius: 10px;
+                padding: 15px;
+                box-shadow: 2px 2px 8px rgba(0,0,0,0.1);
+                border: 1px solid #edededed; /* Gray untuk border scorecard */
+            }
+
+            /* Inner box untuk nilai */
+            .metric-box {
+                background: #f9f9f9;
+                padding: 10px;
+                border-radius: 8px;
+                box-shadow: inset 2px 2px 5px rgba(0,0,0,0.1);
+                font-size: 18px;
+                font-weight: bold;
+                color: #333;
+                margin-top: 8px;
+            }
+
+            /* Label untuk setiap metric */
+            .metric-label {
+                font-size: 14px;
+                color: #666;
+            }
+
+            /* Warna spesifik untuk grup berdasarkan kombinasi warna Anda */
+            .linkaja-group { background-color: #8ec1da; } /* Med Blue untuk LinkAja */
+            .finpay-group { background-color: #cdedecec; } /* Light Blue untuk Finpay */
+            .ngrs-group { background-color: #f6d6c2; } /* Light Red untuk NGRS */
+            .summary-group { background-color: #d47264; } /* Med Red untuk Summary */
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
+
+    notice = st.empty()
+
+    # Render bertahap: tiap sumber kubus diambil bersamaan dan tiap grup diisi begitu sumbernya lengkap
+    def metrics(results):
+        cube = combine_cube(list(results.values()))
+        return metrics_per_cluster(cube, selected_cluster_ids, selected_transaction_types_ngrs)
+
+    def totals(results):
+        return overview_totals(metrics(results))
+
+    def daily(results):
+        cube = combine_cube(list(results.values()))
+        return daily_summary_from_cube(cube, start_date, end_date, selected_transaction_types_ngrs, selected_cluster_ids)
+
+    loaders = {
+        source: (lambda source=source: load_cube_source_preview(source, start_date, end_date))
+        for source in CUBE_SOURCES_LINKAJAALL
+    }
+    sections = [
+        progressive_section("scorecard LinkAja", LINKAJA_SOURCES, lambda results: render_linkaja_scorecards(totals(results))),
+        progressive_section("scorecard Finpay", ["finpay"], lambda results: render_finpay_scorecards(totals(results))),
+        progressive_section("scorecard NGRS", NGRS_SOURCES, lambda results: render_ngrs_scorecards(totals(results))),
+        progressive_section("scorecard Akuisisi", ["acquisition"], lambda results: render_acquisition_scorecards(totals(results))),
+        progressive_section("scorecard Roaming", ["roaming"], lambda results: render_roaming_scorecards(totals(results))),
+        progressive_section("ringkasan NGRS & LinkAja", LINKAJA_SOURCES + ["finpay"] + NGRS_SOURCES, lambda results: render_overview_scorecards(totals(results))),
+        progressive_section("tabel per cluster", CUBE_SOURCES_LINKAJAALL, lambda results: render_cluster_table(metrics(results), selected_cluster_ids)),
+        progressive_section("ringkasan harian dan grafik", CUBE_SOURCES_LINKAJAALL, lambda results: render_daily_summary(daily(results), start_date, end_date)),
+    ]
+    render_progressively("Linkaja x NGRS", loaders, sections)
+    with notice.container():
+        render_approximate_notice([cube_preview_key([source], start_date, end_date) for source in CUBE_SOURCES_LINKAJAALL])
+
+    render_reconciliation_section(start_date, end_date, selected_cluster_ids, selected_transaction_types_ngrs, streaming_reconciliation)
 
 if __name__ == "__main__":
     main()
@@ -1,22 +1,75 @@
 # main_app.py
+import sys
+import time
+import importlib
 import streamlit as st
 from streamlit_option_menu import option_menu
-from ChipTracking import main as chip_main  # Asumsi ada fungsi main() di ChipTracking.py
-from linkajaall import main as linkaja_main  # Asumsi ada fungsi main() di linkajaall.py
-from infiltrasi import main as infil_main  # Asumsi ada fungsi main() di linkajaall.py
-from rspjpsearch import main as pjp_main
+from perf import record_timing, render_timings
+from warmup import start_warmup_thread, render_warmup_status
+from fast_preview import render_preview_toggle, reset_preview_state, render_preview_status
+from progressive import render_progressive_toggle
+
+# Registry halaman: label menu -> (nama modul, ikon). Modul halaman hanya di-import
+# saat menunya dipilih, sehingga plotly/bigquery/pandas tidak dimuat untuk halaman lain.
+PAGES = {
+    "Chip Tracking": ("ChipTracking", "cpu"),
+    "Linkaja x NGRS": ("linkajaall", "wallet"),
+    "Infiltrasi Analysis": ("infiltrasi", "cpu"),
+    "PJP RS Search": ("rspjpsearch", "cpu"),
+}
+
+# Fungsi untuk meng-import modul halaman sekali per proses (hasil import di-cache)
+@st.cache_resource(show_spinner=False)
+def load_page_module(module_name):
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    return module, time.perf_counter() - started
+
+# Fungsi untuk menjalankan halaman: setup eksplisit (CSS, dll.) lalu main()
+def run_page(label):
+    module_name, _ = PAGES[label]
+    cold_start = module_name not in sys.modules
+    module, import_seconds = load_page_module(module_name)
+    # Waktu import hanya dicatat pada run yang benar-benar meng-import modul
+    if cold_start:
+        record_timing(f"Import {module_name} (cold start)", import_seconds)
+
+    started = time.perf_counter()
+    setup_page = getattr(module, "setup_page", None)
+    if setup_page is not None:
+        setup_page()
+    reset_preview_state()
+    module.main()
+    record_timing(f"Render {label} (seluruh main / run terakhir)", time.perf_counter() - started)
+    render_preview_status()
+
+# Fungsi untuk health check koneksi BigQuery bersama (dijalankan saat diminta)
+def render_connection_status():
+    with st.sidebar.expander("Status Koneksi BigQuery", expanded=False):
+        if st.button("Cek Koneksi", key="bq_health_check"):
+            # Di-import saat diminta agar google.cloud.bigquery tidak dimuat setiap start aplikasi
+            from bq_client import check_bigquery_health
+            health = check_bigquery_health()
+            if health["ok"]:
+                st.success(f"BigQuery OK ({health['latency_ms']:.0f} ms)")
+            else:
+                st.error(f"BigQuery tidak dapat dihubungi: {health['error']}")
+        render_warmup_status()
 
 # Fungsi untuk menjalankan aplikasi
 def run_app():
     # Konfigurasi halaman
     st.set_page_config(page_title="MMPP Analysis Dash",  layout="wide")
 
+    # Penjadwal pemanasan cache tampilan default (sekali per proses)
+    start_warmup_thread()
+
     # Menu sidebar menggunakan streamlit-option-menu
     with st.sidebar:
         selected = option_menu(
             menu_title="Main Menu",  # Judul menu
-            options=["Chip Tracking", "Linkaja x NGRS", "Infiltrasi Analysis", "PJP RS Search"],  # Pilihan menu
-            icons=["cpu", "wallet", "cpu", "cpu"],  # Ikon untuk setiap opsi
+            options=list(PAGES.keys()),  # Pilihan menu
+            icons=[icon for _, icon in PAGES.values()],  # Ikon untuk setiap opsi
             menu_icon="cast",  # Ikon menu utama
             default_index=0,  # Opsi default yang dipilih
             styles={
@@ -32,20 +85,13 @@ def run_app():
             },
         )
 
-    # Logika untuk memilih aplikasi
-    if selected == "Chip Tracking":
-        
-        chip_main()  # Panggil fungsi main dari ChipTracking.py
-   
-    elif selected == "Linkaja x NGRS":
-      
-        linkaja_main()  # Panggil fungsi main dari linkajaall.py
-   
-    elif selected == "Infiltrasi Analysis" :
-        infil_main()
-
-    elif selected =="PJP RS Search" :
-        pjp_main()
+    render_preview_toggle()
+    render_progressive_toggle()
+
+    # Logika untuk memilih aplikasi (modul di-import secara lazy)
+    run_page(selected)
+    render_timings()
+    render_connection_status()
 
 if __name__ == "__main__":
     run_app()
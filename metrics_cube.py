@@ -0,0 +1,221 @@
+# metrics_cube.py
+# Kubus metrik bersama untuk tabel ringkasan semua halaman: dimensi (date, ClusterID, source, scenario)
+# x ukuran (row_count, total_sum). Tiap sumber diambil sekali per jendela tanggal untuk SEMUA cluster
+# (di-cache per sumber), lalu halaman memotong, me-rollup dan mem-pivot secara lokal. Mengganti
+# halaman atau memilih ulang cluster tidak lagi mengirim query ke BigQuery.
+import streamlit as st
+from google.cloud import bigquery
+import pandas as pd
+from bq_client import get_bigquery_client, run_query, report_fetch_error
+from tp_engine import fetch_tp_cube, clear_tp_cube
+from fast_preview import preview_or_exact, table_sample, scale_sampled, PREVIEW_SAMPLE_PERCENT
+
+CUBE_DIMENSIONS = ["date", "ClusterID", "source", "scenario"]
+CUBE_MEASURES = ["row_count", "total_sum"]
+
+# Definisi sumber: tabel, kolom tanggal, ekspresi scenario/type, nilai yang dijumlahkan, filter baris.
+# Filter scenario/type tidak dipasang di SQL; halaman memilihnya saat memotong kubus.
+CUBE_SOURCES = {
+    # linkajaall: LinkAja B2B per sisi (Debit/Credit tidak nol)
+    "linkaja_debit": dict(table="linkaja_Digipos_B2B_tf_Cluster", date_column="InitiateDate", scenario="'Debit'",
+                          amount="CAST(Debit AS FLOAT64)", where="CAST(Debit AS FLOAT64) != 0"),
+    "linkaja_credit": dict(table="linkaja_Digipos_B2B_tf_Cluster", date_column="InitiateDate", scenario="'Credit'",
+                           amount="CAST(Credit AS FLOAT64)", where="CAST(Credit AS FLOAT64) != 0"),
+    # linkajaall (NGRS per TransactionType)
+    "ngrs": dict(table="All_pjpnonpjp", date_column="dt", scenario="TransactionType",
+                 amount="CAST(SpendAmount AS FLOAT64)", where=None),
+    # linkajaall: alfred_linkaja per TransactionScenario
+    "alfred_credit": dict(table="alfred_linkaja", date_column="InitiateDate", scenario="TransactionScenario",
+                          amount="CAST(Credit AS FLOAT64)", where="CAST(Credit AS FLOAT64) != 0"),
+    "alfred_reversal": dict(table="alfred_linkaja", date_column="InitiateDate", scenario="TransactionScenario",
+                            amount="CAST(Debit AS FLOAT64)", where="TransactionScenario = 'Buy Goods Reversal for General Merchant'"),
+    # linkajaall: Finpay, Akuisisi, Roaming
+    "finpay": dict(table="alfred_finpay", date_column="dt", scenario="Transaction",
+                   amount="CAST(Credit AS FLOAT64)", where="Remarks LIKE 'Biaya%'"),
+    "acquisition": dict(table="alfred_ngrs_akui", date_column="dt", scenario="TransactionType",
+                        amount="ABS(CAST(TransactionAmount AS FLOAT64))", where=None),
+    "roaming": dict(table="ngrs_roaming", date_column="dt", scenario="TransactionType",
+                    amount="ABS(CAST(TransactionAmount AS FLOAT64))", where=None),
+    # ChipTracking: TopUp LinkAjaXPJP dan transaksi NGRS (tabel ALL)
+    "topup_pjp": dict(table="LinkAjaXPJP", date_column="InitiateDate", scenario="'TopUp'",
+                      amount="CAST(Debit AS FLOAT64)", where=None),
+    "ngrs_all": dict(table="ALL", date_column="Completion", scenario="'NGRS'",
+                     amount="CAST(SpendAmount AS FLOAT64)", where=None),
+}
+
+# Sumber yang dihitung lokal, bukan satu query rollup: ngrs_tp (TP NGRS per TransactionType, lihat tp_engine)
+LOCAL_CUBE_SOURCES = {
+    "ngrs_tp": fetch_tp_cube,
+}
+
+# Pembuang cache internal sumber lokal (entri di luar fetch_cube_source_cached)
+LOCAL_CUBE_CLEARS = {
+    "ngrs_tp": clear_tp_cube,
+}
+
+
+# Fungsi untuk menyusun query rollup harian satu sumber untuk semua cluster (opsional dari sampel blok tabel)
+def build_source_query(source, start_date, end_date, sample_percent=None):
+    spec = CUBE_SOURCES[source]
+    where = f"AND {spec['where']}" if spec["where"] else ""
+    return f"""
+    SELECT
+        DATE({spec['date_column']}) AS date,
+        SAFE_CAST(ClusterID AS INT64) AS ClusterID,
+        CAST({spec['scenario']} AS STRING) AS scenario,
+        COUNT(*) AS row_count,
+        COALESCE(SUM({spec['amount']}), 0) AS total_sum
+    FROM `alfred-analytics-406004.analytics_alfred.{spec['table']}` {table_sample(sample_percent)}
+    WHERE DATE({spec['date_column']}) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    {where}
+    GROUP BY date, ClusterID, scenario
+    """
+
+
+def empty_cube():
+    return pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "ClusterID": pd.Series(dtype="Int64"),
+        "source": pd.Series(dtype=object),
+        "scenario": pd.Series(dtype=object),
+        "row_count": pd.Series(dtype="int64"),
+        "total_sum": pd.Series(dtype="float64"),
+    })
+
+
+# Fungsi untuk mengambil rollup harian satu sumber (semua cluster) untuk jendela tanggal.
+# sample_percent: perkiraan dari sampel blok tabel (mode pratinjau), ukuran diskalakan ke populasi.
+# Kegagalan dilempar (tidak ikut di-cache); halaman memakai fetch_cube_source.
+@st.cache_data(show_spinner=False)
+def fetch_cube_source_cached(source, start_date, end_date, sample_percent=None):
+    if source in LOCAL_CUBE_SOURCES:
+        df = LOCAL_CUBE_SOURCES[source](start_date, end_date, sample_percent)
+    else:
+        client = get_bigquery_client()
+        if client is None:
+            return empty_cube()
+        job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+        df = run_query(client, build_source_query(source, start_date, end_date, sample_percent), job_config=job_config)
+    df["source"] = source
+    df["date"] = pd.to_datetime(df["date"])
+    df["ClusterID"] = df["ClusterID"].astype("Int64")
+    df["scenario"] = df["scenario"].fillna("").astype("category")
+    df["row_count"] = df["row_count"].astype("int64")
+    df["total_sum"] = df["total_sum"].astype("float64")
+    df = scale_sampled(df, CUBE_MEASURES, sample_percent)
+    return df[CUBE_DIMENSIONS + CUBE_MEASURES]
+
+
+# Fungsi untuk rollup satu sumber bagi halaman: kegagalan ditampilkan dan diganti kubus kosong tanpa
+# di-cache, jadi run berikutnya mencoba ulang. sample_percent hanya diteruskan bila diisi: kunci
+# st.cache_data dibentuk dari argumen yang benar-benar dikirim, jadi (s, a, b) dan (s, a, b, None)
+# tidak berbagi cache.
+def fetch_cube_source(source, start_date, end_date, sample_percent=None):
+    sample_args = (sample_percent,) if sample_percent else ()
+    try:
+        return fetch_cube_source_cached(source, start_date, end_date, *sample_args)
+    except Exception as e:
+        report_fetch_error(f"Terjadi kesalahan saat mengambil data ringkasan {source}: {e}")
+        return empty_cube()
+
+
+# Fungsi untuk menggabungkan rollup beberapa sumber menjadi satu kubus
+def combine_cube(frames):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return empty_cube()
+    return pd.concat(frames, ignore_index=True)
+
+
+# Fungsi untuk memuat kubus dari beberapa sumber untuk satu jendela tanggal
+def load_metrics_cube(sources, start_date, end_date, sample_percent=None):
+    return combine_cube([fetch_cube_source(source, start_date, end_date, sample_percent) for source in sources])
+
+
+# Fungsi untuk membuang entri cache kubus exact satu jendela tanggal (warm-up setelah load data)
+def clear_metrics_cube(sources, start_date, end_date):
+    for source in sources:
+        fetch_cube_source_cached.clear(source, start_date, end_date)
+        if source in LOCAL_CUBE_CLEARS:
+            LOCAL_CUBE_CLEARS[source](start_date, end_date)
+
+
+# Fungsi untuk kunci pratinjau kubus (dipakai juga halaman untuk label perkiraan per bagian)
+def cube_preview_key(sources, start_date, end_date):
+    return ("metrics_cube", tuple(sources), start_date, end_date)
+
+
+# Fungsi untuk memuat kubus untuk tampilan halaman: exact, atau perkiraan dari sampel selama
+# versi exact masih dihitung di background saat mode pratinjau cepat aktif (lihat fast_preview)
+def load_metrics_cube_preview(sources, start_date, end_date):
+    return preview_or_exact(
+        cube_preview_key(sources, start_date, end_date),
+        lambda: load_metrics_cube(sources, start_date, end_date),
+        lambda: load_metrics_cube(sources, start_date, end_date, PREVIEW_SAMPLE_PERCENT),
+    )
+
+
+# Fungsi untuk memuat satu sumber kubus untuk tampilan halaman (versi per sumber dari
+# load_metrics_cube_preview, dipakai render bertahap agar tiap sumber bisa ditampilkan sendiri)
+def load_cube_source_preview(source, start_date, end_date):
+    return preview_or_exact(
+        cube_preview_key([source], start_date, end_date),
+        lambda: fetch_cube_source(source, start_date, end_date),
+        lambda: fetch_cube_source(source, start_date, end_date, PREVIEW_SAMPLE_PERCENT),
+    )
+
+
+# Fungsi untuk memotong kubus menurut sumber, scenario/type, dan cluster (None = semua)
+def slice_cube(cube, sources=None, scenarios=None, clusters=None):
+    mask = pd.Series(True, index=cube.index)
+    if sources is not None:
+        mask &= cube["source"].isin(list(sources))
+    if scenarios is not None:
+        mask &= cube["scenario"].astype(str).isin(list(scenarios))
+    if clusters is not None:
+        mask &= cube["ClusterID"].isin(list(clusters))
+    return cube[mask]
+
+
+# Fungsi untuk rollup ukuran menurut dimensi tertentu
+def rollup(cube, by):
+    if cube.empty:
+        return cube[list(by) + CUBE_MEASURES].iloc[0:0]
+    return cube.groupby(list(by), observed=True, as_index=False)[CUBE_MEASURES].sum()
+
+
+# Fungsi untuk total per ClusterID satu sumber (hanya cluster yang memiliki baris)
+def cluster_rollup(cube, source, scenarios=None, clusters=None):
+    return rollup(slice_cube(cube, [source], scenarios, clusters), ["ClusterID"])
+
+
+# Fungsi untuk total per tanggal satu sumber (hanya tanggal yang memiliki baris)
+def daily_rollup(cube, source, scenarios=None, clusters=None):
+    return rollup(slice_cube(cube, [source], scenarios, clusters), ["date"])
+
+
+# Fungsi untuk deret tanggal lengkap (date spine) satu rentang laporan
+def date_spine(start_date, end_date):
+    return pd.date_range(start_date, end_date, freq="D", name="date")
+
+
+# Fungsi untuk total harian satu sumber di atas date spine (hari tanpa baris bernilai 0), sehingga
+# sumber-sumber digabung per tanggal tanpa join yang bisa menggandakan atau menghilangkan hari
+def daily_totals(cube, source, spine, scenarios=None, clusters=None):
+    daily = daily_rollup(cube, source, scenarios, clusters).set_index("date")[CUBE_MEASURES]
+    return daily.reindex(spine, fill_value=0)
+
+
+# Fungsi untuk total per ClusterID yang diindeks lengkap (cluster tanpa baris bernilai 0)
+def cluster_totals(cube, source, clusters, scenarios=None):
+    totals = cluster_rollup(cube, source, scenarios, clusters).set_index("ClusterID")
+    return totals.reindex(list(clusters), fill_value=0)
+
+
+# Fungsi untuk filter cluster lokal pada hasil query yang diambil untuk semua cluster.
+# Dibandingkan sebagai teks karena sebagian tabel menyimpan ClusterID sebagai STRING.
+def filter_clusters(df, clusters, column="ClusterID"):
+    if df.empty:
+        return df
+    wanted = {str(cluster) for cluster in clusters}
+    return df[df[column].astype(str).isin(wanted)]
@@ -0,0 +1,116 @@
+# outlet_search.py
+# Indeks nama outlet di memori untuk pencarian substring, fuzzy (trigram) dan prefix
+# dengan pelipatan huruf besar/kecil dan diakritik.
+import pandas as pd
+import numpy as np
+import unicodedata
+
+NGRAM_SIZE = 3
+MIN_SIMILARITY = 0.2
+
+# Bobot tambahan di atas skor kemiripan trigram
+EXACT_BONUS = 1.0
+PREFIX_BONUS = 0.5
+TOKEN_PREFIX_BONUS = 0.3
+SUBSTRING_BONUS = 0.2
+
+
+# Fungsi untuk melipat teks per karakter: huruf kecil, tanpa diakritik, non-alfanumerik jadi spasi.
+# Pemetaan per karakter menjaga sifat substring: jika q substring dari x maka fold(q) substring dari fold(x).
+def fold_text(text):
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(" " if not ch.isalnum() else ch for ch in text if not unicodedata.combining(ch))
+
+
+# Fungsi untuk n-gram teks apa adanya (dipakai untuk kandidat substring)
+def ngrams(text, n=NGRAM_SIZE):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+# Fungsi untuk n-gram dengan padding di awal/akhir (dipakai untuk kemiripan dan prefix)
+def padded_ngrams(text, n=NGRAM_SIZE):
+    return ngrams(" " * (n - 1) + text + " ", n)
+
+
+class OutletNameIndex:
+    def __init__(self, names):
+        names = pd.Series(names).fillna("").astype(str).reset_index(drop=True)
+        self.size = len(names)
+        self.folded = names.map(fold_text).to_numpy(dtype=object)
+
+        # Indeks trigram: {gram: array posisi baris terurut}
+        grams = pd.Series(self.folded).map(lambda text: list(padded_ngrams(text)))
+        self.gram_counts = grams.map(len).to_numpy()
+        exploded = grams.explode().dropna()
+        rows = exploded.index.to_numpy()
+        groups = pd.Series(rows).groupby(exploded.to_numpy(), sort=False).indices
+        self.postings = {gram: rows[idx] for gram, idx in groups.items()}
+
+        # Indeks token terurut untuk pelengkapan prefix
+        tokens = pd.Series(self.folded).str.split().explode().dropna()
+        token_counts = pd.Series(tokens.index.to_numpy()).groupby(tokens.to_numpy()).nunique().sort_index()
+        self.tokens = token_counts.index.to_numpy(dtype=object)
+        self.token_counts = token_counts.to_numpy()
+
+    def _posting(self, gram):
+        return self.postings.get(gram, np.empty(0, dtype=np.int64))
+
+    # Kandidat (superset) baris yang mungkin mengandung query sebagai substring
+    def substring_candidates(self, query):
+        grams = ngrams(fold_text(query))
+        if not grams:
+            return np.arange(self.size)
+        postings = sorted((self._posting(gram) for gram in grams), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if candidates.size == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return candidates
+
+    # Pencarian berperingkat: kemiripan trigram (Jaccard) ditambah bonus exact/prefix/substring.
+    # Mengembalikan (posisi baris, skor) terurut dari yang paling relevan, maksimal top_k.
+    def search(self, query, top_k=20, restrict=None):
+        folded_query = " ".join(fold_text(query).split())
+        if not folded_query:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        query_grams = padded_ngrams(folded_query)
+        postings = [self._posting(gram) for gram in query_grams]
+        postings = [posting for posting in postings if posting.size]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        shared_counts = np.bincount(np.concatenate(postings), minlength=self.size)
+        candidates = np.flatnonzero(shared_counts)
+        if restrict is not None:
+            candidates = candidates[np.isin(candidates, restrict)]
+        if candidates.size == 0:
+            return candidates, np.empty(0)
+
+        shared = shared_counts[candidates]
+        scores = shared / (len(query_grams) + self.gram_counts[candidates] - shared)
+
+        names = pd.Series(self.folded[candidates]).str.split().str.join(" ")
+        scores = scores + np.where(names.eq(folded_query).to_numpy(), EXACT_BONUS, 0.0)
+        scores = scores + np.where(names.str.startswith(folded_query).to_numpy(), PREFIX_BONUS, 0.0)
+        scores = scores + np.where(names.str.contains(" " + folded_query, regex=False).to_numpy(), TOKEN_PREFIX_BONUS, 0.0)
+        scores = scores + np.where(names.str.contains(folded_query, regex=False).to_numpy(), SUBSTRING_BONUS, 0.0)
+
+        keep = scores >= MIN_SIMILARITY
+        candidates, scores = candidates[keep], scores[keep]
+        if candidates.size > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return candidates[order], scores[order]
+
+    # Pelengkapan prefix: token yang diawali prefix, diurutkan dari yang paling sering dipakai
+    def complete(self, prefix, limit=10):
+        folded_prefix = fold_text(prefix).strip()
+        if not folded_prefix:
+            return []
+        lo = np.searchsorted(self.tokens, folded_prefix, side="left")
+        hi = np.searchsorted(self.tokens, folded_prefix + "\uffff", side="left")
+        matches = [(self.tokens[i], self.token_counts[i]) for i in range(lo, hi)]
+        matches.sort(key=lambda item: (-item[1], item[0]))
+        return [token for token, _ in matches[:limit]]
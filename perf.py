@@ -0,0 +1,30 @@
+# perf.py
+# Pencatatan waktu muat sederhana (cold start, render halaman, update widget) per sesi
+import streamlit as st
+import time
+from contextlib import contextmanager
+
+
+# Fungsi untuk menyimpan satu catatan waktu (detik) ke session_state
+def record_timing(label, seconds):
+    st.session_state.setdefault("perf_timings", {})[label] = seconds
+
+
+# Context manager untuk mengukur durasi sebuah blok kode
+@contextmanager
+def timed(label):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(label, time.perf_counter() - started)
+
+
+# Fungsi untuk menampilkan semua catatan waktu di sidebar
+def render_timings():
+    timings = st.session_state.get("perf_timings", {})
+    if not timings:
+        return
+    with st.sidebar.expander("Waktu Muat", expanded=False):
+        for label, seconds in timings.items():
+            st.caption(f"{label}: {seconds * 1000:,.0f} ms".replace(",", "."))
@@ -0,0 +1,128 @@
+# phone_codec.py
+# Nomor telepon dinormalisasi ke bentuk 62... lalu dienkode sebagai uint64 di array NumPy.
+# Operasi himpunan (selisih, keanggotaan) berjalan di array terurut, bukan di objek string Python:
+# 8 byte per nomor dan tanpa hashing string.
+import numpy as np
+import pandas as pd
+
+INVALID_CODE = np.uint64(0)
+
+# Batas digit agar muat di uint64 (maks 18.446.744.073.709.551.615)
+MAX_DIGITS = 19
+MAX_PREFIXED_DIGITS = MAX_DIGITS - 2
+
+POWERS_OF_TEN = np.array([10 ** i for i in range(MAX_DIGITS + 1)], dtype=np.uint64)
+PREFIX_62 = np.uint64(62)
+
+
+ZERO, EIGHT = ord("0"), ord("8")
+
+
+# Fungsi untuk matriks byte per posisi karakter (baris = posisi, kolom = nomor) dari array nilai.
+# Karakter non-ASCII dibuang lebih dulu agar bisa dienkode sebagai bytes.
+def to_char_columns(values):
+    try:
+        raw = values.astype("S")
+    except UnicodeEncodeError:
+        raw = pd.Series(values).astype(str).str.replace(r"[^0-9]", "", regex=True).to_numpy().astype("S")
+    return raw.view(np.uint8).reshape(len(raw), raw.dtype.itemsize).T.copy()
+
+
+# Fungsi untuk mengenkode nomor (string/angka, boleh ada pemisah) ke uint64 bentuk 62...
+# Awalan 0 diganti 62 dan awalan 8 diberi 62 (sama dengan normalize_number_series di ChipTracking).
+# Hasil sejajar dengan input; nilai kosong/tidak valid menjadi INVALID_CODE (0).
+# Parsing dilakukan per kolom karakter di matriks byte (tanpa loop Python per nomor).
+def encode_phone_numbers(values):
+    series = pd.Series(values)
+    codes = np.zeros(len(series), dtype=np.uint64)
+    present = series.notna().to_numpy()
+    if not present.any():
+        return codes
+
+    char_columns = to_char_columns(series.to_numpy()[present])
+    size = char_columns.shape[1]
+    values = np.zeros(size, dtype=np.uint64)
+    lengths = np.zeros(size, dtype=np.uint16)
+    first = np.zeros(size, dtype=np.uint8)
+
+    # Satu posisi karakter per iterasi; karakter non-digit dilewati (setara menghapus pemisah)
+    for chars in char_columns:
+        digits = chars - np.uint8(ZERO)
+        is_digit = digits < 10
+        np.copyto(first, chars, where=is_digit & (lengths == 0))
+        lengths += is_digit
+        np.multiply(values, np.uint64(10), out=values, where=is_digit)
+        np.add(values, digits, out=values, where=is_digit, casting="unsafe")
+
+    # 0812.. -> 62 * 10^(n-1) + 812..,  812.. -> 62 * 10^n + 812..
+    prefixed = (first == ZERO) | (first == EIGHT)
+    valid = (lengths > 0) & np.where(prefixed, lengths <= MAX_PREFIXED_DIGITS, lengths <= MAX_DIGITS)
+    prefix_mask = valid & prefixed
+    shift = np.where(first == ZERO, lengths - 1, lengths)
+    values[prefix_mask] += PREFIX_62 * POWERS_OF_TEN[shift[prefix_mask]]
+    values[~valid] = INVALID_CODE
+
+    codes[present] = values
+    return codes
+
+
+# Fungsi untuk mengembalikan kode ke string nomor (kode tidak valid menjadi None)
+def decode_phone_numbers(codes):
+    codes = np.asarray(codes, dtype=np.uint64)
+    decoded = codes.astype(str).astype(object)
+    decoded[codes == INVALID_CODE] = None
+    return decoded
+
+
+# Fungsi untuk himpunan kode: array terurut, unik, tanpa kode tidak valid.
+# Sort + bandingkan tetangga; np.unique (jalur hash di NumPy 2.x) jauh lebih lambat untuk uint64.
+def unique_codes(codes):
+    codes = np.sort(np.asarray(codes, dtype=np.uint64))
+    keep = codes != INVALID_CODE
+    keep[1:] &= codes[1:] != codes[:-1]
+    return codes[keep]
+
+
+# Fungsi untuk gabungan beberapa himpunan kode
+def union_codes(*code_sets):
+    if not code_sets:
+        return np.empty(0, dtype=np.uint64)
+    return unique_codes(np.concatenate(code_sets))
+
+
+# Fungsi untuk selisih himpunan a - b (keduanya hasil unique_codes)
+def difference_codes(a, b):
+    return np.setdiff1d(a, b, assume_unique=True)
+
+
+# Fungsi untuk mask keanggotaan: codes[i] ada di sorted_set (hasil unique_codes)
+def contains_codes(sorted_set, codes):
+    codes = np.asarray(codes, dtype=np.uint64)
+    if len(sorted_set) == 0:
+        return np.zeros(len(codes), dtype=bool)
+    return np.isin(codes, sorted_set)
+
+
+# Fungsi untuk membangun himpunan kode dari aliran halaman secara bertahap. Potongan yang tertunda
+# digabung begitu ukurannya melebihi himpunan saat ini, sehingga memori tetap sebanding nomor unik.
+class PhoneCodeSetBuilder:
+    def __init__(self):
+        self.codes = np.empty(0, dtype=np.uint64)
+        self.pending = []
+        self.pending_size = 0
+
+    def add(self, values):
+        page_codes = unique_codes(encode_phone_numbers(values))
+        self.pending.append(page_codes)
+        self.pending_size += len(page_codes)
+        if self.pending_size > len(self.codes):
+            self._merge()
+
+    def _merge(self):
+        self.codes = union_codes(self.codes, *self.pending)
+        self.pending = []
+        self.pending_size = 0
+
+    def result(self):
+        self._merge()
+        return self.codes
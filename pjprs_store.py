@@ -0,0 +1,173 @@
+# pjprs_store.py
+# Penyimpanan lokal (snapshot) tabel PJPRS_Clean dengan indeks hash dan trigram,
+# sehingga pencarian profil tidak perlu round trip ke BigQuery.
+import streamlit as st
+import numpy as np
+from datetime import datetime, timedelta
+import os
+import pickle
+import tempfile
+from outlet_search import OutletNameIndex
+from bq_client import run_query
+
+PJPRS_TABLE = "alfred-analytics-406004.analytics_alfred.PJPRS_Clean"
+
+# Snapshot diperbarui berkala; tabel referensi ini jarang berubah
+SNAPSHOT_TTL = timedelta(hours=6)
+SNAPSHOT_DIR = os.environ.get("MMPP_CACHE_DIR", ".cache")
+SNAPSHOT_FILE = os.path.join(SNAPSHOT_DIR, "pjprs_snapshot.pkl")
+
+# Fungsi untuk menyamakan tipe data seperti hasil search_bigquery_data
+def normalize_pjprs_frame(df):
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == 'int64':
+            df[col] = df[col].astype(str)
+        elif df[col].dtype == 'object':
+            df[col] = df[col].fillna('')
+    return df
+
+
+# Fungsi untuk membangun indeks hash {nilai: array posisi baris}
+def build_hash_index(series):
+    keys = series.astype(str)
+    return dict(keys.groupby(keys, sort=False).indices)
+
+
+class PJPRSLookupStore:
+    def __init__(self, df, refreshed_at):
+        self.df = normalize_pjprs_frame(df)
+        self.refreshed_at = refreshed_at
+        self.outlet_id_index = build_hash_index(self.df["OutletID"]) if "OutletID" in self.df.columns else {}
+        self.no_rs_index = build_hash_index(self.df["NoRS"]) if "NoRS" in self.df.columns else {}
+        self.name_index = OutletNameIndex(self.df["OutletName"] if "OutletName" in self.df.columns else [])
+
+    def __len__(self):
+        return len(self.df)
+
+    # Irisan baris dari indeks hash OutletID/NoRS, None jika tidak ada filter ID
+    def _id_candidates(self, outlet_id=None, no_rs=None):
+        candidates = None
+        empty = np.empty(0, dtype=np.int64)
+        if outlet_id:
+            candidates = self.outlet_id_index.get(str(outlet_id), empty)
+        if no_rs:
+            positions = self.no_rs_index.get(str(no_rs), empty)
+            candidates = positions if candidates is None else np.intersect1d(candidates, positions)
+        return candidates
+
+    # Semantik sama dengan query BigQuery: OutletID/NoRS sama persis, OutletName LIKE '%...%'
+    def search(self, outlet_id=None, no_rs=None, outlet_name=None):
+        candidates = self._id_candidates(outlet_id, no_rs)
+        if outlet_name:
+            positions = self.name_index.substring_candidates(outlet_name)
+            candidates = positions if candidates is None else np.intersect1d(candidates, positions)
+        if candidates is None:
+            return self.df.iloc[0:0]
+
+        result = self.df.iloc[np.sort(candidates)]
+        if outlet_name:
+            result = result[result["OutletName"].astype(str).str.contains(outlet_name, regex=False)]
+        return result.reset_index(drop=True)
+
+    # Pencarian massal: satu lookup hash per ID, hasil mengikuti urutan daftar ID
+    def lookup_many(self, id_column, ids):
+        index = {"OutletID": self.outlet_id_index, "NoRS": self.no_rs_index}[id_column]
+        positions = [index[value] for value in map(str, ids) if value in index]
+        if not positions:
+            return self.df.iloc[0:0]
+        return self.df.iloc[np.concatenate(positions)].reset_index(drop=True)
+
+    # Pencarian OutletName berperingkat (fuzzy + prefix), dibatasi filter ID jika ada
+    def search_ranked(self, outlet_name, top_k=20, outlet_id=None, no_rs=None):
+        restrict = self._id_candidates(outlet_id, no_rs)
+        positions, scores = self.name_index.search(outlet_name, top_k=top_k, restrict=restrict)
+        result = self.df.iloc[positions].reset_index(drop=True)
+        result.insert(0, "Skor Relevansi", np.round(scores, 3))
+        return result
+
+    # Saran pelengkapan untuk kata terakhir yang sedang diketik
+    def suggest(self, outlet_name, limit=10):
+        words = str(outlet_name).split()
+        return self.name_index.complete(words[-1], limit=limit) if words else []
+
+
+# Fungsi untuk mengambil snapshot penuh PJPRS_Clean dari BigQuery
+def fetch_pjprs_snapshot(client):
+    query = f"SELECT * FROM `{PJPRS_TABLE}`"
+    return run_query(client, query)
+
+
+# Fungsi untuk membaca snapshot dari disk jika masih dalam TTL
+def read_snapshot_file(max_age=SNAPSHOT_TTL):
+    if not os.path.exists(SNAPSHOT_FILE):
+        return None
+    try:
+        with open(SNAPSHOT_FILE, "rb") as f:
+            payload = pickle.load(f)
+        if datetime.now() - payload["refreshed_at"] > max_age:
+            return None
+        return payload
+    except Exception:
+        return None
+
+
+# Fungsi untuk menyimpan snapshot ke disk (tulis atomik via file sementara unik, karena aplikasi
+# dan sidecar warmup.py bisa menulis snapshot yang sama bersamaan)
+def write_snapshot_file(df, refreshed_at):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix="pjprs_snapshot.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"df": df, "refreshed_at": refreshed_at}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, SNAPSHOT_FILE)
+    except BaseException:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
+
+
+# Fungsi untuk memuat store (dengan caching per proses, diperbarui tiap SNAPSHOT_TTL)
+# Kegagalan dilempar sebagai exception agar tidak ikut di-cache
+@st.cache_resource(ttl=SNAPSHOT_TTL)
+def load_pjprs_store(_client):
+    payload = read_snapshot_file()
+    if payload is None:
+        payload = {"df": fetch_pjprs_snapshot(_client), "refreshed_at": datetime.now()}
+        try:
+            write_snapshot_file(payload["df"], payload["refreshed_at"])
+        except OSError:
+            pass
+    return PJPRSLookupStore(payload["df"], payload["refreshed_at"])
+
+
+# Fungsi untuk mengambil store siap pakai, None jika snapshot tidak tersedia. TTL cache dihitung
+# sejak store dimuat, bukan sejak snapshot dibuat; store yang snapshot-nya sudah melewati
+# SNAPSHOT_TTL dimuat ulang agar data tidak pernah lebih tua dari SNAPSHOT_TTL.
+def get_pjprs_store(client):
+    if client is None:
+        return None
+    try:
+        store = load_pjprs_store(client)
+        if datetime.now() - store.refreshed_at > SNAPSHOT_TTL:
+            load_pjprs_store.clear()
+            store = load_pjprs_store(client)
+        return store
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat memuat snapshot PJPRS_Clean: {e}")
+        return None
+
+
+# Fungsi untuk memaksa pembaruan snapshot
+def refresh_pjprs_store(client):
+    if client is None:
+        return None
+    try:
+        write_snapshot_file(fetch_pjprs_snapshot(client), datetime.now())
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat memperbarui snapshot PJPRS_Clean: {e}")
+        return None
+    load_pjprs_store.clear()
+    return get_pjprs_store(client)
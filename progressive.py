@@ -0,0 +1,92 @@
+# progressive.py
+# Render bertahap untuk halaman dengan banyak query. Placeholder tiap scorecard/tabel/grafik dipasang
+# lebih dulu, loader (query/fetch ber-cache) dijalankan bersamaan di thread, dan tiap bagian diisi
+# begitu semua data yang dibutuhkannya selesai. Waktu sampai bagian pertama terisi (time-to-first-
+# meaningful-paint) dan sampai semua bagian terisi dicatat lewat perf.record_timing.
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+import time
+from perf import record_timing
+
+PROGRESSIVE_STATE_KEY = "progressive_render"
+PROGRESSIVE_MAX_WORKERS = 4
+
+
+# Fungsi untuk toggle render bertahap di sidebar (satu nilai untuk semua halaman dalam sesi)
+def render_progressive_toggle():
+    st.sidebar.toggle(
+        "Tampilkan bertahap", value=True, key=PROGRESSIVE_STATE_KEY,
+        help="Scorecard, tabel, dan grafik diisi satu per satu begitu query-nya selesai."
+    )
+
+
+def progressive_enabled():
+    return bool(st.session_state.get(PROGRESSIVE_STATE_KEY, True))
+
+
+# Fungsi untuk satu bagian halaman: placeholder yang sudah dipasang, nama loader yang dibutuhkan,
+# dan fungsi render(results) yang menerima {nama loader: hasil} (hanya loader yang sudah selesai)
+def progressive_section(label, requires, render):
+    placeholder = st.empty()
+    placeholder.caption(f"⏳ Memuat {label}...")
+    return {"placeholder": placeholder, "requires": set(requires), "render": render}
+
+
+# Fungsi untuk mengisi bagian-bagian yang datanya sudah lengkap; mengembalikan yang belum terisi
+def fill_ready_sections(sections, results):
+    pending = []
+    for section in sections:
+        if section["requires"] <= results.keys():
+            with section["placeholder"].container():
+                section["render"](results)
+        else:
+            pending.append(section)
+    return pending
+
+
+# Fungsi untuk menjalankan loader dan mengisi bagian-bagian halaman. Dengan render bertahap loader
+# berjalan bersamaan (thread diberi ScriptRunContext agar st.cache_data, session_state, dan pesan
+# error tetap bekerja) dan tiap bagian diisi segera; tanpa itu semua loader selesai dulu baru diisi.
+def render_progressively(label, loaders, sections):
+    started = time.perf_counter()
+    results = {}
+
+    if not progressive_enabled():
+        with st.spinner(f"Mengambil data {label}..."):
+            results = {name: loader() for name, loader in loaders.items()}
+        fill_ready_sections(sections, results)
+        record_timing(f"{label} (first meaningful paint)", time.perf_counter() - started)
+        return results
+
+    ctx = get_script_run_ctx()
+
+    def run(loader):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return loader()
+
+    painted = False
+
+    def fill(sections):
+        nonlocal painted
+        remaining = fill_ready_sections(sections, results)
+        if not painted and len(remaining) < len(sections):
+            painted = True
+            record_timing(f"{label} (first meaningful paint)", time.perf_counter() - started)
+        return remaining
+
+    with ThreadPoolExecutor(max_workers=PROGRESSIVE_MAX_WORKERS, thread_name_prefix="progressive") as executor:
+        futures = {executor.submit(run, loader): name for name, loader in loaders.items()}
+        not_done = set(futures)
+        sections = fill(sections)
+        while sections and not_done:
+            done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+            sections = fill(sections)
+        for future in not_done:
+            results[futures[future]] = future.result()
+
+    record_timing(f"{label} (semua bagian)", time.perf_counter() - started)
+    return results
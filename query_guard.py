@@ -0,0 +1,153 @@
+# query_guard.py
+# Pengaman biaya query: estimasi byte terpindai lewat dry run BigQuery (di-cache per bentuk query)
+# dibandingkan dengan anggaran per halaman. Di atas anggaran, halaman dapat beralih ke jalur
+# ringkasan (rollup), menjalankan query bertahap per rentang tanggal, atau meminta konfirmasi.
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from google.cloud import bigquery
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from bq_client import get_bigquery_client
+from chunked_extract import plan_date_chunks
+
+GB = 1024 ** 3
+
+# Anggaran byte terpindai per halaman untuk satu aksi (gabungan query yang dijalankan bersama)
+PAGE_BUDGETS = {
+    "linkajaall": 50 * GB,
+    "infiltrasi": 20 * GB,
+}
+DEFAULT_BUDGET = 20 * GB
+
+ESTIMATE_TTL = 3600
+# Dry run per potongan dijalankan bersamaan (hasilnya di-cache ESTIMATE_TTL)
+ESTIMATE_MAX_WORKERS = 8
+
+POLICY_DOWNGRADE = "downgrade"
+POLICY_CHUNK = "chunk"
+POLICY_FULL = "full"
+
+POLICY_LABELS = {
+    POLICY_DOWNGRADE: "Gunakan ringkasan (rollup)",
+    POLICY_CHUNK: "Jalankan bertahap per rentang tanggal",
+    POLICY_FULL: "Jalankan penuh",
+}
+
+
+# Fungsi untuk bentuk query (SQL tanpa perbedaan spasi/baris) sebagai kunci cache estimasi
+def query_shape(query):
+    return " ".join(query.split())
+
+
+# Fungsi untuk estimasi byte terpindai satu query via dry run (gratis, tidak menjalankan query).
+# None jika estimasi tidak tersedia; pemanggil memperlakukannya sebagai "tidak diketahui".
+@st.cache_data(ttl=ESTIMATE_TTL, show_spinner=False)
+def estimate_query_bytes(shape):
+    client = get_bigquery_client()
+    if client is None:
+        return None
+    try:
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        return client.query(shape, job_config=job_config).total_bytes_processed
+    except Exception:
+        return None
+
+
+# Fungsi untuk estimasi total beberapa query; None jika salah satunya tidak dapat diestimasi
+def estimate_total_bytes(queries):
+    total = 0
+    for query in queries:
+        estimate = estimate_query_bytes(query_shape(query))
+        if estimate is None:
+            return None
+        total += estimate
+    return total
+
+
+def page_budget(page):
+    return PAGE_BUDGETS.get(page, DEFAULT_BUDGET)
+
+
+# Fungsi untuk format ukuran byte agar mudah dibaca
+def format_bytes(num_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:,.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:,.1f} TB"
+
+
+# Fungsi untuk estimasi byte tiap potongan tanggal (dry run bersamaan; thread diberi ScriptRunContext
+# agar st.cache_data bekerja seperti di thread halaman). None untuk potongan yang tidak dapat diestimasi.
+def estimate_chunk_bytes(build_queries, chunks):
+    ctx = get_script_run_ctx()
+
+    def estimate(chunk):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return estimate_total_bytes(build_queries(*chunk))
+
+    with ThreadPoolExecutor(max_workers=ESTIMATE_MAX_WORKERS, thread_name_prefix="dry-run") as executor:
+        return list(executor.map(estimate, chunks))
+
+
+# Fungsi untuk potongan harian/mingguan ekstraksi ke disk (bisa dilanjutkan dan dipakai ulang).
+# Hanya jika dry run menunjukkan tabel terpangkas per tanggal: potongan pertama memindai lebih
+# sedikit dari keseluruhan. Tanpa itu tiap potongan memindai seluruh tabel (biaya N kali), jadi None.
+def pruned_date_chunks(build_queries, start_date, end_date, total_bytes):
+    chunks = plan_date_chunks(start_date, end_date)
+    if total_bytes is None or len(chunks) < 2:
+        return None
+    chunk_bytes = estimate_total_bytes(build_queries(*chunks[0]))
+    if chunk_bytes is None or chunk_bytes >= total_bytes:
+        return None
+    return tuple(chunks)
+
+
+# Fungsi untuk rentang yang dijalankan tanpa konfirmasi (mis. warm-up): potongan harian/mingguan
+# jika tabel terpangkas per tanggal, selain itu satu job. None jika di atas anggaran halaman.
+def unattended_date_ranges(page, build_queries, start_date, end_date):
+    total_bytes = estimate_total_bytes(build_queries(start_date, end_date))
+    if total_bytes is not None and total_bytes > page_budget(page):
+        return None
+    return pruned_date_chunks(build_queries, start_date, end_date, total_bytes) or ((start_date, end_date),)
+
+
+# Fungsi untuk gerbang biaya di UI. Mengembalikan (policy, date_ranges); tiap rentang dijalankan
+# sebagai satu job, dan jumlah job pada label pilihan sama dengan yang benar-benar dijalankan:
+# - dalam anggaran: (POLICY_FULL, potongan harian/mingguan jika terpangkas per tanggal, atau satu rentang)
+# - estimasi tidak tersedia: (POLICY_FULL, ((start_date, end_date),))
+# - di atas anggaran: pilihan pengguna; (None, None) selama query penuh/bertahap belum dikonfirmasi.
+#   Bertahap memakai potongan harian/mingguan yang sama dengan run penuh dalam anggaran (file
+#   potongan di disk dipakai bersama) dan hanya ditawarkan jika tiap potongan di bawah anggaran.
+def cost_gate(page, key, build_queries, start_date, end_date, allow_downgrade=False):
+    full_range = ((start_date, end_date),)
+    total_bytes = estimate_total_bytes(build_queries(start_date, end_date))
+    budget = page_budget(page)
+    if total_bytes is None:
+        return POLICY_FULL, full_range
+    chunks = pruned_date_chunks(build_queries, start_date, end_date, total_bytes)
+    if total_bytes <= budget:
+        return POLICY_FULL, chunks or full_range
+
+    chunk_bytes = estimate_chunk_bytes(build_queries, chunks) if chunks else []
+    if not chunk_bytes or None in chunk_bytes or max(chunk_bytes) > budget:
+        chunks = None
+    options = ([POLICY_DOWNGRADE] if allow_downgrade else []) + ([POLICY_CHUNK] if chunks else []) + [POLICY_FULL]
+    labels = dict(POLICY_LABELS)
+    labels[POLICY_FULL] = f"{POLICY_LABELS[POLICY_FULL]} (1 job)"
+    if chunks:
+        labels[POLICY_CHUNK] = (
+            f"{POLICY_LABELS[POLICY_CHUNK]} ({len(chunks)} job, total {format_bytes(sum(chunk_bytes))}, "
+            f"maks {format_bytes(max(chunk_bytes))} per job)"
+        )
+
+    st.warning(
+        f"Perkiraan data yang dipindai {format_bytes(total_bytes)}, "
+        f"melebihi anggaran halaman ({format_bytes(budget)})."
+    )
+    policy = st.radio("Pilih cara menjalankan", options, format_func=labels.get, key=f"{key}_policy", horizontal=True)
+    if policy == POLICY_DOWNGRADE:
+        return policy, None
+    if not st.checkbox("Saya mengerti biayanya, jalankan query ini", key=f"{key}_confirm"):
+        return None, None
+    return policy, chunks if policy == POLICY_CHUNK else full_range
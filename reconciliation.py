@@ -0,0 +1,39 @@
+# reconciliation.py
+# Rekonsiliasi streaming nomor antar sumber data: halaman DataFrame dikonsumsi satu per satu
+# lewat generator. Pass pertama hanya menyimpan himpunan nomor unik ternormalisasi, pass kedua
+# mengeluarkan baris detail untuk nomor yang hilang. Memori puncak sebanding jumlah nomor unik,
+# bukan jumlah baris. Himpunan nomor disimpan sebagai array uint64 terurut (lihat phone_codec).
+import pandas as pd
+from phone_codec import PhoneCodeSetBuilder, encode_phone_numbers, contains_codes
+
+
+# Fungsi untuk mengambil angka pertama di awal teks (mis. NoRS dari CounterParty) secara vektor
+def extract_leading_number(series):
+    return series.dropna().astype(str).str.extract(r'^(\d+)', expand=False).reindex(series.index)
+
+
+# Fungsi pass pertama: himpunan kode nomor unik (array uint64 terurut) dari aliran halaman
+def collect_numbers(pages, extract_numbers):
+    builder = PhoneCodeSetBuilder()
+    for page in pages:
+        builder.add(extract_numbers(page))
+    return builder.result()
+
+
+# Fungsi generator pass kedua: baris detail yang nomornya termasuk dalam himpunan kode target
+def iter_matching_rows(pages, extract_numbers, targets, prepare=None):
+    for page in pages:
+        if len(targets) == 0:
+            return
+        mask = contains_codes(targets, encode_phone_numbers(extract_numbers(page)))
+        if mask.any():
+            rows = page[mask]
+            yield prepare(rows.copy()) if prepare is not None else rows
+
+
+# Fungsi untuk menggabungkan hasil generator menjadi satu DataFrame (kosong jika tidak ada baris)
+def collect_rows(row_pages):
+    frames = list(row_pages)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
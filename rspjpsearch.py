@@ -1,70 +1,12 @@
 # rspjpsearch.py
 import streamlit as st
 from google.cloud import bigquery
-from google.oauth2 import service_account
 import pandas as pd
-import json
-
-# Styling untuk tampilan scorecard yang menarik
-st.markdown("""
-    <style>
-    .main-title {
-        font-size: 2.5em;
-        color: #2E86C1;
-        text-align: center;
-        margin-bottom: 20px;
-    }
-    .search-box {
-        background-color: #F8F9F9;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        margin-bottom: 20px;
-    }
-    .scorecard {
-        background-color: #FFFFFF;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        margin-bottom: 20px;
-        border-left: 5px solid #2E86C1;
-    }
-    .scorecard-title {
-        font-size: 1.5em;
-        color: #1A5276;
-        margin-bottom: 15px;
-        font-weight: bold;
-    }
-    .scorecard-item {
-        display: flex;
-        justify-content: space-between;
-        padding: 8px 0;
-        border-bottom: 1px solid #D6DBDF;
-    }
-    .scorecard-label {
-        font-weight: bold;
-        color: #34495E;
-        width: 30%;
-    }
-    .scorecard-value {
-        color: #17202A;
-        width: 70%;
-        word-wrap: break-word;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Fungsi untuk menginisialisasi BigQuery client dari secrets
-@st.cache_resource
-def get_bigquery_client():
-    try:
-        credentials_json = st.secrets["bigquery"]["credentials"]
-        credentials = service_account.Credentials.from_service_account_info(json.loads(credentials_json))
-        client = bigquery.Client(credentials=credentials, project=credentials.project_id)
-        return client
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat menginisialisasi BigQuery Client: {e}")
-        return None
+import html
+import time
+from io import BytesIO
+from pjprs_store import get_pjprs_store, load_pjprs_store, refresh_pjprs_store
+from bq_client import get_bigquery_client, run_query
 
 # Fungsi untuk mencari data berdasarkan OutletID, NoRS, atau OutletName
 @st.cache_data
@@ -94,7 +36,7 @@ def search_bigquery_data(outlet_id, no_rs, outlet_name):
             bigquery.ScalarQueryParameter(key, "STRING", value) for key, value in params.items()
         ])
         
-        df = client.query(query, job_config=job_config).to_dataframe()
+        df = run_query(client, query, job_config=job_config)
         for col in df.columns:
             if df[col].dtype == 'int64':
                 df[col] = df[col].astype(str)
@@ -105,34 +47,129 @@ def search_bigquery_data(outlet_id, no_rs, outlet_name):
         st.error(f"Terjadi kesalahan saat mencari data dari BigQuery: {e}")
         return None
 
+# Kolom ID yang didukung untuk pencarian massal
+BULK_ID_COLUMNS = ["NoRS", "OutletID"]
+
+# Fungsi untuk mencari banyak ID sekaligus dalam satu query (IN UNNEST(@ids))
+@st.cache_data
+def search_bigquery_bulk(id_column, ids):
+    client = get_bigquery_client()
+    if client is None:
+        return None
+    if id_column not in BULK_ID_COLUMNS:
+        st.error(f"Kolom ID tidak dikenal: {id_column}")
+        return None
+
+    try:
+        query = f"""
+        SELECT *
+        FROM `alfred-analytics-406004.analytics_alfred.PJPRS_Clean`
+        WHERE CAST({id_column} AS STRING) IN UNNEST(@ids)
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ArrayQueryParameter("ids", "STRING", list(ids))
+        ])
+
+        df = run_query(client, query, job_config=job_config)
+        for col in df.columns:
+            if df[col].dtype == 'int64':
+                df[col] = df[col].astype(str)
+            elif df[col].dtype == 'object':
+                df[col] = df[col].fillna('')
+        return df
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat mencari data massal dari BigQuery: {e}")
+        return None
+
+# Fungsi untuk membaca daftar ID dari file CSV/XLSX yang diunggah (semua kolom sebagai teks)
+def read_uploaded_ids(uploaded_file):
+    if uploaded_file.name.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(uploaded_file, dtype=str)
+    return pd.read_csv(uploaded_file, dtype=str, sep=None, engine="python")
+
+# Fungsi untuk membersihkan daftar ID: trim, buang kosong dan duplikat (urutan dipertahankan)
+def clean_id_list(values):
+    ids = pd.Series(values, dtype="object").dropna().astype(str).str.strip()
+    ids = ids.str.replace(r"\.0$", "", regex=True)
+    return ids[ids != ""].drop_duplicates().tolist()
+
+# Fungsi untuk membuat file Excel hasil pencarian massal
+def bulk_result_to_excel(result_df, missing_ids, id_column):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        result_df.to_excel(writer, sheet_name='Hasil', index=False)
+        pd.DataFrame({id_column: missing_ids}).to_excel(writer, sheet_name='Tidak_Ditemukan', index=False)
+    return output.getvalue()
+
+NAME_SEARCH_MODES = ["Substring (LIKE)", "Relevansi (fuzzy)"]
+
+# Batas jumlah hasil untuk tampilan scorecard; di atas ini pakai tabel ringkas
+SCORECARD_PAGE_SIZE = 20
+TABLE_VIEW_THRESHOLD = 200
+
+# Fungsi untuk membangun HTML scorecard satu halaman hasil sekaligus (vektorisasi per kolom)
+def build_scorecards_html(page_df, start_number=1):
+    if page_df.empty:
+        return ""
+    items = pd.Series("", index=page_df.index)
+    for col in page_df.columns:
+        label = html.escape(str(col))
+        values = page_df[col].astype(str).map(html.escape)
+        items = items + (
+            '<div class="scorecard-item"><div class="scorecard-label">' + label
+            + '</div><div class="scorecard-value">' + values + '</div></div>'
+        )
+    numbers = pd.Series(range(start_number, start_number + len(page_df)), index=page_df.index).astype(str)
+    cards = (
+        '<div class="scorecard"><div class="scorecard-title">Data ke-' + numbers + '</div>'
+        + items + '</div>'
+    )
+    return "".join(cards.tolist())
+
 # Fungsi untuk menampilkan hasil pencarian dalam format scorecard
 def display_search_results(df):
     if df is None or df.empty:
         st.warning("Tidak ada data yang ditemukan berdasarkan kriteria pencarian.")
         return
-    
-    for idx, row in df.iterrows():
-        st.markdown('<div class="scorecard">', unsafe_allow_html=True)
-        st.markdown(f'<div class="scorecard-title">Data ke-{idx + 1}</div>', unsafe_allow_html=True)
-        
-        # Menampilkan setiap kolom sebagai item dalam scorecard
-        for col in df.columns:
-            st.markdown(
-                f"""
-                <div class="scorecard-item">
-                    <div class="scorecard-label">{col}</div>
-                    <div class="scorecard-value">{row[col]}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-        
-        st.markdown('</div>', unsafe_allow_html=True)
 
-# Main App
-def main():
-    st.markdown('<div class="main-title">Pencarian Profil Data PJPRS</div>', unsafe_allow_html=True)
-    
+    total_rows = len(df)
+    st.success(f"{total_rows:,} data ditemukan.".replace(",", "."))
+
+    # Hasil besar ditampilkan sebagai tabel ringkas agar browser tidak membeku
+    if total_rows > TABLE_VIEW_THRESHOLD:
+        st.info(f"Hasil lebih dari {TABLE_VIEW_THRESHOLD} data, ditampilkan dalam bentuk tabel.")
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        return
+
+    total_pages = (total_rows - 1) // SCORECARD_PAGE_SIZE + 1
+    page = 1
+    if total_pages > 1:
+        page = st.number_input("Halaman", min_value=1, max_value=total_pages, step=1, key="pjp_result_page")
+        st.caption(f"Halaman {page} dari {total_pages}")
+
+    start = (page - 1) * SCORECARD_PAGE_SIZE
+    page_df = df.iloc[start:start + SCORECARD_PAGE_SIZE]
+    st.markdown(build_scorecards_html(page_df, start_number=start + 1), unsafe_allow_html=True)
+
+# Fungsi untuk menampilkan waktu pembaruan snapshot lokal dan tombol refresh
+def render_snapshot_status():
+    client = get_bigquery_client()
+    col_info, col_button = st.columns([4, 1])
+    with col_button:
+        if st.button("Perbarui Snapshot", key="pjp_refresh_snapshot"):
+            with st.spinner("Memperbarui snapshot PJPRS_Clean..."):
+                refresh_pjprs_store(client)
+    store = get_pjprs_store(client)
+    with col_info:
+        if store is not None:
+            refreshed = store.refreshed_at.strftime('%Y-%m-%d %H:%M')
+            total_rows = f"{len(store):,}".replace(",", ".")
+            st.caption(f"Snapshot PJPRS_Clean: {total_rows} baris, terakhir diperbarui {refreshed}")
+        else:
+            st.caption("Snapshot lokal tidak tersedia, pencarian langsung ke BigQuery.")
+
+# Fungsi untuk pencarian tunggal (form OutletID/NoRS/OutletName)
+def render_single_search():
     # Form Pencarian
     st.markdown('<div class="search-box">', unsafe_allow_html=True)
     st.subheader("Cari Data")
@@ -144,18 +181,184 @@ def main():
             no_rs = st.text_input("NoRS")
         with col3:
             outlet_name = st.text_input("OutletName")
+        col_mode, col_top_k = st.columns([3, 1])
+        with col_mode:
+            name_mode = st.radio(
+                "Mode Pencarian OutletName", NAME_SEARCH_MODES, horizontal=True,
+                help="Relevansi: toleran salah ketik, tidak membedakan huruf besar/kecil dan aksen, hasil diurutkan."
+            )
+        with col_top_k:
+            top_k = st.number_input("Jumlah Hasil Teratas", min_value=5, max_value=200, value=20, step=5)
         submit_button = st.form_submit_button(label="Cari")
     
     st.markdown('</div>', unsafe_allow_html=True)
+
+    # Info snapshot lokal PJPRS_Clean
+    render_snapshot_status()
     
     # Proses Pencarian
+    # Kriteria disimpan di session_state agar pergantian halaman tidak menghapus hasil
     if submit_button:
         if not outlet_id and not no_rs and not outlet_name:
             st.warning("Masukkan setidaknya satu kriteria pencarian.")
+            st.session_state.pop("pjp_search_criteria", None)
+        else:
+            st.session_state["pjp_search_criteria"] = (outlet_id, no_rs, outlet_name, name_mode, int(top_k))
+            st.session_state["pjp_result_page"] = 1
+
+    if "pjp_search_criteria" in st.session_state:
+        outlet_id, no_rs, outlet_name, name_mode, top_k = st.session_state["pjp_search_criteria"]
+        store = get_pjprs_store(get_bigquery_client())
+        if store is not None:
+            started = time.perf_counter()
+            if outlet_name and name_mode == NAME_SEARCH_MODES[1]:
+                df = store.search_ranked(outlet_name, top_k=top_k, outlet_id=outlet_id, no_rs=no_rs)
+                suggestions = store.suggest(outlet_name)
+            else:
+                df = store.search(outlet_id, no_rs, outlet_name)
+                suggestions = []
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            st.caption(f"Dicari dari snapshot lokal dalam {elapsed_ms:.1f} ms")
+            if suggestions:
+                st.caption("Saran kata: " + ", ".join(suggestions))
         else:
+            if outlet_name and name_mode == NAME_SEARCH_MODES[1]:
+                st.info("Pencarian relevansi membutuhkan snapshot lokal, memakai pencarian substring.")
             with st.spinner("Mencari data di BigQuery..."):
                 df = search_bigquery_data(outlet_id, no_rs, outlet_name)
-                display_search_results(df)
+        display_search_results(df)
+
+# Fungsi untuk pencarian massal dari file daftar NoRS/OutletID
+def render_bulk_search():
+    st.subheader("Pencarian Massal")
+    uploaded_file = st.file_uploader("Unggah daftar ID (CSV/XLSX)", type=["csv", "xlsx", "xls"], key="pjp_bulk_file")
+    if uploaded_file is None:
+        st.info("Unggah file berisi satu kolom NoRS atau OutletID untuk mencari banyak profil sekaligus.")
+        return
+
+    try:
+        uploaded_df = read_uploaded_ids(uploaded_file)
+    except Exception as e:
+        st.error(f"File tidak dapat dibaca: {e}")
+        return
+    if uploaded_df.empty:
+        st.warning("File yang diunggah kosong.")
+        return
+
+    col_source, col_target = st.columns(2)
+    with col_source:
+        source_column = st.selectbox("Kolom ID di file", uploaded_df.columns.tolist(), key="pjp_bulk_source_column")
+    with col_target:
+        default_target = BULK_ID_COLUMNS.index(source_column) if source_column in BULK_ID_COLUMNS else 0
+        id_column = st.selectbox("Jenis ID", BULK_ID_COLUMNS, index=default_target, key="pjp_bulk_id_column")
+
+    ids = clean_id_list(uploaded_df[source_column])
+    st.caption(f"{len(ids):,} ID unik siap dicari.".replace(",", "."))
+    if ids and st.button("Proses Pencarian Massal", key="pjp_bulk_submit"):
+        started = time.perf_counter()
+        store = get_pjprs_store(get_bigquery_client())
+        if store is not None:
+            result_df = store.lookup_many(id_column, ids)
+            source_label = "snapshot lokal"
+        else:
+            with st.spinner("Mencari data massal di BigQuery..."):
+                result_df = search_bigquery_bulk(id_column, tuple(ids))
+            source_label = "BigQuery"
+        if result_df is None:
+            return
+        # Hasil disimpan di session_state agar tetap tampil setelah rerun (mis. klik tombol unduh)
+        st.session_state["pjp_bulk_result"] = (id_column, ids, result_df, source_label, time.perf_counter() - started)
+
+    # Hasil lama hanya ditampilkan selama jenis ID dan daftar ID-nya masih sama
+    bulk_result = st.session_state.get("pjp_bulk_result")
+    if bulk_result is None or bulk_result[:2] != (id_column, ids):
+        return
+    _, _, result_df, source_label, elapsed = bulk_result
+
+    found_ids = set(result_df[id_column].astype(str)) if id_column in result_df.columns else set()
+    missing_ids = [value for value in ids if value not in found_ids]
+    st.success(
+        f"{len(ids) - len(missing_ids):,} dari {len(ids):,} ID ditemukan ({len(result_df):,} baris) "
+        f"dari {source_label} dalam {elapsed:.2f} detik.".replace(",", ".")
+    )
+    st.dataframe(result_df, use_container_width=True, hide_index=True)
+    if missing_ids:
+        with st.expander(f"{len(missing_ids):,} ID tidak ditemukan".replace(",", ".")):
+            st.dataframe(pd.DataFrame({id_column: missing_ids}), use_container_width=True, hide_index=True)
+
+    st.download_button(
+        label="Unduh Hasil Pencarian Massal (Excel)",
+        data=bulk_result_to_excel(result_df, missing_ids, id_column),
+        file_name=f"PJPRS_Bulk_{id_column}_{len(ids)}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+# Fungsi untuk memanaskan snapshot PJPRS_Clean (dipanggil oleh warmup.py)
+def warm_cache():
+    client = get_bigquery_client()
+    if client is not None:
+        load_pjprs_store(client)
+
+# Styling untuk tampilan scorecard yang menarik (dipanggil eksplisit saat halaman dibuka)
+def setup_page():
+    st.markdown("""
+        <style>
+        .main-title {
+            font-size: 2.5em;
+            color: #2E86C1;
+            text-align: center;
+            margin-bottom: 20px;
+        }
+        .search-box {
+            background-color: #F8F9F9;
+            padding: 20px;
+            border-radius: 10px;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+            margin-bottom: 20px;
+        }
+        .scorecard {
+            background-color: #FFFFFF;
+            padding: 20px;
+            border-radius: 10px;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+            margin-bottom: 20px;
+            border-left: 5px solid #2E86C1;
+        }
+        .scorecard-title {
+            font-size: 1.5em;
+            color: #1A5276;
+            margin-bottom: 15px;
+            font-weight: bold;
+        }
+        .scorecard-item {
+            display: flex;
+            justify-content: space-between;
+            padding: 8px 0;
+            border-bottom: 1px solid #D6DBDF;
+        }
+        .scorecard-label {
+            font-weight: bold;
+            color: #34495E;
+            width: 30%;
+        }
+        .scorecard-value {
+            color: #17202A;
+            width: 70%;
+            word-wrap: break-word;
+        }
+        </style>
+    """, unsafe_allow_html=True)
+
+# Main App
+def main():
+    st.markdown('<div class="main-title">Pencarian Profil Data PJPRS</div>', unsafe_allow_html=True)
+
+    tab_single, tab_bulk = st.tabs(["Pencarian", "Pencarian Massal"])
+    with tab_single:
+        render_single_search()
+    with tab_bulk:
+        render_bulk_search()
 
 if __name__ == "__main__":
+    setup_page()
     main()
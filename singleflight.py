@@ -0,0 +1,72 @@
+# singleflight.py
+# Penggabungan (coalescing) panggilan identik yang sedang berjalan: jika beberapa sesi/thread
+# meminta kunci yang sama secara bersamaan, hanya satu yang mengeksekusi, sisanya menunggu hasilnya.
+import threading
+import copy
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    # Menjalankan fn untuk key; pemanggil lain dengan key sama selama fn berjalan ikut menunggu.
+    # Setiap pemanggil menerima salinan hasil agar mutasi di satu sesi tidak bocor ke sesi lain.
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if leader:
+            # BaseException juga ditangkap (KeyboardInterrupt, ScriptControlException Streamlit saat
+            # sesi pemimpin di-rerun/dihentikan) agar penunggu tidak menerima hasil None
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            # Interupsi milik sesi pemimpin tidak diteruskan apa adanya ke sesi penunggu
+            if not isinstance(call.error, Exception):
+                raise RuntimeError(f"Panggilan bersama untuk {key!r} terhenti sebelum selesai") from call.error
+            raise call.error
+        return copy_result(call.result)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+# Fungsi untuk menyalin hasil (DataFrame punya .copy() yang jauh lebih cepat dari deepcopy)
+def copy_result(result):
+    if hasattr(result, "copy") and callable(result.copy):
+        return result.copy()
+    return copy.deepcopy(result)
@@ -0,0 +1,220 @@
+# tp_engine.py
+# Perhitungan TP (trade promo) NGRS secara lokal. Tabel rate_ngrs_reguler yang kecil di-cache dan
+# diindeks per ClusterID; TP dihitung dari jumlah transaksi teragregasi per (tanggal, ClusterID,
+# TransactionType, SpendAmount) dengan lookup vektor, menggantikan range join All_pjpnonpjp x
+# rate_ngrs_reguler di BigQuery. Hasil dapat dicocokkan dengan query SQL asli (cross_check_tp).
+#
+# Cross-check: python tp_engine.py --start 2025-01-01 --end 2025-01-31
+import argparse
+import streamlit as st
+from google.cloud import bigquery
+import numpy as np
+import pandas as pd
+from bq_client import get_bigquery_client, run_query
+from fast_preview import table_sample
+
+RATE_TABLE = "alfred-analytics-406004.analytics_alfred.rate_ngrs_reguler"
+NGRS_TABLE = "alfred-analytics-406004.analytics_alfred.All_pjpnonpjp"
+
+# Tabel rate jarang berubah; cukup dimuat ulang tiap jam
+RATE_TTL = 3600
+
+# Jumlah baris (denominasi) per blok lookup agar matriks kecocokan baris x rate tetap kecil
+LOOKUP_BLOCK_ROWS = 100_000
+
+TP_KEYS = ["date", "ClusterID", "scenario"]
+TP_COLUMNS = TP_KEYS + ["row_count", "total_sum"]
+CROSS_CHECK_RTOL = 1e-9
+
+
+def empty_tp_frame():
+    return pd.DataFrame(columns=TP_COLUMNS)
+
+
+# Fungsi untuk mengambil tabel rate TP (semua cluster, semua periode) dengan caching.
+# Kegagalan dilempar ke pemanggil (fetch_cube_source) agar tidak ikut di-cache.
+@st.cache_data(ttl=RATE_TTL, show_spinner=False)
+def fetch_rate_table():
+    client = get_bigquery_client()
+    if client is None:
+        return pd.DataFrame()
+
+    query = f"""
+    SELECT
+        SAFE_CAST(ClusterID AS INT64) AS ClusterID,
+        CAST(StartDenom AS FLOAT64) AS StartDenom,
+        CAST(EndDenom AS FLOAT64) AS EndDenom,
+        Start_Date,
+        End_Date,
+        CAST(TP AS FLOAT64) AS TP
+    FROM `{RATE_TABLE}`
+    """
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+    df = run_query(client, query, job_config=job_config)
+    df["Start_Date"] = pd.to_datetime(df["Start_Date"])
+    df["End_Date"] = pd.to_datetime(df["End_Date"])
+    return df
+
+
+# Fungsi untuk mengambil jumlah transaksi NGRS per (tanggal, ClusterID, TransactionType, SpendAmount).
+# Denominasi sedikit, jadi hasilnya jauh lebih kecil dari jumlah baris transaksi.
+# Kegagalan dilempar ke pemanggil (fetch_cube_source) agar tidak ikut di-cache.
+@st.cache_data(show_spinner=False)
+def fetch_denom_counts(start_date, end_date, sample_percent=None):
+    client = get_bigquery_client()
+    if client is None:
+        return pd.DataFrame()
+
+    query = f"""
+    SELECT
+        DATE(dt) AS date,
+        SAFE_CAST(ClusterID AS INT64) AS ClusterID,
+        CAST(TransactionType AS STRING) AS scenario,
+        CAST(SpendAmount AS FLOAT64) AS SpendAmount,
+        COUNT(*) AS row_count
+    FROM `{NGRS_TABLE}` {table_sample(sample_percent)}
+    WHERE DATE(dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    GROUP BY date, ClusterID, scenario, SpendAmount
+    """
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, priority=bigquery.QueryPriority.INTERACTIVE)
+    df = run_query(client, query, job_config=job_config)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+# Fungsi untuk indeks rate per ClusterID: {ClusterID: array interval denominasi/periode dan TP},
+# diurutkan menurut StartDenom. Baris tanpa ClusterID tidak pernah cocok (sama dengan join SQL).
+def build_rate_index(rates):
+    if rates.empty:
+        return {}
+    rates = rates.dropna(subset=["ClusterID"]).sort_values(["ClusterID", "StartDenom"])
+    return {
+        cluster: {
+            "start_denom": group["StartDenom"].to_numpy(dtype=float),
+            "end_denom": group["EndDenom"].to_numpy(dtype=float),
+            "start_date": group["Start_Date"].to_numpy(dtype="datetime64[ns]"),
+            "end_date": group["End_Date"].to_numpy(dtype="datetime64[ns]"),
+            "tp": group["TP"].to_numpy(dtype=float),
+        }
+        for cluster, group in rates.groupby("ClusterID", sort=False)
+    }
+
+
+# Fungsi untuk lookup vektor satu cluster: jumlah TP dari semua rate yang cocok (denominasi dan
+# tanggal di dalam interval, batas inklusif seperti BETWEEN) dan banyaknya rate yang cocok per baris.
+def lookup_rates(rates, dates, denoms):
+    tp_sum = np.zeros(len(denoms))
+    matches = np.zeros(len(denoms), dtype=np.int64)
+    tp = np.nan_to_num(rates["tp"])
+    for block in range(0, len(denoms), LOOKUP_BLOCK_ROWS):
+        rows = slice(block, block + LOOKUP_BLOCK_ROWS)
+        denom = denoms[rows, None]
+        day = dates[rows, None]
+        hit = (
+            (denom >= rates["start_denom"]) & (denom <= rates["end_denom"])
+            & (day >= rates["start_date"]) & (day <= rates["end_date"])
+        )
+        tp_sum[rows] = hit @ tp
+        matches[rows] = hit.sum(axis=1)
+    return tp_sum, matches
+
+
+# Fungsi untuk menghitung TP per (tanggal, ClusterID, TransactionType) dari jumlah per denominasi.
+# Setara range join SQL: tiap rate yang cocok menambah SpendAmount * TP / 100 per transaksi, dan
+# row_count mengikuti jumlah baris hasil LEFT JOIN (minimal satu per transaksi).
+def compute_tp(counts, rate_index):
+    if counts.empty:
+        return empty_tp_frame()
+
+    denoms = counts["SpendAmount"].to_numpy(dtype=float)
+    dates = counts["date"].to_numpy(dtype="datetime64[ns]")
+    tp_sum = np.zeros(len(counts))
+    matches = np.zeros(len(counts), dtype=np.int64)
+    for cluster, positions in counts.groupby("ClusterID", sort=False).indices.items():
+        rates = rate_index.get(cluster)
+        if rates is None:
+            continue
+        tp_sum[positions], matches[positions] = lookup_rates(rates, dates[positions], denoms[positions])
+
+    row_count = counts["row_count"].to_numpy(dtype=np.int64)
+    result = counts[TP_KEYS].copy()
+    result["row_count"] = row_count * np.maximum(matches, 1)
+    result["total_sum"] = np.nan_to_num(row_count * denoms * tp_sum / 100)
+    return result.groupby(TP_KEYS, dropna=False, as_index=False)[["row_count", "total_sum"]].sum()
+
+
+# Fungsi untuk TP NGRS harian per cluster dan TransactionType (sumber ngrs_tp di kubus metrik).
+# Dengan sample_percent hasilnya dari sampel (belum diskalakan; skala diterapkan fetch_cube_source).
+def fetch_tp_cube(start_date, end_date, sample_percent=None):
+    counts = fetch_denom_counts(start_date, end_date, sample_percent)
+    if counts.empty:
+        return empty_tp_frame()
+    return compute_tp(counts, build_rate_index(fetch_rate_table()))
+
+
+# Fungsi untuk membuang entri cache jumlah per denominasi satu jendela tanggal (tanpa sampel)
+def clear_tp_cube(start_date, end_date):
+    fetch_denom_counts.clear(start_date, end_date, None)
+
+
+# Query SQL asli (range join di BigQuery), dipakai sebagai pembanding
+def build_tp_sql_query(start_date, end_date):
+    return f"""
+    SELECT
+        DATE(a.dt) AS date,
+        SAFE_CAST(a.ClusterID AS INT64) AS ClusterID,
+        CAST(a.TransactionType AS STRING) AS scenario,
+        COUNT(*) AS row_count,
+        COALESCE(SUM(
+            CASE
+                WHEN a.SpendAmount BETWEEN r.StartDenom AND r.EndDenom
+                THEN (a.SpendAmount * (r.TP / 100))
+                ELSE 0
+            END
+        ), 0) AS total_sum
+    FROM `{NGRS_TABLE}` a
+    LEFT JOIN `{RATE_TABLE}` r
+    ON
+        a.SpendAmount BETWEEN r.StartDenom AND r.EndDenom
+        AND a.dt BETWEEN r.Start_Date AND r.End_Date
+        AND a.ClusterID = r.ClusterID
+    WHERE DATE(a.dt) BETWEEN DATE('{start_date}') AND DATE('{end_date}')
+    GROUP BY date, ClusterID, scenario
+    """
+
+
+# Fungsi untuk mencocokkan TP lokal dengan hasil SQL; mengembalikan baris yang berbeda
+def cross_check_tp(start_date, end_date, rtol=CROSS_CHECK_RTOL):
+    client = get_bigquery_client()
+    if client is None:
+        raise RuntimeError("BigQuery client tidak tersedia")
+
+    expected = run_query(client, build_tp_sql_query(start_date, end_date))
+    expected["date"] = pd.to_datetime(expected["date"])
+    actual = fetch_tp_cube(start_date, end_date)
+    for df in (expected, actual):
+        df["ClusterID"] = df["ClusterID"].astype("Int64")
+        df["scenario"] = df["scenario"].astype(object)
+
+    merged = expected.merge(actual, on=TP_KEYS, how="outer", suffixes=("_sql", "_local"))
+    for column in ("row_count", "total_sum"):
+        merged[[f"{column}_sql", f"{column}_local"]] = merged[[f"{column}_sql", f"{column}_local"]].fillna(0)
+    same = (
+        (merged["row_count_sql"] == merged["row_count_local"])
+        & np.isclose(merged["total_sum_sql"].astype(float), merged["total_sum_local"].astype(float), rtol=rtol)
+    )
+    return merged[~same].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    args = parser.parse_args()
+
+    mismatches = cross_check_tp(args.start, args.end)
+    if mismatches.empty:
+        print(f"TP lokal sama dengan SQL untuk {args.start} s/d {args.end}")
+    else:
+        print(f"{len(mismatches):,} baris berbeda:")
+        print(mismatches.to_string(index=False))
@@ -0,0 +1,124 @@
+# warmup.py
+# Penjadwal pemanasan cache: menghitung tampilan default tiap halaman dan daftar dimensi
+# secara berkala (setelah jendela load data), agar pengunjung pertama mendapat halaman yang sudah hangat.
+#
+# Pemanasan bersifat opt-in (MMPP_WARMUP, default "off"); aplikasi sendiri tidak meng-import modul
+# halaman atau menjalankan query sebelum menunya dipilih.
+#
+# Mode sidecar (disarankan): python warmup.py [--once], dijalankan terpisah dari aplikasi (mis. lewat
+#               cron/systemd). Proses terpisah tidak berbagi memori Streamlit, tetapi mengirim SQL yang
+#               identik sehingga halaman mendapat hit dari cache hasil BigQuery, serta memperbarui
+#               snapshot PJPRS di disk.
+# Mode thread : MMPP_WARMUP=thread. Penjadwal berjalan di dalam aplikasi (sekali per proses) dan mengisi
+#               st.cache_data yang sama dengan yang dipakai semua sesi, tetapi baru pada jadwal pertama
+#               (tidak saat start).
+#
+# Fetcher tampilan default di-cache tanpa TTL, jadi warm_cache() tiap halaman membuang entri tampilan
+# default lebih dulu; tanpa itu jadwal setelah yang pertama hanya mendapat hit memori dan tidak
+# mengirim SQL. Fetcher menampilkan kegagalan lewat st.error yang tidak tampil di thread tanpa
+# ScriptRunContext, jadi kegagalan dikumpulkan (bq_client.collect_fetch_errors), dicatat di LAST_RUN,
+# ditulis ke stderr, dan ditampilkan di sidebar pada mode thread.
+import streamlit as st
+from datetime import datetime, timedelta, time as dtime
+import importlib
+import threading
+import time
+import os
+import sys
+
+# Modul halaman yang memiliki fungsi warm_cache()
+WARMUP_MODULES = ["linkajaall", "infiltrasi", "ChipTracking", "rspjpsearch"]
+
+# Jadwal harian (HH:MM, waktu lokal), diletakkan setelah jendela load data
+WARMUP_SCHEDULE = os.environ.get("MMPP_WARMUP_SCHEDULE", "06:30,12:30,18:30")
+
+# "off" (default, atau memakai sidecar) / "thread" untuk menjalankan penjadwal di dalam aplikasi
+WARMUP_MODE = os.environ.get("MMPP_WARMUP", "off")
+
+# Status run terakhir per modul: {modul: {"ok", "seconds", "error", "finished_at"}}
+LAST_RUN = {}
+
+
+# Fungsi untuk membaca jadwal "HH:MM,HH:MM" menjadi daftar waktu terurut
+def parse_schedule(schedule):
+    times = []
+    for item in schedule.split(","):
+        item = item.strip()
+        if item:
+            hour, minute = item.split(":")
+            times.append(dtime(int(hour), int(minute)))
+    return sorted(times)
+
+
+# Fungsi untuk menentukan jadwal berikutnya setelah waktu tertentu
+def next_run_after(now, times):
+    for run_time in times:
+        candidate = datetime.combine(now.date(), run_time)
+        if candidate > now:
+            return candidate
+    return datetime.combine(now.date() + timedelta(days=1), times[0])
+
+
+# Fungsi untuk memanaskan semua halaman; kegagalan satu halaman tidak menghentikan halaman lain
+def warm_all(modules=WARMUP_MODULES):
+    # Di-import di sini agar aplikasi tidak memuat google.cloud.bigquery saat start
+    from bq_client import get_bigquery_client, collect_fetch_errors
+    client_error = None if get_bigquery_client() is not None else "BigQuery client tidak tersedia"
+    for module_name in modules:
+        started = time.perf_counter()
+        try:
+            if client_error is not None:
+                raise RuntimeError(client_error)
+            _, errors = collect_fetch_errors(importlib.import_module(module_name).warm_cache)
+            error = "; ".join(errors) or None
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            print(f"Warm-up {module_name} gagal: {error}", file=sys.stderr)
+        LAST_RUN[module_name] = {
+            "ok": error is None,
+            "seconds": time.perf_counter() - started,
+            "error": error,
+            "finished_at": datetime.now(),
+        }
+    return dict(LAST_RUN)
+
+
+# Fungsi untuk loop penjadwal: pemanasan awal lalu mengikuti jadwal sampai stop_event di-set
+def run_scheduler(stop_event=None, schedule=WARMUP_SCHEDULE, run_immediately=True):
+    stop_event = stop_event or threading.Event()
+    times = parse_schedule(schedule)
+    if run_immediately:
+        warm_all()
+    while times:
+        wait_seconds = (next_run_after(datetime.now(), times) - datetime.now()).total_seconds()
+        if stop_event.wait(max(wait_seconds, 0)):
+            break
+        warm_all()
+
+
+# Fungsi untuk memulai penjadwal sebagai thread daemon (sekali per proses, hanya jika MMPP_WARMUP=thread).
+# Pemanasan pertama menunggu jadwal agar start aplikasi tidak meng-import semua halaman dan
+# menjalankan query terberat sekaligus.
+@st.cache_resource(show_spinner=False)
+def start_warmup_thread():
+    if WARMUP_MODE != "thread":
+        return None
+    thread = threading.Thread(target=run_scheduler, kwargs={"run_immediately": False}, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# Fungsi untuk menampilkan kegagalan warm-up terakhir (mode thread berbagi LAST_RUN dengan aplikasi)
+def render_warmup_status():
+    for module_name, status in LAST_RUN.items():
+        if not status["ok"]:
+            st.warning(f"Warm-up {module_name} gagal ({status['finished_at']:%H:%M}): {status['error']}")
+
+
+if __name__ == "__main__":
+    if "--once" in sys.argv:
+        for module_name, status in warm_all().items():
+            print(f"{module_name}: {'OK' if status['ok'] else 'GAGAL'} ({status['seconds']:.1f} s) {status['error'] or ''}")
+    else:
+        run_scheduler()